@@ -1,6 +1,8 @@
-from flask import Flask, current_app, render_template, request, redirect, flash, url_for, session, Response,jsonify
+from flask import Flask, current_app, render_template, request, redirect, flash, url_for, session, Response,jsonify, stream_with_context, stream_template, get_flashed_messages
 from db import get_db_connection
+import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from dotenv import load_dotenv
 import re
@@ -8,14 +10,49 @@ import smtplib
 from email.message import EmailMessage
 from datetime import datetime
 from functools import wraps
+import click
 import csv
 from io import StringIO
 import seed_data, db
+import assets
+import template_cache
+import ref_cache
+import inventory
+import availability
+import ledger
+from money import Money, to_cents, to_pesos, format_money
+import reconcile
+import receipts
+import backup
+import archive
+import changes
+import compression
+import occupancy
+import overlaps
+import projection
+import sync
+import template_db
+import throttle
+import vacancy
 
-db.init_db()
-seed_data.seed_database()  # Ensure database is seeded on startup
 load_dotenv()
 
+
+def initialize():
+    """
+    One-time startup work: create/migrate the schema, seed sample data and warm caches.
+    Under a multi-worker server this runs once in the master before forking (see wsgi.py).
+    """
+    db.init_db()
+    seed_data.seed_database()  # Ensure database is seeded on startup
+    ref_cache.preload()  # Warm dropdown reference data so form pages skip lookup queries
+    occupancy.refresh()  # Snapshot any days missed since the last run
+
+
+# wsgi.py sets APP_SKIP_INIT so that importing the app does not initialize twice
+if os.getenv("APP_SKIP_INIT", "False").lower() != "true":
+    initialize()
+
 ######################################3
 
 
@@ -23,14 +60,165 @@ load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev_secret_key_please_change")
+# Let a fronting web server (nginx/Apache) stream files itself when configured
+app.config['USE_X_SENDFILE'] = os.getenv("USE_X_SENDFILE", "False").lower() == "true"
+# Number of trusted proxies in front of the app: their X-Forwarded-For/-Proto
+# give request.remote_addr and the scheme (per-IP login throttling needs the
+# real client address). Leave at 0 unless every request comes through them.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
 
 # In app.py, add cache headers
 @app.after_request
 def add_header(response):
-    response.cache_control.max_age = 300  # 5 minutes
+    # Responses that set their own policy (fingerprinted assets, APIs) keep it
+    if response.cache_control.max_age is None:
+        response.cache_control.max_age = 300  # 5 minutes
     return response
+
+
+@app.after_request
+def compress_response(response):
+    # gzip/brotli for HTML, JSON and CSV when the client accepts it (see compression.py)
+    return compression.compress_response(response)
 #
 
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@app.before_request
+def use_read_only_connections():
+    # Safe requests only read: hand them read-only connections, so an
+    # accidental write raises db.ReadOnlyViolation instead of taking a write lock
+    db.set_read_only(request.method in SAFE_METHODS)
+
+
+@app.teardown_request
+def reset_read_only(exc):
+    db.set_read_only(False)
+
+
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': assets.asset_url}
+
+# Money columns hold integer cents: {{ payment.amount|money }} -> 1,234.50
+app.add_template_filter(format_money, 'money')
+app.add_template_filter(to_pesos, 'pesos')
+
+# Fingerprinted, precompressed static assets built by `flask --app app build-assets`
+@app.route("/assets/<path:filename>")
+def serve_asset(filename):
+    return assets.send_asset(filename)
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Fingerprint and precompress the static assets referenced by the templates."""
+    manifest = assets.build_assets()
+    print(f"Built {len(manifest)} assets into {assets.DIST_DIR}")
+
+# Shared on-disk Jinja bytecode cache (optionally warmed at startup)
+template_cache.configure_template_cache(app)
+
+@app.cli.command("precompile-templates")
+def precompile_templates_command():
+    """Compile every template into the on-disk bytecode cache."""
+    count, elapsed = template_cache.precompile_templates(app)
+    print(f"Precompiled {count} templates into {template_cache.get_cache_dir()} in {elapsed * 1000:.1f} ms")
+
+
+@app.cli.command("backup")
+@click.option("--compress/--no-compress", default=None, help="gzip the snapshot (default: BACKUP_COMPRESS).")
+@click.option("--keep", type=int, default=None, help="Snapshots to keep (default: BACKUP_KEEP).")
+def backup_command(compress, keep):
+    """Take an online, verified snapshot of the database and prune old ones."""
+    result = backup.create_backup(compress=compress)
+    removed = backup.prune_backups(keep)
+    print(f"Backed up {result['pages']} pages to {result['path']} ({result['size'] // 1024} KB) "
+          f"in {result['elapsed']:.2f}s; pruned {len(removed)} old snapshot(s)")
+
+@app.cli.command("backup-schedule")
+@click.option("--every", type=int, default=360, help="Minutes between snapshots.")
+@click.option("--compress/--no-compress", default=None)
+@click.option("--keep", type=int, default=None)
+def backup_schedule_command(every, compress, keep):
+    """Take snapshots on a fixed interval until stopped."""
+    backup.run_schedule(every, keep=keep, compress=compress)
+
+@app.cli.command("verify-backup")
+@click.argument("path")
+def verify_backup_command(path):
+    """Run an integrity check on a snapshot."""
+    ok, messages = backup.verify_backup(path)
+    print("OK" if ok else "DAMAGED: " + "; ".join(messages[:10]))
+
+@app.cli.command("restore-backup")
+@click.argument("path")
+@click.confirmation_option(prompt="Replace the current database with this backup?")
+def restore_backup_command(path):
+    """Replace the live database with a verified snapshot."""
+    backup.restore_backup(path)
+    print(f"Restored {path}")
+
+@app.cli.command("archive")
+@click.option("--terms", type=int, default=None, help="Archive leases that ended this many academic terms ago (default: ARCHIVE_AFTER_TERMS).")
+@click.option("--batch", type=int, default=None, help="Assignments moved per transaction (default: ARCHIVE_BATCH).")
+@click.option("--dry-run", is_flag=True, help="Only count what would be archived.")
+def archive_command(terms, batch, dry_run):
+    """Move old completed/cancelled assignments and their payments into the archive database."""
+    conn = get_db_connection()
+    try:
+        result = archive.archive_old_records(conn, terms=terms, batch_size=batch, dry_run=dry_run)
+    finally:
+        conn.close()
+    verb = "Would archive" if dry_run else "Archived"
+    print(f"{verb} {result['assignments']} assignments and {result['payments']} payments "
+          f"that ended before {result['cutoff']} ({result['batches']} batches) into {archive.get_archive_path()}")
+
+@app.cli.command("compact-changes")
+@click.option("--retention-days", type=int, default=None, help="Also drop entries older than this (default: CHANGES_RETENTION_DAYS).")
+def compact_changes_command(retention_days):
+    """Drop change log entries that every consumer has acknowledged."""
+    conn = get_db_connection()
+    try:
+        removed = changes.compact(conn, retention_days)
+    finally:
+        conn.close()
+    print(f"Removed {removed} change log entries")
+
+@app.cli.command("snapshot-occupancy")
+@click.option("--from", "start", default=None, help="Recompute snapshots from this date (YYYY-MM-DD) through today.")
+def snapshot_occupancy_command(start):
+    """Record today's occupancy (and any missed days) in the occupancy time series."""
+    conn = get_db_connection()
+    try:
+        if start:
+            days = occupancy.take_snapshots(conn, start, datetime.now().strftime('%Y-%m-%d'))
+        else:
+            days = occupancy.fill_missing(conn)
+    finally:
+        conn.close()
+    print(f"Recorded occupancy for {days} day(s)")
+
+@app.cli.command("build-template")
+@click.option("--force", is_flag=True, help="Rebuild even if the template is up to date.")
+def build_template_command(force):
+    """Build the seeded template database that tests and benchmarks clone (DB_TEMPLATE)."""
+    path = template_db.build_template(force=force)
+    print(f"Template ready at {path}")
+
+
+@app.cli.command("prune-tombstones")
+@click.option("--days", type=int, default=None, help="Keep sync tombstones this many days (default SYNC_TOMBSTONE_DAYS).")
+def prune_tombstones_command(days):
+    """Delete old sync tombstones; consumers behind them must resync."""
+    conn = get_db_connection()
+    try:
+        removed = sync.prune_tombstones(conn, days)
+    finally:
+        conn.close()
+    print(f"Removed {removed} tombstone(s)")
 
 
 # Role-based decorator to centralize access rules
@@ -128,8 +316,7 @@ def edit_assignment(assignment_id):
         return redirect(url_for("assignments"))
 
     # Fetch all buildings
-    cursor.execute("SELECT building_id, building_name FROM buildings WHERE is_active = 1")
-    buildings = cursor.fetchall()
+    buildings = ref_cache.get_reference("buildings", cursor=cursor)
 
     # Determine building for initial room list (include current assigned room even if occupied)
     selected_building = request.form.get("building_id") or assignment["building_id"]
@@ -167,6 +354,14 @@ def edit_assignment(assignment_id):
             conn.close()
             return redirect(url_for("edit_assignment", assignment_id=assignment_id))
 
+        try:
+            monthly_rate = to_cents(monthly_rate)
+        except ValueError:
+            flash("Invalid monthly rate.", "warning")
+            cursor.close()
+            conn.close()
+            return redirect(url_for("edit_assignment", assignment_id=assignment_id))
+
         # find new_room_id from room_number/building
         cursor.execute(
             "SELECT room_id FROM rooms WHERE room_number = ? AND building_id = ?",
@@ -180,7 +375,6 @@ def edit_assignment(assignment_id):
             return redirect(url_for("edit_assignment", assignment_id=assignment_id))
 
         new_room_id = new_room_row["room_id"]
-        old_room_id = assignment["room_id"]
 
         # Validate dates (optional)
         if end_date:
@@ -201,21 +395,22 @@ def edit_assignment(assignment_id):
             UPDATE room_assignments
             SET room_id = ?, end_date = ?, monthly_rate = ?, status = ?, updated_at = CURRENT_TIMESTAMP
             WHERE assignment_id = ?
-        """, (new_room_id, end_date or None, monthly_rate or None, status, assignment_id))
-
-        # ROOM AVAILABILITY logic:
-        # - If status == completed => assigned room should be free (is_available = 1)
-        # - Else assigned room should be occupied (is_available = 0)
-        if status == "completed":
-            cursor.execute("UPDATE rooms SET is_available = 1 WHERE room_id = ?", (new_room_id,))
-        else:
-            cursor.execute("UPDATE rooms SET is_available = 0 WHERE room_id = ?", (new_room_id,))
+        """, (new_room_id, end_date or None, monthly_rate, status, assignment_id))
+        if status != 'cancelled':
+            conflicts = overlaps.check_assignment(cursor, assignment["user_id"], new_room_id,
+                                                  assignment["start_date"], end_date or None, assignment_id)
+            if conflicts:
+                conn.rollback()
+                flash(f"Cannot update assignment: {overlaps.conflict_message(conflicts)}.", "danger")
+                cursor.close()
+                conn.close()
+                return redirect(url_for("edit_assignment", assignment_id=assignment_id))
 
-        # If the user changed to a different room, free the old room
-        if old_room_id != new_room_id:
-            cursor.execute("UPDATE rooms SET is_available = 1 WHERE room_id = ?", (old_room_id,))
+        # ROOM AVAILABILITY: triggers on room_assignments move the occupied bed
+        # between the old and the new room and recompute is_available from capacity
 
         conn.commit()
+        availability.index.apply_assignment(cursor, assignment_id)
         flash("Assignment updated successfully!", "success")
         cursor.close()
         conn.close()
@@ -249,6 +444,109 @@ def get_rooms(building_id):
     return {"rooms": [r["room_number"] for r in rooms]}
 
 
+# API route: role-scoped buildings -> floors -> rooms inventory for forms
+@app.route("/api/inventory")
+@role_required('admin', 'landlord', 'student')
+def api_inventory():
+    role = session.get("role")
+    user_id = session.get("user_id")
+    since = request.args.get("since")
+
+    version, payload = inventory.get_inventory(role, user_id)
+    etag = "inv-{}-{}".format("-".join(str(p) for p in inventory.get_scope(role, user_id)), version)
+    if since:
+        delta = inventory.get_delta(role, user_id, since)
+        if delta is not None:
+            payload = delta
+            etag += "-since-" + since
+
+    response = jsonify(payload)
+    response.set_etag(etag)
+    # Private per-user data: browsers may keep it but must revalidate with the ETag
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.cache_control.max_age = 0
+    return response.make_conditional(request)
+
+
+# API route: daily or monthly occupancy series, e.g. /api/occupancy?start=2025-01-01&group=month
+@app.route("/api/occupancy")
+@role_required('admin', 'landlord')
+def api_occupancy():
+    """
+    Occupancy time series for charts:
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD[&group=day|month][&building_id=][&type_id=]
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+    start = request.args.get('start') or f"{today[:4]}-01-01"
+    end = request.args.get('end') or today
+    group = request.args.get('group', 'month')
+    try:
+        datetime.strptime(start, '%Y-%m-%d')
+        datetime.strptime(end, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    if group not in ('day', 'month'):
+        return jsonify({'error': "group must be 'day' or 'month'"}), 400
+
+    owner_id = session.get('user_id') if session.get('role') == 'landlord' else None
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        series = occupancy.get_series(cursor, start, end, owner_id=owner_id,
+                                      building_id=request.args.get('building_id', type=int),
+                                      type_id=request.args.get('type_id', type=int), group=group)
+        return jsonify({'start': start, 'end': end, 'group': group, 'series': series})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# API route: rooms free for a whole date range, e.g.
+# /api/availability?start=2025-08-01&end=2025-12-15&building_id=1&min_capacity=2&max_rate=4000
+@app.route("/api/availability")
+@role_required('admin', 'landlord', 'student')
+def api_availability():
+    start = request.args.get("start")
+    end = request.args.get("end")
+    try:
+        if not start or not end:
+            raise ValueError("start and end dates are required")
+        if datetime.strptime(end, "%Y-%m-%d") < datetime.strptime(start, "%Y-%m-%d"):
+            raise ValueError("end must not be earlier than start")
+        filters = {
+            "building_id": request.args.get("building_id", type=int),
+            "floor_number": request.args.get("floor", type=int),
+            "type_id": request.args.get("type_id", type=int),
+            "min_capacity": request.args.get("min_capacity", type=int),
+            "min_rate": request.args.get("min_rate", type=to_cents),
+            "max_rate": request.args.get("max_rate", type=to_cents),
+            "beds": request.args.get("beds", default=1, type=int),
+        }
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Landlords only search their own buildings
+    if session.get("role") == "landlord":
+        filters["owner_id"] = session.get("user_id")
+
+    try:
+        rooms = availability.search_available_rooms(start, end, **filters)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    fields = ("room_id", "room_number", "floor_number", "building_id", "building_name",
+              "type_id", "type_name", "capacity", "base_rate", "free_beds")
+    return jsonify({
+        "start": start,
+        "end": end,
+        "count": len(rooms),
+        "rooms": [{**{f: room[f] for f in fields}, "base_rate": to_pesos(room["base_rate"])} for room in rooms],
+    })
+
+
 
 
 
@@ -303,6 +601,15 @@ def home():
         cursor.execute("SELECT COUNT(*) AS pending FROM room_assignments WHERE status='pending'")
         pending = cursor.fetchone()["pending"]
 
+        # Bed counts come from the trigger-maintained rooms.occupied_beds
+        cursor.execute("""
+            SELECT COALESCE(SUM(rt.capacity), 0) AS total_beds,
+                   COALESCE(SUM(r.occupied_beds), 0) AS occupied_beds
+            FROM rooms r
+            LEFT JOIN room_types rt ON r.type_id = rt.type_id
+        """)
+        beds = cursor.fetchone()
+
     # For landlord: show only their buildings and rooms
     elif role == "landlord":
         # Buildings owned
@@ -332,9 +639,23 @@ def home():
         """, (user_id,))
         pending = cursor.fetchone()["pending"]
 
+        cursor.execute("""
+            SELECT COALESCE(SUM(rt.capacity), 0) AS total_beds,
+                   COALESCE(SUM(r.occupied_beds), 0) AS occupied_beds
+            FROM rooms r
+            LEFT JOIN room_types rt ON r.type_id = rt.type_id
+            WHERE r.building_id IN (SELECT building_id FROM buildings WHERE owner_id = ?)
+        """, (user_id,))
+        beds = cursor.fetchone()
+
     else:
         # For students, you can leave stats empty or only their info
         total_rooms = occupied = available = pending = None
+        beds = None
+
+    total_beds = beds["total_beds"] if beds else None
+    occupied_beds = beds["occupied_beds"] if beds else None
+    available_beds = total_beds - occupied_beds if beds else None
 
     cursor.close()
     conn.close()
@@ -345,7 +666,10 @@ def home():
         total_rooms=total_rooms,
         occupied=occupied,
         available=available,
-        pending=pending
+        pending=pending,
+        total_beds=total_beds,
+        occupied_beds=occupied_beds,
+        available_beds=available_beds
     )
 
 
@@ -356,27 +680,25 @@ def admin_assign_room():
 
     # Fetch buildings for admin (all active), landlord (only their buildings)
     if session.get("role") == "admin":
-        cursor.execute("SELECT building_id, building_name FROM buildings WHERE is_active=1")
+        buildings = ref_cache.get_reference("buildings", cursor=cursor)
     else:
-        cursor.execute(
-            "SELECT building_id, building_name FROM buildings WHERE is_active=1 AND owner_id=?",
-            (session.get("user_id"),)
-        )
-    buildings = cursor.fetchall()
+        buildings = ref_cache.get_reference("buildings", "landlord", session.get("user_id"), cursor=cursor)
 
     # Fetch available rooms based on role
     if session.get("role") == "admin":
         cursor.execute("""
-            SELECT r.room_id, r.room_number, b.building_name
+            SELECT r.room_id, r.room_number, b.building_name, rt.capacity, r.occupied_beds
             FROM rooms r
             JOIN buildings b ON r.building_id = b.building_id
+            LEFT JOIN room_types rt ON r.type_id = rt.type_id
             WHERE r.is_available=1
         """)
     else:
         cursor.execute("""
-            SELECT r.room_id, r.room_number, b.building_name
+            SELECT r.room_id, r.room_number, b.building_name, rt.capacity, r.occupied_beds
             FROM rooms r
             JOIN buildings b ON r.building_id = b.building_id
+            LEFT JOIN room_types rt ON r.type_id = rt.type_id
             WHERE r.is_available=1 AND b.owner_id=?
         """, (session.get("user_id"),))
     rooms = cursor.fetchall()
@@ -405,6 +727,12 @@ def admin_assign_room():
             flash("Invalid date format.", "danger")
             return redirect(request.path)
 
+        try:
+            monthly_rate = to_cents(monthly_rate)
+        except ValueError:
+            flash("Invalid monthly rate.", "danger")
+            return redirect(request.path)
+
         # Check if user exists
         cursor.execute("""
             SELECT user_id FROM users
@@ -440,9 +768,17 @@ def admin_assign_room():
             (user_id, room_id, start_date, end_date, monthly_rate, status, assigned_by)
             VALUES (?, ?, ?, ?, ?, 'active', ?)
         """, (user_id, room_id, start_date, end_date, monthly_rate, assigned_by))
-
-        cursor.execute("UPDATE rooms SET is_available=0 WHERE room_id=?", (room_id,))
+        assignment_id = cursor.lastrowid
+        conflicts = overlaps.check_assignment(cursor, user_id, int(room_id), start_date, end_date or None, assignment_id)
+        if conflicts:
+            conn.rollback()
+            flash(f"Cannot assign room: {overlaps.conflict_message(conflicts)}.", "danger")
+            cursor.close()
+            conn.close()
+            return redirect(request.path)
+        # occupied_beds/is_available are updated by the room_assignments triggers
         conn.commit()
+        availability.index.apply_assignment(cursor, assignment_id)
 
         flash("Room successfully assigned!", "success")
         cursor.close()
@@ -499,10 +835,6 @@ def edit_room(room_id):
     """, (room_id,))
     room = cursor.fetchone()
 
-    # Fetch all active room types for dropdown
-    cursor.execute("SELECT type_id, type_name FROM room_types WHERE is_active = 1")
-    room_types = cursor.fetchall()
-
     if not room:
         flash("Room not found.", "warning")
         cursor.close()
@@ -513,9 +845,8 @@ def edit_room(room_id):
     total_floors = room["total_floors"]
     floors = list(range(1, total_floors + 1))
 
-    # Fetch active room types
-    cursor.execute("SELECT type_id, type_name FROM room_types WHERE is_active = 1")
-    room_types = cursor.fetchall()
+    # Fetch active room types for dropdown
+    room_types = ref_cache.get_reference("room_types", cursor=cursor)
 
     if request.method == "POST":
         room_number = request.form.get("room_number", "").strip()
@@ -595,22 +926,13 @@ def add_room():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Admin can see all active buildings
-    if session.get("role") == "admin":
-        cursor.execute("SELECT building_id, building_name, total_floors FROM buildings WHERE is_active = 1")
-    else:
-        # Landlord can only see their own buildings
-        cursor.execute("""
-            SELECT building_id, building_name, total_floors 
-            FROM buildings 
-            WHERE is_active = 1 AND owner_id = ?
-        """, (session.get("user_id"),))
-    
-    buildings = cursor.fetchall()
+    # Admin can see all active buildings, landlord can only see their own buildings
+    versions = ref_cache.get_table_versions(cursor)
+    buildings = ref_cache.get_reference("buildings", session.get("role"), session.get("user_id"),
+                                        cursor=cursor, versions=versions)
 
     # Fetch active room types
-    cursor.execute("SELECT type_id, type_name FROM room_types WHERE is_active = 1")
-    room_types = cursor.fetchall()
+    room_types = ref_cache.get_reference("room_types", cursor=cursor, versions=versions)
 
     if request.method == "POST":
         building_id = request.form.get("building_id")
@@ -674,6 +996,36 @@ def building_floors(building_id):
         return jsonify([i for i in range(1, building["total_floors"] + 1)])
     return jsonify([])
 
+# Bytes of rendered HTML collected before a streamed page is flushed
+STREAM_CHUNK_SIZE = 16384
+
+
+def _coalesce(chunks, size=STREAM_CHUNK_SIZE):
+    # Jinja yields a fragment per template node; send them in reasonably sized pieces
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _streamed(conn, template_name, **context):
+    """
+    Stream a list page: the header and first rows go out while later rows
+    are still being read from the lazy row iterators in `context`. `conn`
+    is closed once the response is done (or the client goes away).
+    """
+    # Pop the flashes now, while the session can still be saved; the layout's
+    # get_flashed_messages() then reads them from the request context
+    get_flashed_messages()
+    response = Response(_coalesce(stream_template(template_name, **context)))
+    response.call_on_close(conn.close)
+    return response
+
 # ===========================
 # 1. USERS MANAGEMENT
 # ===========================
@@ -709,15 +1061,13 @@ def users():
         query += " ORDER BY user_id"
 
         cursor.execute(query, params)
-        users = [dict(row) for row in cursor.fetchall()]
+        # Rows are read while the page streams out
+        users = db.iter_rows(cursor)
 
     except Exception as e:
         flash(f"Error fetching users: {e}", "danger")
-    finally:
-        cursor.close()
-        conn.close()
-    
-    return render_template("02_users.html", users=users, search=search, role_filter=role_filter)
+
+    return _streamed(conn, "02_users.html", users=users, search=search, role_filter=role_filter)
 
 @app.route("/add_user", methods=["GET", "POST"])
 def add_user():
@@ -1032,6 +1382,12 @@ def login():
             flash('Please enter username and password.', 'warning')
             return render_template('logIn.html')
 
+        # Before the user lookup and the password hash, which is what an attack burns
+        allowed, retry_after = throttle.check_login(identifier, request.remote_addr)
+        if not allowed:
+            flash(f'Too many login attempts. Try again in {retry_after} seconds.', 'danger')
+            return render_template('logIn.html'), 429, {'Retry-After': str(retry_after)}
+
         conn = get_db_connection()
         cursor = conn.cursor()
         try:
@@ -1055,6 +1411,8 @@ def login():
                 flash('Invalid username or password', 'danger')
                 return render_template('logIn.html')
             
+            throttle.reset_identifier(identifier)
+
             # SET SESSION
             session['user_id'] = user['user_id']
             session['username'] = user['username']
@@ -1173,21 +1531,9 @@ def add_building():
     landlords = []
     if session.get('role') == 'admin':
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id, username, first_name, last_name FROM users WHERE role = 'landlord' AND is_active = 1 ORDER BY username")
-            landlords = cursor.fetchall()
+            landlords = ref_cache.get_reference('landlords')
         except Exception:
             landlords = []
-        finally:
-            try:
-                cursor.close()
-            except Exception:
-                pass
-            try:
-                conn.close()
-            except Exception:
-                pass
     return render_template("03_add_building.html", landlords=landlords)
 
 @app.route("/edit_building/<int:building_id>", methods=["GET", "POST"])
@@ -1240,21 +1586,9 @@ def edit_building(building_id):
     landlords = []
     if session.get('role') == 'admin':
         try:
-            conn2 = get_db_connection()
-            cursor2 = conn2.cursor(dictionary=True)
-            cursor2.execute("SELECT user_id, username, first_name, last_name FROM users WHERE role = 'landlord' AND is_active = 1 ORDER BY username")
-            landlords = cursor2.fetchall()
+            landlords = ref_cache.get_reference('landlords')
         except Exception:
             landlords = []
-        finally:
-            try:
-                cursor2.close()
-            except Exception:
-                pass
-            try:
-                conn2.close()
-            except Exception:
-                pass
     return render_template("03_edit_building.html", building=building, landlords=landlords)
 
 # ===========================
@@ -1299,7 +1633,8 @@ def rooms():
         # Base query
         query = """
             SELECT r.room_id, r.room_number, r.floor_number, b.building_name,
-                   rt.type_name, r.is_available, b.owner_id
+                   rt.type_name, r.is_available, b.owner_id,
+                   rt.capacity, r.occupied_beds
             FROM rooms r
             LEFT JOIN buildings b ON r.building_id = b.building_id
             LEFT JOIN room_types rt ON r.type_id = rt.type_id
@@ -1333,23 +1668,21 @@ def rooms():
 
         query += " ORDER BY r.room_id"
 
-        cursor.execute(query, params)
-        rooms = [dict(row) for row in cursor.fetchall()]
-
         # For building select dropdown
         cursor.execute("SELECT building_name FROM buildings ORDER BY building_name")
         buildings_list = [row["building_name"] for row in cursor.fetchall()]
 
+        # Rows are read while the page streams out
+        cursor.execute(query, params)
+        rooms = db.iter_rows(cursor)
+
     except Exception as e:
         flash(f"Error fetching rooms: {e}", "danger")
         buildings_list = []
-    finally:
-        cursor.close()
-        conn.close()
 
-    return render_template("05_rooms.html", rooms=rooms, search=search,
-                           building_filter=building_filter, status_filter=status_filter,
-                           buildings_list=buildings_list)
+    return _streamed(conn, "05_rooms.html", rooms=rooms, search=search,
+                     building_filter=building_filter, status_filter=status_filter,
+                     buildings_list=buildings_list)
 
 # ===========================
 # 5. ROOM ASSIGNMENTS MANAGEMENT
@@ -1397,18 +1730,11 @@ def assignments():
                 LEFT JOIN buildings b ON r.building_id = b.building_id
                 ORDER BY ra.assignment_id
             """)
-        assignments = cursor.fetchall()
-        converted = []
-        for row in assignments:
-            r = dict(row)            # convert Row object to dict
-            r["monthly_rate"] = float(r["monthly_rate"])
-            converted.append(r)
+        # Rows are read while the page streams out
+        assignments = db.iter_rows(cursor)
     except Exception as e:
         flash(f"Error fetching assignments: {e}", "danger")
-    finally:
-        cursor.close()
-        conn.close()
-    return render_template("06_assignments.html", assignments=converted)
+    return _streamed(conn, "06_assignments.html", assignments=assignments)
 
 # ===========================
 # 6. PAYMENTS MANAGEMENT
@@ -1431,15 +1757,18 @@ def payments():
     date_to = request.args.get('date_to')
     
     try:
+        # Archived history is only read when the date range reaches back into it
+        sources = archive.history_sources(cursor, date_from)
+
         # Base query with all needed joins
-        base_query = """
+        base_query = f"""
             SELECT p.payment_id, u.username, u.first_name, u.last_name,
                    p.amount, p.payment_method, p.payment_date, 
                    p.receipt_number, p.payment_period_start, p.payment_period_end,
                    p.notes, r.room_number, b.building_name, ra.monthly_rate
-            FROM payments p
+            FROM {sources['payments']} p
             LEFT JOIN users u ON p.user_id = u.user_id
-            LEFT JOIN room_assignments ra ON p.assignment_id = ra.assignment_id
+            LEFT JOIN {sources['room_assignments']} ra ON p.assignment_id = ra.assignment_id
             LEFT JOIN rooms r ON ra.room_id = r.room_id
             LEFT JOIN buildings b ON r.building_id = b.building_id
         """
@@ -1477,36 +1806,38 @@ def payments():
             base_query += " WHERE " + " AND ".join(where_clauses)
         base_query += " ORDER BY p.payment_date DESC, p.payment_id DESC"
         
-        cursor.execute(base_query, params)
-        payments = cursor.fetchall()
+        # Rows are read while the page streams out, on a cursor of their own
+        payments_cursor = conn.cursor()
+        payments_cursor.execute(base_query, params)
+        payments = db.iter_rows(payments_cursor)
         
         # Get statistics based on role
         if session.get('role') == 'admin':
             # Total collected
+            archived_total, archived_count = archive.archived_payment_totals(cursor)
             cursor.execute("SELECT SUM(amount) as total FROM payments")
             row = cursor.fetchone()
-            stats['total_collected'] = row['total'] if row['total'] else 0
+            stats['total_collected'] = Money(row['total']) + archived_total
             
-            # This month
+            # This month: a range of idx_payments_payment_month
             cursor.execute("""
                 SELECT SUM(amount) as total FROM payments 
-                WHERE strftime('%Y-%m', payment_date) = strftime('%Y-%m', 'now')
+                WHERE payment_month = strftime('%Y-%m', 'now')
             """)
             row = cursor.fetchone()
-            stats['month_collected'] = row['total'] if row['total'] else 0
+            stats['month_collected'] = Money(row['total'])
             
             # Payment count
             cursor.execute("SELECT COUNT(*) as count FROM payments")
             row = cursor.fetchone()
-            stats['payment_count'] = row['count']
+            stats['payment_count'] = row['count'] + archived_count
             
             # Average payment
-            cursor.execute("SELECT AVG(amount) as avg FROM payments")
-            row = cursor.fetchone()
-            stats['avg_payment'] = row['avg'] if row['avg'] else 0
+            stats['avg_payment'] = stats['total_collected'] / stats['payment_count'] if stats['payment_count'] else Money()
             
         elif session.get('role') == 'landlord':
             # Total collected for landlord's buildings
+            archived_total, archived_count = archive.archived_payment_totals(cursor, owner_id=session.get('user_id'))
             cursor.execute("""
                 SELECT SUM(p.amount) as total FROM payments p
                 LEFT JOIN room_assignments ra ON p.assignment_id = ra.assignment_id
@@ -1515,18 +1846,18 @@ def payments():
                 WHERE b.owner_id = ?
             """, (session.get('user_id'),))
             row = cursor.fetchone()
-            stats['total_collected'] = row['total'] if row['total'] else 0
+            stats['total_collected'] = Money(row['total']) + archived_total
             
-            # This month
+            # This month: a range of idx_payments_payment_month, then the landlord's leases
             cursor.execute("""
                 SELECT SUM(p.amount) as total FROM payments p
                 LEFT JOIN room_assignments ra ON p.assignment_id = ra.assignment_id
                 LEFT JOIN rooms r ON ra.room_id = r.room_id
                 LEFT JOIN buildings b ON r.building_id = b.building_id
-                WHERE b.owner_id = ? AND strftime('%Y-%m', p.payment_date) = strftime('%Y-%m', 'now')
+                WHERE b.owner_id = ? AND p.payment_month = strftime('%Y-%m', 'now')
             """, (session.get('user_id'),))
             row = cursor.fetchone()
-            stats['month_collected'] = row['total'] if row['total'] else 0
+            stats['month_collected'] = Money(row['total'])
             
             # Payment count
             cursor.execute("""
@@ -1537,22 +1868,17 @@ def payments():
                 WHERE b.owner_id = ?
             """, (session.get('user_id'),))
             row = cursor.fetchone()
-            stats['payment_count'] = row['count']
+            stats['payment_count'] = row['count'] + archived_count
             
         else:  # student
             # Total paid
+            archived_total, _ = archive.archived_payment_totals(cursor, user_id=session.get('user_id'))
             cursor.execute("SELECT SUM(amount) as total FROM payments WHERE user_id = ?", (session.get('user_id'),))
             row = cursor.fetchone()
-            stats['total_paid'] = row['total'] if row['total'] else 0
+            stats['total_paid'] = Money(row['total']) + archived_total
             
-            # Current balance (monthly_rate minus paid)
-            cursor.execute("""
-                SELECT SUM(ra.monthly_rate) as expected FROM room_assignments ra
-                WHERE ra.user_id = ? AND ra.status = 'active'
-            """, (session.get('user_id'),))
-            row = cursor.fetchone()
-            expected = row['expected'] if row['expected'] else 0
-            stats['balance'] = expected - stats['total_paid']
+            # Current balance: monthly charges accrued over every lease month minus payments
+            stats['balance'] = ledger.student_balance(session.get('user_id'))['balance']
             
             # Next due date
             cursor.execute("""
@@ -1564,42 +1890,25 @@ def payments():
         
         # Get students list for filter (admin/landlord)
         if session.get('role') in ['admin', 'landlord']:
-            if session.get('role') == 'admin':
-                cursor.execute("""
-                    SELECT DISTINCT u.user_id, u.first_name, u.last_name 
-                    FROM users u
-                    WHERE u.role = 'student' AND u.is_active = 1
-                    ORDER BY u.first_name, u.last_name
-                """)
-            else:
-                cursor.execute("""
-                    SELECT DISTINCT u.user_id, u.first_name, u.last_name 
-                    FROM users u
-                    JOIN room_assignments ra ON u.user_id = ra.user_id
-                    JOIN rooms r ON ra.room_id = r.room_id
-                    JOIN buildings b ON r.building_id = b.building_id
-                    WHERE b.owner_id = ? AND u.is_active = 1
-                    ORDER BY u.first_name, u.last_name
-                """, (session.get('user_id'),))
-            students = cursor.fetchall()
+            versions = ref_cache.get_table_versions(cursor)
+            students = ref_cache.get_reference('students', session.get('role'), session.get('user_id'),
+                                               cursor=cursor, versions=versions)
         
         # Get buildings list for filter (admin only)
         if session.get('role') == 'admin':
-            cursor.execute("SELECT building_id, building_name FROM buildings WHERE is_active = 1 ORDER BY building_name")
-            buildings = cursor.fetchall()
+            buildings = ref_cache.get_reference('buildings', cursor=cursor, versions=versions)
             
     except Exception as e:
         flash(f"Error fetching payments: {e}", "danger")
     finally:
         cursor.close()
-        conn.close()
     
-    return render_template("07_payments.html", 
-                         payments=payments, 
-                         students=students, 
-                         buildings=buildings,
-                         stats=stats,
-                         today=datetime.now().strftime('%Y-%m-%d'))
+    return _streamed(conn, "07_payments.html", 
+                     payments=payments, 
+                     students=students, 
+                     buildings=buildings,
+                     stats=stats,
+                     today=datetime.now().strftime('%Y-%m-%d'))
 
 @app.route("/payment", methods=["GET", "POST"])
 @app.route("/payment/<int:payment_id>", methods=["GET", "POST"])
@@ -1614,6 +1923,9 @@ def payment(payment_id=None):
         conn = get_db_connection()
         cursor = conn.cursor()
         try:
+            amount = to_cents(amount)
+            if not receipt_number:
+                receipt_number = receipts.allocate_receipt(cursor)
             cursor.execute("""
                 INSERT INTO payments (user_id, amount, payment_method, payment_date, receipt_number)
                 VALUES (?, ?, ?, ?, ?)
@@ -1630,23 +1942,11 @@ def payment(payment_id=None):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        if session.get('role') == 'landlord':
-            cursor.execute("""
-                SELECT DISTINCT u.user_id, u.username, u.role, u.first_name, u.last_name
-                FROM users u
-                JOIN room_assignments ra ON u.user_id = ra.user_id
-                JOIN rooms r ON ra.room_id = r.room_id
-                JOIN buildings b ON r.building_id = b.building_id
-                WHERE b.owner_id = ? AND u.is_active = 1
-                ORDER BY u.first_name
-            """, (session.get('user_id'),))
-            users = cursor.fetchall()
-        elif session.get('role') == 'student':
+        if session.get('role') == 'student':
             cursor.execute("SELECT user_id, username, role, first_name, last_name FROM users WHERE user_id = ? AND is_active = 1", (session.get('user_id'),))
             users = cursor.fetchall()
         else:
-            cursor.execute("SELECT * FROM users WHERE is_active = 1 ORDER BY first_name")
-            users = cursor.fetchall()
+            users = ref_cache.get_reference('students', session.get('role'), session.get('user_id'), cursor=cursor)
     except Exception as e:
         flash(f"Error fetching users: {e}", "danger")
         users = []
@@ -1673,15 +1973,20 @@ def record_payment():
     if not user_id or not amount or not payment_method or not payment_date:
         flash("Please fill in all required fields.", "warning")
         return redirect(url_for("payments"))
-    
-    # Auto-generate receipt number if not provided
-    if not receipt_number:
-        receipt_number = f"PMT-{datetime.now().strftime('%Y%m%d')}-{int(datetime.now().timestamp() * 1000) % 10000:04d}"
+    try:
+        amount = to_cents(amount)
+    except ValueError:
+        flash("Invalid payment amount.", "warning")
+        return redirect(url_for("payments"))
     
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        # Auto-generate receipt number if not provided (allocated in this transaction)
+        if not receipt_number:
+            receipt_number = receipts.allocate_receipt(cursor)
+
         # Insert payment
         cursor.execute("""
             INSERT INTO payments (
@@ -1709,6 +2014,101 @@ def record_payment():
     
     return redirect(url_for("payments"))
 
+@app.route("/payments/reconcile", methods=["GET", "POST"])
+@role_required('admin', 'landlord')
+def reconcile_statement():
+    result = None
+    if request.method == "POST":
+        statement = request.files.get("statement")
+        payment_method = request.form.get("payment_method") or 'gcash'
+        dry_run = request.form.get("dry_run") == "1"
+        if not statement or not statement.filename:
+            flash("Please choose a statement CSV to import.", "warning")
+            return redirect(url_for("reconcile_statement"))
+        if payment_method not in ('gcash', 'bank_transfer'):
+            flash("Statements can only be imported as GCash or bank transfer payments.", "warning")
+            return redirect(url_for("reconcile_statement"))
+
+        owner_id = session.get('user_id') if session.get('role') == 'landlord' else None
+        try:
+            result = reconcile.import_statement(statement.stream, session.get('user_id'),
+                                                payment_method=payment_method, owner_id=owner_id,
+                                                dry_run=dry_run)
+            verb = "would be recorded" if dry_run else "recorded"
+            flash(f"{result['matched']} of {result['lines']} statement lines {verb} "
+                  f"(₱{format_money(result['total_amount'])}). {len(result['issues'])} need review.",
+                  "info" if dry_run else "success")
+            result['dry_run'] = dry_run
+        except ValueError as e:
+            flash(str(e), "danger")
+        except Exception as e:
+            flash(f"Error importing statement: {e}", "danger")
+
+    return render_template("07_reconcile.html", result=result)
+
+@app.route("/api/login-throttle")
+@role_required('admin')
+def login_throttle_stats():
+    """Login throttling counters for this worker (see throttle.py)."""
+    return jsonify(throttle.stats())
+
+
+@app.route("/api/sync/<entity>")
+@role_required('admin', 'landlord', 'student')
+def sync_entity(entity):
+    """NDJSON rows of `entity` changed since ?cursor= (see sync.py), scoped to the caller's role."""
+    if entity not in db.SYNC_TABLES:
+        return jsonify({'error': f"Unknown entity; expected one of: {', '.join(db.SYNC_TABLES)}"}), 404
+    try:
+        position = sync.decode_cursor(request.args.get('cursor'))
+    except sync.CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = max(1, min(request.args.get('limit', sync.DEFAULT_LIMIT, type=int), sync.MAX_LIMIT))
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if sync.needs_resync(cursor, entity, position):
+            return jsonify({'error': 'Deletes behind this cursor were pruned; resync from an empty cursor'}), 410
+    finally:
+        cursor.close()
+        conn.close()
+
+    lines = sync.stream_changes(entity, position, limit, session.get('role'), session.get('user_id'))
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+
+@app.route("/api/assignments/validate", methods=["POST"])
+@role_required('admin', 'landlord')
+def validate_assignments():
+    """
+    Check proposed assignments for overlaps before writing them.
+    Body: {"assignments": [{"user_id", "room_id", "start_date", "end_date", "assignment_id"?, "status"?}, ...]}
+    """
+    data = request.get_json(silent=True) or {}
+    proposals = data.get('assignments')
+    if not isinstance(proposals, list):
+        return jsonify({'error': "Expected a JSON body with an 'assignments' list"}), 400
+    for i, p in enumerate(proposals):
+        try:
+            datetime.strptime(str(p.get('start_date')), '%Y-%m-%d')
+            if p.get('end_date'):
+                datetime.strptime(str(p['end_date']), '%Y-%m-%d')
+        except (AttributeError, ValueError):
+            return jsonify({'error': f'assignments[{i}]: start_date and end_date must be YYYY-MM-DD dates'}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        conflicts = overlaps.validate_batch(cursor, proposals)
+        return jsonify({'checked': len(proposals), 'valid': not conflicts, 'conflicts': conflicts})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+
 @app.route("/api/assignments/<int:user_id>")
 @role_required('admin', 'landlord')
 def get_user_assignments(user_id):
@@ -1729,7 +2129,7 @@ def get_user_assignments(user_id):
         assignments = cursor.fetchall()
         
         return jsonify({
-            'assignments': [dict(a) for a in assignments]
+            'assignments': [{**dict(a), 'monthly_rate': to_pesos(a['monthly_rate'])} for a in assignments]
         })
         
     except Exception as e:
@@ -1790,6 +2190,7 @@ def edit_payment(payment_id):
         notes = request.form.get("notes")
         
         try:
+            amount = to_cents(amount)
             cursor.execute("""
                 UPDATE payments 
                 SET amount = ?, payment_method = ?, payment_date = ?, notes = ?,
@@ -1878,32 +2279,39 @@ def reports():
 def export_payments():
     conn = get_db_connection()
     cursor = conn.cursor()
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
     try:
+        # Exports reaching back past the archive horizon include archived rows
+        sources = archive.history_sources(cursor, date_from)
+        query = f"""
+            SELECT p.payment_id, u.username, u.first_name, u.last_name, p.amount, p.payment_method, p.payment_date, p.receipt_number
+            FROM {sources['payments']} p
+            LEFT JOIN users u ON p.user_id = u.user_id
+            LEFT JOIN {sources['room_assignments']} ra ON p.assignment_id = ra.assignment_id
+            LEFT JOIN rooms r ON ra.room_id = r.room_id
+            LEFT JOIN buildings b ON r.building_id = b.building_id
+            WHERE 1 = 1
+        """
+        params = []
         if session.get('role') == 'landlord':
-            cursor.execute("""
-                SELECT p.payment_id, u.username, u.first_name, u.last_name, p.amount, p.payment_method, p.payment_date, p.receipt_number
-                FROM payments p
-                LEFT JOIN users u ON p.user_id = u.user_id
-                LEFT JOIN room_assignments ra ON p.assignment_id = ra.assignment_id
-                LEFT JOIN rooms r ON ra.room_id = r.room_id
-                LEFT JOIN buildings b ON r.building_id = b.building_id
-                WHERE b.owner_id = ?
-                ORDER BY p.payment_id DESC
-            """, (session.get('user_id'),))
-        else:
-            cursor.execute("""
-                SELECT p.payment_id, u.username, u.first_name, u.last_name, p.amount, p.payment_method, p.payment_date, p.receipt_number
-                FROM payments p
-                LEFT JOIN users u ON p.user_id = u.user_id
-                ORDER BY p.payment_id DESC
-            """)
+            query += " AND b.owner_id = ?"
+            params.append(session.get('user_id'))
+        if date_from:
+            query += " AND p.payment_date >= ?"
+            params.append(date_from)
+        if date_to:
+            query += " AND p.payment_date <= ?"
+            params.append(date_to)
+        query += " ORDER BY p.payment_id DESC"
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         # CSV
         si = StringIO()
         cw = csv.writer(si)
         cw.writerow(['payment_id','username','first_name','last_name','amount','method','payment_date','receipt_number'])
         for r in rows:
-            cw.writerow(r)
+            cw.writerow([*r[:4], to_pesos(r['amount']), *r[5:]])
         output = si.getvalue()
         filename = f"payments_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.csv"
         return Response(output, mimetype='text/csv', headers={"Content-Disposition": f"attachment;filename={filename}"})
@@ -1920,32 +2328,37 @@ def export_payments():
 def export_assignments():
     conn = get_db_connection()
     cursor = conn.cursor()
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
     try:
+        source = archive.table_source(cursor, 'room_assignments', date_from)
+        query = f"""
+            SELECT ra.assignment_id, u.username, r.room_number, b.building_name, ra.start_date, ra.end_date, ra.monthly_rate, ra.status
+            FROM {source} ra
+            LEFT JOIN users u ON ra.user_id = u.user_id
+            LEFT JOIN rooms r ON ra.room_id = r.room_id
+            LEFT JOIN buildings b ON r.building_id = b.building_id
+            WHERE 1 = 1
+        """
+        params = []
         if session.get('role') == 'landlord':
-            cursor.execute("""
-                SELECT ra.assignment_id, u.username, r.room_number, b.building_name, ra.start_date, ra.end_date, ra.monthly_rate, ra.status
-                FROM room_assignments ra
-                LEFT JOIN users u ON ra.user_id = u.user_id
-                LEFT JOIN rooms r ON ra.room_id = r.room_id
-                LEFT JOIN buildings b ON r.building_id = b.building_id
-                WHERE b.owner_id = ?
-                ORDER BY ra.assignment_id
-            """, (session.get('user_id'),))
-        else:
-            cursor.execute("""
-                SELECT ra.assignment_id, u.username, r.room_number, b.building_name, ra.start_date, ra.end_date, ra.monthly_rate, ra.status
-                FROM room_assignments ra
-                LEFT JOIN users u ON ra.user_id = u.user_id
-                LEFT JOIN rooms r ON ra.room_id = r.room_id
-                LEFT JOIN buildings b ON r.building_id = b.building_id
-                ORDER BY ra.assignment_id
-            """)
+            query += " AND b.owner_id = ?"
+            params.append(session.get('user_id'))
+        # Leases overlapping the requested range
+        if date_from:
+            query += " AND (ra.end_date IS NULL OR ra.end_date >= ?)"
+            params.append(date_from)
+        if date_to:
+            query += " AND ra.start_date <= ?"
+            params.append(date_to)
+        query += " ORDER BY ra.assignment_id"
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         si = StringIO()
         cw = csv.writer(si)
         cw.writerow(['assignment_id','username','room_number','building_name','start_date','end_date','monthly_rate','status'])
         for r in rows:
-            cw.writerow(r)
+            cw.writerow([*r[:6], to_pesos(r['monthly_rate']), r['status']])
         output = si.getvalue()
         filename = f"payments_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.csv"
         return Response(output, mimetype='text/csv', headers={"Content-Disposition": f"attachment;filename={filename}"})
@@ -1957,6 +2370,117 @@ def export_assignments():
         conn.close()
 
 
+@app.route('/api/arrears')
+@role_required('admin', 'landlord')
+def api_arrears():
+    owner_id = session.get('user_id') if session.get('role') == 'landlord' else None
+    try:
+        rows = ledger.arrears_report(owner_id)
+        total_arrears = sum(r['arrears'] for r in rows)
+        names = {s['user_id']: s for s in ref_cache.get_reference('students')}
+        for r in rows:
+            student = names.get(r['user_id'], {})
+            r['username'] = student.get('username')
+            r['first_name'] = student.get('first_name')
+            r['last_name'] = student.get('last_name')
+            for key in ('charged', 'paid', 'prepaid', 'balance', 'arrears'):
+                if key in r:
+                    r[key] = to_pesos(r[key])
+        return jsonify({
+            'as_of': datetime.now().strftime('%Y-%m-%d'),
+            'total_arrears': to_pesos(total_arrears),
+            'students': rows
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/projection')
+@role_required('admin', 'landlord')
+def api_projection():
+    """Expected revenue, collection and at-risk amounts: ?months=3|6|12[&building_id=]"""
+    months = request.args.get('months', projection.PROJECTION_MONTHS, type=int)
+    if months < 1:
+        return jsonify({'error': 'months must be a positive number'}), 400
+    owner_id = session.get('user_id') if session.get('role') == 'landlord' else None
+    try:
+        return jsonify(projection.projection_report(months, owner_id=owner_id,
+                                                    building_id=request.args.get('building_id', type=int)))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _vacancy_args():
+    """(start, end, group, building_id) from the query string; raises ValueError when invalid."""
+    default_start, default_end = vacancy.default_range()
+    start = request.args.get('start') or default_start
+    end = request.args.get('end') or default_end
+    group = request.args.get('group', 'building')
+    datetime.strptime(start, '%Y-%m-%d')
+    datetime.strptime(end, '%Y-%m-%d')
+    if start > end:
+        raise ValueError('start must not be after end')
+    if group not in vacancy.GROUPS:
+        raise ValueError(f"group must be one of: {', '.join(vacancy.GROUPS)}")
+    return start, end, group, request.args.get('building_id', type=int)
+
+
+@app.route('/api/vacancy')
+@role_required('admin', 'landlord')
+def api_vacancy():
+    """Vacant bed-days and lost revenue: ?start=&end=&group=room|floor|building|type|month[&building_id=]"""
+    try:
+        start, end, group, building_id = _vacancy_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    owner_id = session.get('user_id') if session.get('role') == 'landlord' else None
+    try:
+        return jsonify(vacancy.vacancy_report(start, end, group, owner_id=owner_id, building_id=building_id))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/export/vacancy')
+@role_required('admin', 'landlord')
+def export_vacancy():
+    owner_id = session.get('user_id') if session.get('role') == 'landlord' else None
+    try:
+        start, end, group, building_id = _vacancy_args()
+        report = vacancy.vacancy_report(start, end, group, owner_id=owner_id, building_id=building_id)
+        si = StringIO()
+        cw = csv.writer(si)
+        columns = list(report['rows'][0].keys()) if report['rows'] else list(vacancy.GROUPS[group])
+        cw.writerow(columns)
+        for r in report['rows']:
+            cw.writerow([r.get(c) for c in columns])
+        filename = f"vacancy_{group}_{start}_{end}.csv"
+        return Response(si.getvalue(), mimetype='text/csv', headers={"Content-Disposition": f"attachment;filename={filename}"})
+    except Exception as e:
+        flash(f'Error exporting vacancy report: {e}', 'danger')
+        return redirect(url_for('reports'))
+
+
+@app.route('/export/arrears')
+@role_required('admin', 'landlord')
+def export_arrears():
+    owner_id = session.get('user_id') if session.get('role') == 'landlord' else None
+    try:
+        rows = ledger.arrears_report(owner_id)
+        names = {s['user_id']: s for s in ref_cache.get_reference('students')}
+        si = StringIO()
+        cw = csv.writer(si)
+        cw.writerow(['user_id', 'username', 'first_name', 'last_name', 'charged', 'paid', 'arrears', 'arrears_since'])
+        for r in rows:
+            student = names.get(r['user_id'], {})
+            cw.writerow([r['user_id'], student.get('username'), student.get('first_name'), student.get('last_name'),
+                         to_pesos(r['charged']), to_pesos(r['paid']), to_pesos(r['arrears']), r['arrears_since']])
+        filename = f"arrears_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.csv"
+        return Response(si.getvalue(), mimetype='text/csv', headers={"Content-Disposition": f"attachment;filename={filename}"})
+    except Exception as e:
+        flash(f'Error exporting arrears: {e}', 'danger')
+        return redirect(url_for('payments'))
+
+
 @app.route('/export/reports')
 @role_required('admin')
 def export_reports():
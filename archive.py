@@ -0,0 +1,260 @@
+"""
+Cold-data archival.
+
+Completed or cancelled assignments that ended more than ARCHIVE_AFTER_TERMS
+academic terms ago, together with their payments, are moved into a separate
+archive database (ARCHIVE_PATH, attached as `archive`) in batches of
+ARCHIVE_BATCH assignments, one transaction per batch. Leases that still carry
+a balance are never archived, so student balances do not change.
+
+Reads stay on the small hot tables by default. table_source() returns a
+UNION ALL of hot and archived rows only when the requested date range reaches
+back into archived history, and archived payment totals are kept per landlord
+and student so the payment stats stay complete without scanning the archive.
+
+    flask --app app archive [--terms N] [--batch N] [--dry-run]
+"""
+
+import os
+from datetime import date
+from pathlib import Path
+
+import ledger
+from db import MONEY_IN_CENTS_VERSION, TERM_START_MONTHS, get_db_path, migrate_money_to_cents
+
+ARCHIVE_PATH = os.getenv('ARCHIVE_PATH', '')
+ARCHIVE_AFTER_TERMS = int(os.getenv('ARCHIVE_AFTER_TERMS', '4'))
+ARCHIVE_BATCH = int(os.getenv('ARCHIVE_BATCH', '500'))
+
+# table -> (primary key, date that decides whether a range reaches into the archive)
+ARCHIVED_TABLES = {
+    'room_assignments': ('assignment_id', 'COALESCE(end_date, start_date)'),
+    'payments': ('payment_id', 'payment_date'),
+}
+
+
+def get_archive_path():
+    if ARCHIVE_PATH:
+        return ARCHIVE_PATH
+    return os.path.join(os.path.dirname(get_db_path()) or '.', 'archive.db')
+
+
+def term_start(day=None, terms_back=0):
+    """First day of the academic term containing `day`, or of the term `terms_back` terms earlier."""
+    day = day or date.today()
+    year = day.year
+    index = max(i for i, month in enumerate(TERM_START_MONTHS) if month <= day.month) - terms_back
+    year += index // len(TERM_START_MONTHS)
+    return date(year, TERM_START_MONTHS[index % len(TERM_START_MONTHS)], 1)
+
+
+def _columns(cursor, table, schema='main'):
+    # table_info leaves out generated columns, which are recomputed rather than stored
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [(row['name'], row['type']) for row in cursor.fetchall()]
+
+
+def is_attached(cursor):
+    cursor.execute("PRAGMA database_list")
+    return any(row['name'] == 'archive' for row in cursor.fetchall())
+
+
+def attach(cursor, create=False):
+    """
+    Attach the archive database as `archive`. Returns False when there is no
+    archive yet (and create is False). Read-only connections attach it read-only.
+    """
+    if is_attached(cursor):
+        return True
+    path = get_archive_path()
+    if not create and not os.path.exists(path):
+        return False
+    cursor.execute("PRAGMA query_only")
+    if cursor.fetchone()[0]:
+        cursor.execute("ATTACH DATABASE ? AS archive", (Path(path).resolve().as_uri() + '?mode=ro',))
+    else:
+        cursor.execute("ATTACH DATABASE ? AS archive", (path,))
+    if create:
+        _ensure_schema(cursor)
+    return True
+
+
+def _ensure_schema(cursor):
+    """Create the archive tables, adding any column the hot table has gained since."""
+    cursor.execute("SELECT COUNT(*) FROM archive.sqlite_master")
+    if cursor.fetchone()[0] == 0:
+        # A new archive only ever receives rows already in cents
+        cursor.execute(f"PRAGMA archive.user_version = {MONEY_IN_CENTS_VERSION}")
+    for table, (key, _) in ARCHIVED_TABLES.items():
+        columns = _columns(cursor, table)
+        definitions = ', '.join(f"{name} {col_type}" for name, col_type in columns)
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} ({definitions}, PRIMARY KEY ({key}))")
+        existing = {name for name, _ in _columns(cursor, table, 'archive')}
+        for name, col_type in columns:
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {col_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_payments_date ON payments(payment_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_assignments_start ON room_assignments(start_date)")
+    # Newest archived date per table: reads reaching back past it need the archive
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive.archive_meta (
+            table_name VARCHAR(50) PRIMARY KEY,
+            newest_date DATE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive.payment_totals (
+            owner_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL DEFAULT 0,  -- cents (money.py)
+            payments INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (owner_id, user_id)
+        )
+    """)
+
+
+def migrate_money(cursor):
+    """Convert an existing archive's money columns to integer cents (see db.migrate_money_to_cents)."""
+    if not attach(cursor):
+        return
+    cursor.execute("PRAGMA archive.user_version")
+    if cursor.fetchone()[0] >= MONEY_IN_CENTS_VERSION:
+        return
+    cursor.execute("UPDATE archive.payment_totals SET amount = CAST(ROUND(amount * 100) AS INTEGER)")
+    migrate_money_to_cents(cursor, schema='archive')
+
+
+def table_source(cursor, table, date_from=None):
+    """
+    SQL to select `table` from: the hot table, or a UNION ALL with its archive
+    when `date_from` is on or before the newest archived row.
+    """
+    if not date_from or not attach(cursor):
+        return table
+    cursor.execute("SELECT newest_date FROM archive.archive_meta WHERE table_name = ?", (table,))
+    row = cursor.fetchone()
+    if row is None or row['newest_date'] is None or date_from > row['newest_date']:
+        return table
+    return _union(cursor, table)
+
+
+def _union(cursor, table):
+    columns = ', '.join(name for name, _ in _columns(cursor, table))
+    return f"(SELECT {columns} FROM main.{table} UNION ALL SELECT {columns} FROM archive.{table})"
+
+
+def history_sources(cursor, date_from=None):
+    """
+    Sources for payments and room_assignments that are read together: when
+    either needs its archive, both get it, so archived payments still join
+    their archived assignments.
+    """
+    sources = {table: table_source(cursor, table, date_from) for table in ARCHIVED_TABLES}
+    if any(source != table for table, source in sources.items()):
+        sources = {table: _union(cursor, table) for table in ARCHIVED_TABLES}
+    return sources
+
+
+def archived_payment_totals(cursor, owner_id=None, user_id=None):
+    """(amount, count) of archived payments, optionally for one landlord and/or student."""
+    if not attach(cursor):
+        return 0, 0
+    query = "SELECT COALESCE(SUM(amount), 0) AS amount, COALESCE(SUM(payments), 0) AS payments FROM archive.payment_totals WHERE 1 = 1"
+    params = []
+    if owner_id is not None:
+        query += " AND owner_id = ?"
+        params.append(owner_id)
+    if user_id is not None:
+        query += " AND user_id = ?"
+        params.append(user_id)
+    cursor.execute(query, params)
+    row = cursor.fetchone()
+    return row['amount'], row['payments']
+
+
+def _rebuild_payment_totals(cursor):
+    cursor.execute("DELETE FROM archive.payment_totals")
+    cursor.execute("""
+        INSERT INTO archive.payment_totals (owner_id, user_id, amount, payments)
+        SELECT COALESCE(b.owner_id, 0), COALESCE(p.user_id, 0), SUM(p.amount), COUNT(*)
+        FROM archive.payments p
+        LEFT JOIN archive.room_assignments ra ON p.assignment_id = ra.assignment_id
+        LEFT JOIN main.rooms r ON ra.room_id = r.room_id
+        LEFT JOIN main.buildings b ON r.building_id = b.building_id
+        GROUP BY 1, 2
+    """)
+
+
+def _settled(ledger_rows, assignment_id):
+    # Cancelled leases are not billed and have no ledger row
+    row = ledger_rows.get(assignment_id)
+    return row is None or abs(row['charged'] - row['paid'] - row['prepaid']) < 0.005
+
+
+def archive_old_records(conn, terms=None, batch_size=None, dry_run=False):
+    """
+    Move eligible assignments and their payments into the archive.
+    Returns {'cutoff', 'assignments', 'payments', 'batches'}.
+    """
+    terms = ARCHIVE_AFTER_TERMS if terms is None else terms
+    batch_size = batch_size or ARCHIVE_BATCH
+    cutoff = term_start(terms_back=terms).isoformat()
+    ledger_rows = ledger.get_ledger()['assignments']
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT assignment_id FROM room_assignments
+        WHERE status IN ('completed', 'cancelled')
+          AND COALESCE(end_date, start_date, created_at) < ?
+        ORDER BY assignment_id
+    """, (cutoff,))
+    eligible = [row['assignment_id'] for row in cursor.fetchall()
+                if _settled(ledger_rows, row['assignment_id'])]
+    summary = {'cutoff': cutoff, 'assignments': len(eligible), 'payments': 0, 'batches': 0}
+    if dry_run or not eligible:
+        for start in range(0, len(eligible), batch_size):
+            ids = eligible[start:start + batch_size]
+            cursor.execute(f"SELECT COUNT(*) FROM payments WHERE assignment_id IN ({','.join('?' * len(ids))})", ids)
+            summary['payments'] += cursor.fetchone()[0]
+        cursor.close()
+        return summary
+
+    attach(cursor, create=True)
+    a_cols = ', '.join(name for name, _ in _columns(cursor, 'room_assignments'))
+    p_cols = ', '.join(name for name, _ in _columns(cursor, 'payments'))
+    try:
+        for start in range(0, len(eligible), batch_size):
+            ids = eligible[start:start + batch_size]
+            marks = ','.join('?' * len(ids))
+            # Archive inserts replace by primary key, so a batch interrupted
+            # between the two files' commits is completed by the next run
+            cursor.execute(f"INSERT OR REPLACE INTO archive.payments ({p_cols}) "
+                           f"SELECT {p_cols} FROM main.payments WHERE assignment_id IN ({marks})", ids)
+            cursor.execute(f"INSERT OR REPLACE INTO archive.room_assignments ({a_cols}) "
+                           f"SELECT {a_cols} FROM main.room_assignments WHERE assignment_id IN ({marks})", ids)
+            for table, (_, date_column) in ARCHIVED_TABLES.items():
+                cursor.execute(f"""
+                    INSERT INTO archive.archive_meta (table_name, newest_date)
+                    VALUES (?, (SELECT MAX({date_column}) FROM archive.{table}))
+                    ON CONFLICT(table_name) DO UPDATE SET newest_date = excluded.newest_date
+                """, (table,))
+            cursor.execute(f"DELETE FROM main.payments WHERE assignment_id IN ({marks})", ids)
+            summary['payments'] += cursor.rowcount
+            cursor.execute(f"DELETE FROM main.room_assignments WHERE assignment_id IN ({marks})", ids)
+            # Archived rows still exist: drop the sync tombstones the deletes left
+            cursor.execute(f"""
+                DELETE FROM main.sync_tombstones
+                WHERE (table_name = 'room_assignments' AND row_id IN ({marks}))
+                   OR (table_name = 'payments' AND row_id IN (
+                       SELECT payment_id FROM archive.payments WHERE assignment_id IN ({marks})))
+            """, ids + ids)
+            conn.commit()
+            summary['batches'] += 1
+        _rebuild_payment_totals(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return summary
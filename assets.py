@@ -0,0 +1,194 @@
+"""
+Static asset pipeline.
+Fingerprints the assets referenced from templates through asset_url(), writes
+precompressed .gz/.br variants and optimized images into static/dist/, and
+serves them with year-long immutable caching.
+
+Run this as part of a deployment:
+    python assets.py
+    flask --app app build-assets
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from pathlib import Path
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli  # Optional: enables .br variants
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image  # Optional: enables image resizing/optimization
+except ImportError:
+    Image = None
+
+BASE_DIR = Path(__file__).resolve().parent
+STATIC_DIR = BASE_DIR / 'static'
+TEMPLATES_DIR = BASE_DIR / 'templates'
+DIST_DIR = STATIC_DIR / 'dist'
+MANIFEST_PATH = DIST_DIR / 'manifest.json'
+
+# One year, the longest max-age browsers honor
+IMMUTABLE_MAX_AGE = 31536000
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.map'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+MAX_IMAGE_WIDTH = int(os.getenv('ASSET_MAX_IMAGE_WIDTH', '1920'))
+JPEG_QUALITY = int(os.getenv('ASSET_JPEG_QUALITY', '82'))
+
+# Matches asset_url('css/bootstrap.min.css') / asset_url("images/logIn.jpg")
+ASSET_REFERENCE = re.compile(r"""asset_url\(\s*['"]([^'"]+)['"]\s*\)""")
+
+_manifest = None
+
+
+def find_referenced_assets():
+    """
+    Scan the templates for asset_url() calls.
+    Returns the sorted list of static paths that are actually used.
+    """
+    referenced = set()
+    for template in TEMPLATES_DIR.glob('*.html'):
+        referenced.update(ASSET_REFERENCE.findall(template.read_text(encoding='utf-8')))
+    return sorted(referenced)
+
+
+def _optimize_image(source, target):
+    """Downscale oversized images and re-encode them. Falls back to a plain copy without Pillow."""
+    if Image is None:
+        shutil.copyfile(source, target)
+        return
+    with Image.open(source) as img:
+        if img.width > MAX_IMAGE_WIDTH:
+            height = round(img.height * MAX_IMAGE_WIDTH / img.width)
+            img = img.resize((MAX_IMAGE_WIDTH, height), Image.LANCZOS)
+        if source.suffix.lower() in ('.jpg', '.jpeg'):
+            img.convert('RGB').save(target, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            img.save(target, 'PNG', optimize=True)
+    # Never ship an "optimized" file that is larger than the original
+    if target.stat().st_size > source.stat().st_size:
+        shutil.copyfile(source, target)
+
+
+def _write_compressed_variants(path):
+    data = path.read_bytes()
+    with gzip.open(f'{path}.gz', 'wb', compresslevel=9) as f:
+        f.write(data)
+    if brotli is not None:
+        Path(f'{path}.br').write_bytes(brotli.compress(data, quality=11))
+
+
+def build_assets(paths=None):
+    """
+    Build fingerprinted copies of the given static paths (defaults to every
+    asset referenced from the templates) and write the manifest.
+    Returns the manifest dict mapping logical path -> fingerprinted path.
+    """
+    global _manifest
+    paths = find_referenced_assets() if paths is None else paths
+
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    DIST_DIR.mkdir(parents=True)
+
+    manifest = {}
+    for logical in paths:
+        source = STATIC_DIR / logical
+        if not source.is_file():
+            print(f"Skipping missing asset: {logical}")
+            continue
+
+        relative = Path(logical)
+        staging = DIST_DIR / relative
+        staging.parent.mkdir(parents=True, exist_ok=True)
+
+        if source.suffix.lower() in IMAGE_EXTENSIONS:
+            _optimize_image(source, staging)
+        else:
+            shutil.copyfile(source, staging)
+
+        digest = hashlib.sha256(staging.read_bytes()).hexdigest()[:12]
+        hashed = relative.with_name(f"{relative.stem}.{digest}{relative.suffix}")
+        target = DIST_DIR / hashed
+        staging.replace(target)
+
+        if target.suffix.lower() in COMPRESSIBLE_EXTENSIONS:
+            _write_compressed_variants(target)
+
+        manifest[logical] = hashed.as_posix()
+        print(f"  {logical} -> dist/{hashed.as_posix()}")
+
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    _manifest = manifest
+    return manifest
+
+
+def load_manifest():
+    """Return the build manifest, or an empty dict when assets have not been built."""
+    global _manifest
+    if _manifest is None:
+        try:
+            _manifest = json.loads(MANIFEST_PATH.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(path):
+    """
+    Template helper: URL of a static asset.
+    Emits the fingerprinted /assets/ URL when the asset has been built, and the
+    plain /static/ URL otherwise so development works without a build step.
+    """
+    hashed = load_manifest().get(path)
+    if hashed:
+        return url_for('serve_asset', filename=hashed)
+    return url_for('static', filename=path)
+
+
+def send_asset(filename):
+    """
+    Serve a fingerprinted asset, preferring a precompressed variant the client accepts.
+    Files go through send_from_directory, so WSGI servers that provide
+    wsgi.file_wrapper (gunicorn, uWSGI) transmit them with sendfile().
+    """
+    accepted = request.accept_encodings
+    encoding = None
+    served = filename
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and (DIST_DIR / f'{filename}{suffix}').is_file():
+            encoding, served = candidate, f'{filename}{suffix}'
+            break
+
+    response = send_from_directory(DIST_DIR, served, max_age=IMMUTABLE_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        # Keep the original media type rather than application/gzip
+        response.headers['Content-Type'] = _guess_type(filename)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _guess_type(filename):
+    mimetype, _ = mimetypes.guess_type(filename)
+    mimetype = mimetype or 'application/octet-stream'
+    if mimetype.startswith('text/') or mimetype == 'application/javascript':
+        mimetype += '; charset=utf-8'
+    return mimetype
+
+
+if __name__ == '__main__':
+    print("Building static assets...")
+    result = build_assets()
+    print(f"Built {len(result)} assets into {DIST_DIR}")
@@ -0,0 +1,269 @@
+"""
+Date-range room availability search.
+
+An in-memory interval index over non-cancelled room_assignments answers
+"which rooms have a free bed from <start> to <end>" without scanning
+assignment history. Per room, intervals are kept sorted by start date
+together with a running maximum of end dates (overlap test in one binary
+search) and a sorted list of end dates (overlap count in two).
+
+The index is built lazily and updated in place by apply_assignment() when
+this process commits an assignment. When table_versions shows that another
+process changed room_assignments, only the rows listed in the change log
+since the last refresh are re-read (a full rebuild happens when there are
+too many or the log was compacted past them).
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+import changes
+from db import get_db_connection
+from ref_cache import get_table_versions
+
+# Open-ended assignments (no end_date) occupy the room indefinitely
+OPEN_END = date.max.toordinal()
+
+META_TABLES = ('buildings', 'rooms', 'room_types')
+
+# Catch up from the change log when at most this many assignments changed
+CATCH_UP_LIMIT = 500
+
+
+def to_ordinal(value):
+    """Convert a 'YYYY-MM-DD' string (or date) to a day number; None stays None."""
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class RoomIntervals:
+    """Sorted intervals for one room with a prefix maximum of end dates."""
+
+    __slots__ = ('starts', 'ends', 'ids', 'max_end', 'sorted_ends')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.max_end = []
+        self.sorted_ends = []
+
+    def add(self, start, end, assignment_id):
+        pos = bisect_right(self.starts, start)
+        self.starts.insert(pos, start)
+        self.ends.insert(pos, end)
+        self.ids.insert(pos, assignment_id)
+        insort(self.sorted_ends, end)
+        self._rebuild_max(pos)
+
+    def remove(self, assignment_id):
+        try:
+            pos = self.ids.index(assignment_id)
+        except ValueError:
+            return False
+        self.sorted_ends.pop(bisect_left(self.sorted_ends, self.ends[pos]))
+        del self.starts[pos], self.ends[pos], self.ids[pos]
+        self._rebuild_max(pos)
+        return True
+
+    def _rebuild_max(self, pos):
+        del self.max_end[pos:]
+        running = self.max_end[-1] if self.max_end else 0
+        for end in self.ends[pos:]:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def overlaps(self, start, end):
+        """True if any interval intersects [start, end] (both inclusive)."""
+        # Only intervals starting on or before `end` can intersect
+        count = bisect_right(self.starts, end)
+        return count > 0 and self.max_end[count - 1] >= start
+
+    def overlap_count(self, start, end):
+        """Number of intervals intersecting [start, end]."""
+        # Started by `end`, minus those that already finished before `start`
+        return bisect_right(self.starts, end) - bisect_left(self.sorted_ends, start)
+
+
+class AvailabilityIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.rooms = {}          # room_id -> room metadata dict
+        self.intervals = {}      # room_id -> RoomIntervals
+        self.locations = {}      # assignment_id -> room_id
+        self.stamp = None        # room_assignments version the intervals reflect
+        self.meta_stamp = None   # buildings/rooms/room_types versions the metadata reflects
+        self.seq = None          # change log position the intervals reflect
+
+    # -- building -----------------------------------------------------------
+
+    def _load_rooms(self, cursor):
+        cursor.execute("""
+            SELECT r.room_id, r.room_number, r.floor_number, r.building_id, r.type_id,
+                   b.building_name, b.owner_id, b.is_active AS building_active,
+                   rt.type_name, rt.capacity, rt.base_rate
+            FROM rooms r
+            LEFT JOIN buildings b ON r.building_id = b.building_id
+            LEFT JOIN room_types rt ON r.type_id = rt.type_id
+        """)
+        self.rooms = {row['room_id']: dict(row) for row in cursor.fetchall()}
+
+    def _load_intervals(self, cursor):
+        # Taken before loading: anything written meanwhile is replayed on catch-up
+        self.seq = changes.latest_seq(cursor)
+        cursor.execute("""
+            SELECT assignment_id, room_id, start_date, end_date
+            FROM room_assignments
+            WHERE status != 'cancelled' AND room_id IS NOT NULL AND start_date IS NOT NULL
+            ORDER BY room_id, start_date
+        """)
+        intervals = {}
+        locations = {}
+        for row in cursor.fetchall():
+            room = intervals.get(row['room_id'])
+            if room is None:
+                room = intervals[row['room_id']] = RoomIntervals()
+            start = to_ordinal(row['start_date'])
+            end = to_ordinal(row['end_date']) or OPEN_END
+            # Rows arrive sorted by start, so appending keeps the lists ordered
+            room.starts.append(start)
+            room.ends.append(end)
+            room.ids.append(row['assignment_id'])
+            room.max_end.append(max(end, room.max_end[-1]) if room.max_end else end)
+            locations[row['assignment_id']] = row['room_id']
+        for room in intervals.values():
+            room.sorted_ends = sorted(room.ends)
+        self.intervals = intervals
+        self.locations = locations
+
+    def ensure_fresh(self, cursor):
+        """Reload whatever another process has changed since the index was built."""
+        versions = get_table_versions(cursor)
+        meta_stamp = tuple(versions.get(t, 0) for t in META_TABLES)
+        with self._lock:
+            if self.meta_stamp != meta_stamp:
+                self._load_rooms(cursor)
+                self.meta_stamp = meta_stamp
+            if self.stamp != versions.get('room_assignments', 0):
+                if not self._catch_up(cursor):
+                    self._load_intervals(cursor)
+                self.stamp = versions.get('room_assignments', 0)
+
+    def _catch_up(self, cursor):
+        """Re-index only the assignments changed since self.seq; False if a rebuild is needed."""
+        if self.seq is None:
+            return False
+        batch = changes.read_changes(cursor, self.seq, tables=('room_assignments',), limit=CATCH_UP_LIMIT)
+        if batch['resync'] or batch['more']:
+            return False
+        for assignment_id in changes.changed_rows(batch['changes']).get('room_assignments', {}):
+            self._reindex(cursor, assignment_id)
+        self.seq = batch['last_seq']
+        return True
+
+    # -- incremental maintenance -------------------------------------------
+
+    def apply_assignment(self, cursor, assignment_id, row_writes=1):
+        """
+        Re-index one assignment after it was inserted or updated.
+        Call once the write has been committed, so a rolled-back write never
+        reaches the index: `row_writes` is the number of room_assignments rows
+        the caller changed, so any other change to the table (including one
+        committed in between) is detected and triggers a rebuild.
+        """
+        with self._lock:
+            if self.stamp is None:
+                return  # Not built yet; the first search loads everything
+
+            self._reindex(cursor, assignment_id)
+
+            version = get_table_versions(cursor).get('room_assignments', 0)
+            if version == self.stamp + row_writes:
+                self.stamp = version
+            else:
+                self.stamp = -1  # Someone else wrote too: catch up on next search
+
+    def _reindex(self, cursor, assignment_id):
+        """Replace one assignment's interval with its current row (removing it if gone or cancelled)."""
+        cursor.execute("""
+            SELECT room_id, start_date, end_date, status
+            FROM room_assignments WHERE assignment_id = ?
+        """, (assignment_id,))
+        row = cursor.fetchone()
+
+        old_room = self.locations.pop(assignment_id, None)
+        if old_room is not None and old_room in self.intervals:
+            self.intervals[old_room].remove(assignment_id)
+
+        if row and row['status'] != 'cancelled' and row['room_id'] and row['start_date']:
+            room = self.intervals.get(row['room_id'])
+            if room is None:
+                room = self.intervals[row['room_id']] = RoomIntervals()
+            room.add(to_ordinal(row['start_date']), to_ordinal(row['end_date']) or OPEN_END, assignment_id)
+            self.locations[assignment_id] = row['room_id']
+
+    # -- searching ----------------------------------------------------------
+
+    def search(self, start, end, building_id=None, floor_number=None, type_id=None,
+               min_capacity=None, min_rate=None, max_rate=None, owner_id=None, beds=1):
+        """
+        Return metadata dicts of rooms that keep at least `beds` beds free for the
+        whole of [start, end] (ISO dates, inclusive) and match every given filter.
+        min_rate/max_rate are integer cents, like base_rate.
+        Each room dict gets a 'free_beds' key. Every assignment overlapping the
+        range is counted as holding a bed for all of it, so the answer is safe
+        even when leases inside the range do not overlap each other.
+        """
+        start, end = to_ordinal(start), to_ordinal(end)
+        results = []
+        with self._lock:
+            for room_id, room in self.rooms.items():
+                if not room['building_active']:
+                    continue
+                if owner_id is not None and room['owner_id'] != owner_id:
+                    continue
+                if building_id is not None and room['building_id'] != building_id:
+                    continue
+                if floor_number is not None and room['floor_number'] != floor_number:
+                    continue
+                if type_id is not None and room['type_id'] != type_id:
+                    continue
+                if min_capacity is not None and (room['capacity'] or 0) < min_capacity:
+                    continue
+                if min_rate is not None and (room['base_rate'] or 0) < min_rate:
+                    continue
+                if max_rate is not None and (room['base_rate'] or 0) > max_rate:
+                    continue
+                capacity = room['capacity'] or 1
+                intervals = self.intervals.get(room_id)
+                if intervals is None:
+                    free = capacity
+                elif capacity == 1:
+                    free = 0 if intervals.overlaps(start, end) else 1
+                else:
+                    free = capacity - intervals.overlap_count(start, end)
+                if free < beds:
+                    continue
+                results.append(dict(room, free_beds=free))
+        results.sort(key=lambda r: (r['building_name'] or '', r['floor_number'] or 0, r['room_number']))
+        return results
+
+
+index = AvailabilityIndex()
+
+
+def search_available_rooms(start, end, **filters):
+    """Refresh the shared index if needed and run a search (see AvailabilityIndex.search)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        index.ensure_fresh(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    return index.search(start, end, **filters)
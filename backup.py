@@ -0,0 +1,207 @@
+"""
+Online database backups.
+
+Snapshots are taken with the SQLite backup API (sqlite3.Connection.backup)
+while the app keeps running: BACKUP_PAGES_PER_STEP pages are copied at a time
+and the copier pauses BACKUP_STEP_SLEEP seconds between steps, so it holds the
+source only briefly and never blocks writers for long. Every copy is checked
+with PRAGMA integrity_check before it is kept, then optionally gzipped, and
+old snapshots beyond the retention count are deleted.
+
+    flask --app app backup [--compress] [--keep N]
+    flask --app app backup-schedule --every 360     # minutes, runs until stopped
+    flask --app app verify-backup <file>
+    flask --app app restore-backup <file>
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from db import get_db_path, get_db_connection, restore_database
+
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'database/backups')
+PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', '0.01'))
+KEEP = int(os.getenv('BACKUP_KEEP', '14'))
+COMPRESS = os.getenv('BACKUP_COMPRESS', 'False').lower() == 'true'
+
+# If the source is not in WAL mode, a write from another connection restarts
+# a stepped backup; after this many restarts the copy is finished in one step
+MAX_RESTARTS = 5
+
+SNAPSHOT_PREFIX = 'manager-'
+
+
+class BackupError(Exception):
+    """Raised when a backup copy fails verification."""
+
+
+def _integrity_check(conn):
+    rows = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+    return rows == ['ok'], rows
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _copy(source, dest, pages, sleep):
+    """Stepped copy of `source` into `dest`; returns (pages copied, restarts)."""
+    state = {'remaining': None, 'restarts': 0, 'total': 0}
+
+    def progress(status, remaining, total):
+        # `remaining` only grows when the backup restarted after a concurrent write
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise _Restarted()
+        state['remaining'], state['total'] = remaining, total
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    try:
+        source.backup(dest, pages=pages, progress=progress)
+    except _Restarted:
+        source.backup(dest, pages=-1)
+    return state['total'], state['restarts']
+
+
+def create_backup(dest_dir=None, pages=None, sleep=None, compress=None):
+    """
+    Take a verified snapshot of the live database.
+    Returns a dict with the snapshot path, size, page count, restarts and elapsed seconds.
+    """
+    dest_dir = dest_dir or BACKUP_DIR
+    pages = pages or PAGES_PER_STEP
+    sleep = STEP_SLEEP if sleep is None else sleep
+    compress = COMPRESS if compress is None else compress
+    os.makedirs(dest_dir, exist_ok=True)
+
+    name = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}.db"
+    final_path = os.path.join(dest_dir, name + ('.gz' if compress else ''))
+    partial_path = os.path.join(dest_dir, name + '.partial')
+
+    started = time.perf_counter()
+    source = sqlite3.connect(get_db_path(), isolation_level=None)
+    dest = sqlite3.connect(partial_path)
+    try:
+        # Pin one WAL read snapshot for the whole copy: writers carry on
+        # appending to the WAL and the stepped copy never has to restart
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        total, restarts = _copy(source, dest, pages, sleep)
+        ok, problems = _integrity_check(dest)
+        if not ok:
+            raise BackupError(f"Backup failed integrity check: {problems[:5]}")
+        # A snapshot is a standalone file: no -wal/-shm companions
+        dest.execute("PRAGMA journal_mode = DELETE")
+    except Exception:
+        dest.close()
+        os.remove(partial_path)
+        raise
+    finally:
+        source.close()
+    dest.close()
+
+    if compress:
+        with open(partial_path, 'rb') as raw, gzip.open(final_path + '.partial', 'wb', compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, 1024 * 1024)
+        os.remove(partial_path)
+        partial_path = final_path + '.partial'
+    os.replace(partial_path, final_path)
+
+    return {
+        'path': final_path,
+        'size': os.path.getsize(final_path),
+        'pages': total,
+        'restarts': restarts,
+        'elapsed': time.perf_counter() - started,
+    }
+
+
+def list_backups(dest_dir=None):
+    """Snapshot paths, oldest first (names sort by timestamp)."""
+    dest_dir = dest_dir or BACKUP_DIR
+    if not os.path.isdir(dest_dir):
+        return []
+    names = sorted(n for n in os.listdir(dest_dir)
+                   if n.startswith(SNAPSHOT_PREFIX) and (n.endswith('.db') or n.endswith('.db.gz')))
+    return [os.path.join(dest_dir, n) for n in names]
+
+
+def prune_backups(keep=None, dest_dir=None):
+    """Delete all but the newest `keep` snapshots; returns the deleted paths."""
+    keep = KEEP if keep is None else keep
+    snapshots = list_backups(dest_dir)
+    expired = snapshots[:-keep] if keep > 0 else snapshots
+    for path in expired:
+        os.remove(path)
+    return expired
+
+
+def _open_snapshot(path):
+    """Return (sqlite path, temp file to clean up or None); gzipped snapshots are unpacked first."""
+    if not path.endswith('.gz'):
+        return path, None
+    fd, tmp = tempfile.mkstemp(suffix='.db')
+    with os.fdopen(fd, 'wb') as raw, gzip.open(path, 'rb') as packed:
+        shutil.copyfileobj(packed, raw, 1024 * 1024)
+    return tmp, tmp
+
+
+def verify_backup(path):
+    """Run PRAGMA integrity_check on a snapshot. Returns (ok, messages)."""
+    db_file, tmp = _open_snapshot(path)
+    try:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        try:
+            return _integrity_check(conn)
+        finally:
+            conn.close()
+    finally:
+        if tmp:
+            os.remove(tmp)
+
+
+def restore_backup(path):
+    """
+    Replace the live database's contents with a verified snapshot. The copy
+    goes through the backup API into the open database, so other connections
+    see either the old or the restored data, never a half-copied file.
+    """
+    ok, problems = verify_backup(path)
+    if not ok:
+        raise BackupError(f"Refusing to restore a damaged backup: {problems[:5]}")
+
+    db_file, tmp = _open_snapshot(path)
+    try:
+        live = get_db_connection()
+        try:
+            # Also moves every table version past anything a running process has cached
+            restore_database(db_file, live)
+            live.execute("PRAGMA journal_mode = WAL")
+            live.commit()
+        finally:
+            live.close()
+    finally:
+        if tmp:
+            os.remove(tmp)
+
+
+def run_schedule(every_minutes, keep=None, compress=None, log=print):
+    """Take a snapshot and prune every `every_minutes` minutes until interrupted."""
+    while True:
+        started = time.time()
+        try:
+            result = create_backup(compress=compress)
+            removed = prune_backups(keep)
+            log(f"Backup {result['path']} ({result['size'] // 1024} KB, {result['elapsed']:.2f}s); "
+                f"pruned {len(removed)}")
+        except Exception as e:
+            log(f"Backup failed: {e}")
+        time.sleep(max(0, every_minutes * 60 - (time.time() - started)))
@@ -0,0 +1,86 @@
+"""
+Benchmark: write latency while an online backup runs.
+Fills a scratch database with payments, then keeps inserting payments from a
+writer thread (one transaction each, like record_payment) and reports write
+latency percentiles with no backup, during a stepped backup and during a
+one-step backup.
+
+Usage:
+    python benchmarks/bench_backup.py [payment rows]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0
+
+
+def measure_writes(action, settle=0.5):
+    """Run `action` while a writer thread inserts payments; return (latencies ms, action result)."""
+    from db import get_db_connection
+
+    latencies = []
+    stop = threading.Event()
+
+    def writer():
+        conn = get_db_connection()
+        while not stop.is_set():
+            started = time.perf_counter()
+            conn.execute("INSERT INTO payments (amount, payment_method, payment_date) VALUES (350000, 'cash', date('now'))")
+            conn.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.002)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(settle)
+    result = action()
+    stop.set()
+    thread.join()
+    return latencies, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    workdir = tempfile.mkdtemp(prefix='bench_backup_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'manager.db')
+    os.environ['BACKUP_DIR'] = os.path.join(workdir, 'backups')
+    try:
+        import db
+        import backup
+        db.init_db()
+        conn = db.get_db_connection()
+        conn.executemany(
+            "INSERT INTO payments (user_id, amount, payment_method, payment_date, notes) VALUES (?, ?, 'gcash', '2025-06-01', ?)",
+            ((i % 50, 350000, 'x' * 40) for i in range(rows)))
+        conn.commit()
+        conn.close()
+        print(f"{rows} payments, {os.path.getsize(os.environ['DB_PATH']) // 1024} KB")
+
+        scenarios = [
+            ('no backup', lambda: time.sleep(2)),
+            ('stepped backup', lambda: backup.create_backup()),
+            ('one-step backup', lambda: backup.create_backup(pages=-1, sleep=0)),
+        ]
+        for label, action in scenarios:
+            latencies, result = measure_writes(action)
+            extra = f"  backup {result['elapsed']:.2f}s, restarts={result['restarts']}" if result else ''
+            print(f"{label:<16} writes={len(latencies):>5}  p50={percentile(latencies, 50):6.2f}ms  "
+                  f"p99={percentile(latencies, 99):6.2f}ms  max={max(latencies):7.2f}ms{extra}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
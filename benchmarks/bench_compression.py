@@ -0,0 +1,83 @@
+"""
+Benchmark: response compression for rendered pages and exports.
+Fills the in-memory template database with a few thousand payments, then for
+each page reports the uncompressed and gzip sizes at several levels, the time
+spent compressing, and the estimated time to last byte over a slow mobile
+link (render time + compression + transfer).
+
+Usage:
+    python benchmarks/bench_compression.py [payments] [link_mbps]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGES = ['/payments', '/assignments', '/export/payments', '/api/vacancy?group=room']
+
+
+def populate(conn, payments):
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO payments (user_id, assignment_id, amount, payment_method, payment_date,
+                              payment_period_start, payment_period_end, receipt_number, recorded_by, notes)
+        SELECT 3 + i % 3, 1 + i % 3, 350000, 'cash', date('2025-01-01', '+' || (i % 300) || ' days'),
+               '2025-01-01', '2025-01-31', 'BENCH-' || i, 1, 'Monthly rent'
+        FROM n
+    """, (payments,))
+    conn.commit()
+
+
+def main():
+    payments = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    link_mbps = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+    workdir = tempfile.mkdtemp(prefix='bench_compression_')
+    os.environ['DB_PATH'] = ':memory:'
+    os.environ['DB_TEMPLATE'] = os.path.join(workdir, 'template.db')
+    os.environ['APP_SKIP_INIT'] = 'True'
+    try:
+        import template_db
+        with redirect_stdout(StringIO()):
+            template_db.build_template()
+        import app
+        import compression
+        import db
+        conn = db.get_db_connection()
+        populate(conn, payments)
+        conn.close()
+
+        client = app.app.test_client()
+        with client.session_transaction() as sess:
+            sess.update(user_id=1, username='admin', role='admin')
+
+        def transfer_ms(size):
+            return size * 8 / (link_mbps * 1e6) * 1000
+
+        print(f"{payments} extra payments, {link_mbps} Mbit/s link")
+        print(f"{'page':26} {'level':>5} {'bytes':>9} {'ratio':>6} {'server ms':>9} {'last byte ms':>12}")
+        for page in PAGES:
+            for level in (None, 1, 6, 9):
+                compression.ENABLED = level is not None
+                compression.LEVEL = level or 6
+                client.get(page, headers={'Accept-Encoding': 'gzip'})  # warm caches and templates
+                started = time.perf_counter()
+                response = client.get(page, headers={'Accept-Encoding': 'gzip'})
+                size = len(response.get_data())
+                server = (time.perf_counter() - started) * 1000
+                if level is None:
+                    plain = size
+                print(f"{page:26} {level or '-':>5} {size:9d} {plain / size:5.1f}x {server:9.1f} "
+                      f"{server + transfer_ms(size):12.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: first-request latency with and without the Jinja bytecode cache.
+Each scenario runs in a fresh interpreter, the same way a newly forked or
+autoscaled worker starts, and times the first render of a few pages.
+
+Usage:
+    python benchmarks/bench_first_request.py
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['/payments', '/assignments', '/rooms', '/users']
+
+WORKER = r"""
+import json, sys, time
+sys.path.insert(0, {root!r})
+from app import app
+
+client = app.test_client()
+with client.session_transaction() as sess:
+    sess['user_id'] = 1
+    sess['username'] = 'admin'
+    sess['role'] = 'admin'
+
+timings = {{}}
+for page in {pages!r}:
+    started = time.perf_counter()
+    client.get(page)
+    timings[page] = (time.perf_counter() - started) * 1000
+print(json.dumps(timings))
+"""
+
+
+def run_worker(env):
+    script = WORKER.format(root=ROOT, pages=PAGES)
+    result = subprocess.run([sys.executable, '-c', script], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='bench_templates_')
+    cache_dir = os.path.join(workdir, 'jinja')
+    base_env = dict(os.environ, DB_PATH=os.path.join(workdir, 'db', 'manager.db'), TEMPLATE_CACHE_DIR=cache_dir)
+
+    # Create and seed the database once so it is not part of any measurement
+    run_worker(dict(base_env, TEMPLATE_CACHE='False'))
+
+    scenarios = [
+        ('no bytecode cache', dict(base_env, TEMPLATE_CACHE='False')),
+        ('cold bytecode cache', dict(base_env, TEMPLATE_CACHE='True')),
+        ('warm bytecode cache', dict(base_env, TEMPLATE_CACHE='True')),
+        ('warm cache + precompile at start', dict(base_env, TEMPLATE_CACHE='True', PRECOMPILE_TEMPLATES='True')),
+    ]
+
+    try:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        print(f"{'scenario':<34}" + ''.join(f"{page:>14}" for page in PAGES))
+        for label, env in scenarios:
+            timings = run_worker(env)
+            print(f"{label:<34}" + ''.join(f"{timings[page]:>11.2f} ms" for page in PAGES))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: credential-stuffing burst against /login.
+Fires a burst of wrong-password attempts at real accounts from a handful of
+addresses, with throttling off and on, and reports the wall time and the
+number of password hashes the burst made the worker compute. Runs on the
+in-memory template database.
+
+Usage:
+    python benchmarks/bench_login_throttle.py [attempts]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workdir = tempfile.mkdtemp(prefix='bench_login_')
+    os.environ['DB_PATH'] = ':memory:'
+    os.environ['DB_TEMPLATE'] = os.path.join(workdir, 'template.db')
+    os.environ['APP_SKIP_INIT'] = 'True'
+    try:
+        import template_db
+        with redirect_stdout(StringIO()):
+            template_db.build_template()
+        import app
+        import throttle
+
+        hashes = [0]
+        check = app.check_password_hash
+
+        def counting(*args):
+            hashes[0] += 1
+            return check(*args)
+        app.check_password_hash = counting
+
+        users = ('admin', 'landlord1', 'student1', 'student2', 'student3')
+        for enabled in (False, True):
+            throttle.ENABLED = enabled
+            throttle.reset()
+            hashes[0] = 0
+            client = app.app.test_client()
+            codes = []
+            started = time.perf_counter()
+            for i in range(attempts):
+                response = client.post('/login', data={'username': users[i % len(users)], 'password': 'guess'},
+                                       environ_base={'REMOTE_ADDR': f'203.0.113.{i % 8}'})
+                codes.append(response.status_code)
+            elapsed = time.perf_counter() - started
+            print(f"throttle {'on ' if enabled else 'off'}  {elapsed:6.2f}s  {hashes[0]:4d} hashes  "
+                  f"{codes.count(429):4d} of {attempts} attempts got 429")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
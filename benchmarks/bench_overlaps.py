@@ -0,0 +1,94 @@
+"""
+Benchmark: assignment overlap validation.
+Fills a scratch database with back-to-back leases per student and room, then
+times single-write checks (index probes) at growing table sizes and one batch
+validation of many proposed assignments, half of which overlap something.
+
+Usage:
+    python benchmarks/bench_overlaps.py [rooms] [proposals]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def populate(conn, rooms, years=5):
+    """Single rooms, one student per room, non-overlapping yearly leases. Returns the lease count."""
+    conn.execute("INSERT INTO room_types (type_name, base_rate, capacity) VALUES ('Single', 500000, 1)")
+    conn.execute("INSERT INTO buildings (building_name) VALUES ('Bench')")
+    conn.executemany("INSERT INTO rooms (building_id, type_id, room_number) VALUES (1, 1, ?)",
+                     ((f"R{r}",) for r in range(rooms)))
+    first = date(date.today().year - years, 1, 1)
+    leases = []
+    for room in range(1, rooms + 1):
+        day = first
+        for _ in range(years * 2):
+            end = day + timedelta(days=170)
+            leases.append((room, room, day.isoformat(), end.isoformat()))
+            day = end + timedelta(days=12)
+    conn.executemany("""
+        INSERT INTO room_assignments (user_id, room_id, start_date, end_date, monthly_rate, status)
+        VALUES (?, ?, ?, ?, 500000, 'completed')
+    """, leases)
+    conn.commit()
+    return len(leases), first
+
+
+def proposals(count, rooms, first):
+    random.seed(5)
+    batch = []
+    for i in range(count):
+        room = random.randint(1, rooms)
+        # Even proposals land in the gap between two leases (valid), odd ones inside a lease
+        offset = random.randint(0, 8) * 182 + (171 if i % 2 == 0 else 30)
+        start = first + timedelta(days=offset)
+        end = start + timedelta(days=5 if i % 2 == 0 else 60)
+        batch.append({'user_id': room, 'room_id': room, 'start_date': start.isoformat(), 'end_date': end.isoformat()})
+    return batch
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    workdir = tempfile.mkdtemp(prefix='bench_overlaps_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'manager.db')
+    try:
+        import db
+        import overlaps
+        db.init_db()
+        conn = db.get_db_connection()
+        # Skip the change log and bed counters for the bulk load; they are not what is measured
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND (name LIKE '%_cdc_%' OR name LIKE '%_beds_%')").fetchall():
+            conn.execute(f"DROP TRIGGER {row['name']}")
+        n, first = populate(conn, rooms)
+        batch = proposals(count, rooms, first)
+        cursor = conn.cursor()
+        print(f"{n} existing leases, {count} proposals")
+
+        started = time.perf_counter()
+        for p in batch:
+            overlaps.check_assignment(cursor, p['user_id'], p['room_id'], p['start_date'], p['end_date'])
+        single = time.perf_counter() - started
+        print(f"single checks      {single / count * 1e6:8.1f} us per write")
+
+        started = time.perf_counter()
+        conflicts = overlaps.validate_batch(cursor, batch)
+        elapsed = time.perf_counter() - started
+        flagged = len({c['index'] for c in conflicts})
+        print(f"batch validation   {elapsed * 1000:8.1f} ms  ({flagged} of {count} proposals conflict)")
+        cursor.close()
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
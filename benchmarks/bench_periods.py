@@ -0,0 +1,89 @@
+"""
+Benchmark for the generated period columns: the "collected this month" stat
+of /payments, filtered with strftime() over payment_date (a full scan) and
+with the indexed payment_month column (an index range), as the payment
+history grows. Every history holds the same number of payments in the
+current month, so the indexed query should take about the same time at any
+size while the strftime() one grows with the table.
+
+Usage:
+    python benchmarks/bench_periods.py [largest history] [payments this month]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUERIES = {
+    'strftime()': """SELECT SUM(amount) FROM payments
+                     WHERE strftime('%Y-%m', payment_date) = strftime('%Y-%m', 'now')""",
+    'payment_month': "SELECT SUM(amount) FROM payments WHERE payment_month = strftime('%Y-%m', 'now')",
+}
+
+
+def populate(conn, older, this_month):
+    """Add `older` payments spread over the ten years before this month, plus `this_month` in it."""
+    first = date.today().replace(day=1).isoformat()
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO payments (user_id, amount, payment_method, payment_date)
+        SELECT 3 + i % 3, 350000, 'cash', date(?, '-' || (1 + i % 3650) || ' days')
+        FROM n
+    """, (older, first))
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO payments (user_id, amount, payment_method, payment_date)
+        SELECT 3 + i % 3, 350000, 'cash', date(?, '+' || (i % 28) || ' days')
+        FROM n
+    """, (this_month, first))
+    conn.commit()
+
+
+def timed(conn, query, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = conn.execute(query).fetchone()[0]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, total
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    this_month = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    workdir = tempfile.mkdtemp(prefix='bench_periods_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'manager.db')
+    try:
+        import db
+        db.init_db()
+        conn = db.get_db_connection()
+        # Skip the change log and sync triggers for the bulk load; they are not what is measured
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'payments'").fetchall():
+            conn.execute(f"DROP TRIGGER {row['name']}")
+        populate(conn, 0, this_month)
+        print(f"{this_month} payments in the current month")
+        print(f"{'history':>10}  " + '  '.join(f"{name:>14}" for name in QUERIES))
+
+        size, loaded = 10000, 0
+        while size <= largest:
+            populate(conn, size - loaded, 0)
+            loaded = size
+            conn.execute("ANALYZE")
+            results = [timed(conn, query) for query in QUERIES.values()]
+            assert len({total for _, total in results}) == 1, results
+            print(f"{size:>10,}  " + '  '.join(f"{elapsed * 1000:11.3f} ms" for elapsed, _ in results))
+            size *= 10
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
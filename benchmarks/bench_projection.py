@@ -0,0 +1,101 @@
+"""
+Benchmark: revenue projection over a large portfolio.
+Fills a scratch database with leases spread over buildings and a few
+payments per lease (some paid late, some not at all), then times a cold
+projection (load + compute), the compute step alone, and a cached call.
+
+Usage:
+    python benchmarks/bench_projection.py [leases]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def populate(conn, leases, buildings=200, rooms_per_building=50):
+    random.seed(7)
+    conn.executemany("INSERT INTO buildings (building_name, owner_id) VALUES (?, ?)",
+                     ((f"Building {b}", b % 20 + 1) for b in range(buildings)))
+    conn.executemany("INSERT INTO rooms (building_id, room_number) VALUES (?, ?)",
+                     ((b + 1, f"R{r}") for b in range(buildings) for r in range(rooms_per_building)))
+    n_rooms = buildings * rooms_per_building
+    today = date.today()
+
+    assignments, payments = [], []
+    for i in range(1, leases + 1):
+        start = date(today.year - random.randint(0, 1), random.randint(1, 12), 1)
+        end = None if random.random() < 0.2 else date(start.year + 1, start.month, 1)
+        rate = random.choice((350000, 400000, 500000, 650000))  # cents
+        status = 'pending' if start > today else 'active'
+        assignments.append((i, i % 5000 + 1, random.randint(1, n_rooms), start.isoformat(),
+                            end and end.isoformat(), rate, status))
+        habit = random.random()
+        for m in range(3):
+            if habit < 0.1:
+                break  # never pays
+            month = date(start.year + (start.month + m - 1) // 12, (start.month + m - 1) % 12 + 1, 1)
+            lag = 0 if habit < 0.7 else random.randint(1, 3)
+            paid = date(month.year + (month.month + lag - 1) // 12, (month.month + lag - 1) % 12 + 1, 5)
+            payments.append((i % 5000 + 1, i, rate, paid.isoformat(), month.isoformat()))
+    conn.executemany("""
+        INSERT INTO room_assignments (assignment_id, user_id, room_id, start_date, end_date, monthly_rate, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, assignments)
+    conn.executemany("""
+        INSERT INTO payments (user_id, assignment_id, amount, payment_method, payment_date, payment_period_start)
+        VALUES (?, ?, ?, 'cash', ?, ?)
+    """, payments)
+    conn.commit()
+    return len(payments)
+
+
+def main():
+    leases = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    workdir = tempfile.mkdtemp(prefix='bench_projection_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'manager.db')
+    try:
+        import db
+        import projection
+        db.init_db()
+        conn = db.get_db_connection()
+        # Skip the change log for the bulk load; it is not what is measured
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_cdc_%'").fetchall():
+            conn.execute(f"DROP TRIGGER {row['name']}")
+        n_payments = populate(conn, leases)
+        cursor = conn.cursor()
+        rows = projection._load(cursor, date.today())
+        cursor.close()
+        conn.close()
+        print(f"{leases} leases, {n_payments} payments")
+
+        started = time.perf_counter()
+        projection.compute_projection(*rows[:3])
+        compute = time.perf_counter() - started
+
+        started = time.perf_counter()
+        report = projection.projection_report(12)
+        cold = time.perf_counter() - started
+
+        started = time.perf_counter()
+        projection.projection_report(12)
+        warm = time.perf_counter() - started
+
+        print(f"compute only       {compute * 1000:8.1f} ms")
+        print(f"cold (load+compute){cold * 1000:8.1f} ms")
+        print(f"cached             {warm * 1000:8.1f} ms")
+        print(f"12-month expected revenue {report['expected_revenue']:,.2f}, "
+              f"collection {report['expected_collection']:,.2f}, at risk {report['at_risk']:,.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
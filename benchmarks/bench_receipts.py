@@ -0,0 +1,98 @@
+"""
+Concurrency check and benchmark for the receipt allocator.
+Several processes, each with a few threads, insert payments as fast as they
+can, each in its own transaction with an auto-allocated receipt number (as
+record_payment does). Afterwards every receipt must be unique and every
+insert must have succeeded. Runs once per allocation mode:
+in-transaction counter, and per-process block reservation.
+
+Usage:
+    python benchmarks/bench_receipts.py [processes] [threads] [inserts per thread]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def worker(db_path, block_size, threads, inserts, results):
+    os.environ['DB_PATH'] = db_path
+    os.environ['RECEIPT_BLOCK_SIZE'] = str(block_size)
+    from db import get_db_connection
+    import receipts
+
+    errors = []
+
+    def run():
+        for _ in range(inserts):
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                receipt_number = receipts.allocate_receipt(cursor)
+                cursor.execute("""
+                    INSERT INTO payments (amount, payment_method, payment_date, receipt_number)
+                    VALUES (?, 'cash', date('now'), ?)
+                """, (350000, receipt_number))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                errors.append(repr(e))
+            finally:
+                cursor.close()
+                conn.close()
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put(errors)
+
+
+def run_mode(label, block_size, processes, threads, inserts):
+    workdir = tempfile.mkdtemp(prefix='bench_receipts_')
+    db_path = os.path.join(workdir, 'manager.db')
+    os.environ['DB_PATH'] = db_path
+    import db
+    db.init_db()
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(db_path, block_size, threads, inserts, results))
+             for _ in range(processes)]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    errors = [e for _ in procs for e in results.get()]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    conn = db.get_db_connection()
+    total, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT receipt_number) FROM payments").fetchone()
+    conn.close()
+
+    expected = processes * threads * inserts
+    print(f"{label:<22} {total:>6} inserts in {elapsed:6.2f}s  {total / elapsed:8.0f}/s  "
+          f"unique={distinct == total}  failed={len(errors)}")
+    if errors:
+        print(f"  first error: {errors[0]}")
+    assert total == expected and distinct == total and not errors, "receipt allocation is not collision-free"
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    inserts = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    print(f"{processes} processes x {threads} threads x {inserts} inserts")
+    run_mode('in-transaction', 0, processes, threads, inserts)
+    run_mode('block reservation (50)', 50, processes, threads, inserts)
+
+
+if __name__ == '__main__':
+    main()
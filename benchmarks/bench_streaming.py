@@ -0,0 +1,84 @@
+"""
+Benchmark: streamed list pages.
+Fills the in-memory template database with many payments, then renders
+/payments both streamed (lazy rows, stream_template) and fully materialized
+(the whole result set and page built before the first byte), reporting time
+to first byte, total time and peak Python memory.
+
+Usage:
+    python benchmarks/bench_streaming.py [payments]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from io import StringIO
+from types import GeneratorType
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_compression import populate  # noqa: E402
+
+
+def measure(client, page):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(page, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_byte = time.perf_counter() - started
+    size = len(first) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - started
+    response.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, total, peak, size
+
+
+def main():
+    payments = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workdir = tempfile.mkdtemp(prefix='bench_streaming_')
+    os.environ['DB_PATH'] = ':memory:'
+    os.environ['DB_TEMPLATE'] = os.path.join(workdir, 'template.db')
+    os.environ['APP_SKIP_INIT'] = 'True'
+    os.environ['COMPRESS_ENABLED'] = 'False'
+    try:
+        import template_db
+        with redirect_stdout(StringIO()):
+            template_db.build_template()
+        import app
+        import db
+        conn = db.get_db_connection()
+        populate(conn, payments)
+        conn.close()
+
+        client = app.app.test_client()
+        with client.session_transaction() as sess:
+            sess.update(user_id=1, username='admin', role='admin')
+
+        streamed = app._streamed
+
+        def materialized(conn, template_name, **context):
+            context = {k: list(v) if isinstance(v, GeneratorType) else v for k, v in context.items()}
+            conn.close()
+            return app.render_template(template_name, **context)
+
+        print(f"/payments with {payments} extra payments")
+        for label, render in (('materialized', materialized), ('streamed', streamed)):
+            app._streamed = render
+            measure(client, '/payments')  # warm up templates and caches
+            first_byte, total, peak, size = measure(client, '/payments')
+            print(f"{label:13} first byte {first_byte * 1000:8.1f} ms   total {total * 1000:8.1f} ms   "
+                  f"peak memory {peak / 2**20:7.1f} MiB   {size / 2**20:.1f} MiB sent")
+        app._streamed = streamed
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
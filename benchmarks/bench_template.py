@@ -0,0 +1,66 @@
+"""
+Benchmark: fresh seeded database per test.
+Compares what a test suite pays for an isolated, seeded database each time:
+init_db + seed_database into a new file (the seeder hashes every password)
+against cloning the prebuilt template into a file or into the in-memory
+database with the SQLite backup API.
+
+Usage:
+    python benchmarks/bench_template.py [iterations]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(label, iterations, setup):
+    started = time.perf_counter()
+    for i in range(iterations):
+        setup(i)
+    elapsed = (time.perf_counter() - started) / iterations
+    print(f"{label:24} {elapsed * 1000:8.1f} ms per database")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    workdir = tempfile.mkdtemp(prefix='bench_template_')
+    template = os.path.join(workdir, 'template.db')
+    try:
+        import db
+        import seed_data
+        import template_db
+
+        def init_and_seed(i):
+            os.environ['DB_PATH'] = os.path.join(workdir, f'fresh_{i}.db')
+            with redirect_stdout(StringIO()):
+                db.init_db()
+                seed_data.seed_database()
+
+        def clone_to_file(i):
+            os.environ['DB_PATH'] = os.path.join(workdir, 'clone.db')
+            template_db.clone_template(template)
+
+        def clone_to_memory(i):
+            os.environ['DB_PATH'] = ':memory:'
+            template_db.clone_template(template)
+
+        with redirect_stdout(StringIO()):
+            template_db.build_template(template, force=True)
+        timed('init_db + seed', iterations, init_and_seed)
+        timed('clone into file', iterations, clone_to_file)
+        timed('clone into memory', iterations, clone_to_memory)
+        db.close_memory_db()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: vacancy sweep over a multi-year history.
+Builds rooms spread over buildings and room types, each with a run of
+back-to-back leases separated by random gaps, then times the sort-and-sweep
+(compute only), a cold report (load + sweep + grouping) and a cached report.
+
+Usage:
+    python benchmarks/bench_vacancy.py [rooms] [years]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def populate(conn, rooms, years, buildings=100):
+    random.seed(11)
+    conn.executemany("INSERT INTO room_types (type_name, base_rate, capacity) VALUES (?, ?, ?)",
+                     [('Single', 500000, 1), ('Double', 350000, 2), ('Quad', 250000, 4)])
+    conn.executemany("INSERT INTO buildings (building_name, owner_id) VALUES (?, ?)",
+                     ((f"Building {b}", b % 10 + 1) for b in range(buildings)))
+    first = date.today().replace(year=date.today().year - years, month=1, day=1)
+    conn.executemany("INSERT INTO rooms (building_id, type_id, room_number, floor_number, created_at) VALUES (?, ?, ?, ?, ?)",
+                     ((r % buildings + 1, r % 3 + 1, f"R{r}", r % 5 + 1, first.isoformat()) for r in range(rooms)))
+
+    leases = []
+    for room in range(1, rooms + 1):
+        beds = (room - 1) % 3
+        for _ in range((1, 2, 4)[beds]):
+            day = first + timedelta(days=random.randint(0, 60))
+            while day < date.today():
+                end = day + timedelta(days=random.randint(120, 330))
+                leases.append((room, day.isoformat(), end.isoformat()))
+                day = end + timedelta(days=random.randint(1, 90))
+    conn.executemany("""
+        INSERT INTO room_assignments (user_id, room_id, start_date, end_date, monthly_rate, status)
+        VALUES (1, ?, ?, ?, 350000, 'completed')
+    """, leases)
+    conn.commit()
+    return first, len(leases)
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    workdir = tempfile.mkdtemp(prefix='bench_vacancy_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'manager.db')
+    try:
+        import db
+        import vacancy
+        db.init_db()
+        conn = db.get_db_connection()
+        # Skip the change log and bed counters for the bulk load; they are not what is measured
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND (name LIKE '%_cdc_%' OR name LIKE '%_beds_%')").fetchall():
+            conn.execute(f"DROP TRIGGER {row['name']}")
+        first, n_leases = populate(conn, rooms, years)
+        start, end = first.isoformat(), date.today().isoformat()
+        cursor = conn.cursor()
+        rows = vacancy._load(cursor, start, end)
+        cursor.close()
+        conn.close()
+        print(f"{rooms} rooms, {n_leases} leases, {start}..{end}")
+
+        started = time.perf_counter()
+        vacancy.compute_vacancy(*rows, start, end)
+        compute = time.perf_counter() - started
+
+        started = time.perf_counter()
+        report = vacancy.vacancy_report(start, end, 'building')
+        cold = time.perf_counter() - started
+
+        started = time.perf_counter()
+        vacancy.vacancy_report(start, end, 'room')
+        warm = time.perf_counter() - started
+
+        print(f"sweep only         {compute * 1000:8.1f} ms")
+        print(f"cold (load+sweep)  {cold * 1000:8.1f} ms")
+        print(f"cached, per room   {warm * 1000:8.1f} ms")
+        totals = report['totals']
+        print(f"vacancy rate {totals['vacancy_rate']:.1%}, lost revenue {totals['lost_revenue']:,.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
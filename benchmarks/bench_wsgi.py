@@ -0,0 +1,105 @@
+"""
+Benchmark: throughput of the production server as workers are added.
+Starts gunicorn (gunicorn.conf.py) with 1, 2, 4, ... workers up to the
+number of CPU cores and hammers a few read-only pages from concurrent
+keep-alive clients for a fixed time.
+
+Usage:
+    python benchmarks/bench_wsgi.py [seconds per run] [client threads] [worker counts, e.g. 1,2,4]
+"""
+
+import http.client
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['/login', '/api/inventory']
+PORT = 5099
+
+
+def wait_for_server(timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            conn.request('GET', PAGES[0])
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def load(seconds, clients):
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.time() + seconds
+
+    def client(slot):
+        conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=10)
+        i = 0
+        while time.time() < stop:
+            try:
+                conn.request('GET', PAGES[i % len(PAGES)])
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    counts[slot] += 1
+                else:
+                    errors[slot] += 1
+            except (OSError, http.client.HTTPException):
+                errors[slot] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=10)
+            i += 1
+        conn.close()
+
+    pool = [threading.Thread(target=client, args=(slot,)) for slot in range(clients)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(counts), sum(errors)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    cores = multiprocessing.cpu_count()
+    if len(sys.argv) > 3:
+        worker_counts = [int(n) for n in sys.argv[3].split(',')]
+    else:
+        worker_counts = sorted({1, cores} | {n for n in (2, 4, 8, 16) if n <= cores})
+
+    workdir = tempfile.mkdtemp(prefix='bench_wsgi_')
+    print(f"{cores} CPU core(s), {clients} clients, {seconds:.0f}s per run")
+    baseline = None
+    try:
+        for workers in worker_counts:
+            env = dict(os.environ, DB_PATH=os.path.join(workdir, 'db', 'manager.db'),
+                       BIND=f'127.0.0.1:{PORT}', WEB_CONCURRENCY=str(workers),
+                       WEB_THREADS='4', ACCESS_LOG='/dev/null')
+            server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                      cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_server()
+                done, failed = load(seconds, clients)
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            rate = done / seconds
+            baseline = baseline or rate
+            print(f"workers={workers:<3} {rate:8.0f} req/s  x{rate / baseline:4.2f}  errors={failed}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
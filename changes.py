@@ -0,0 +1,132 @@
+"""
+Change-data-capture consumer API.
+
+Triggers (db.init_change_log) append one entry per written row of users,
+buildings, rooms, room_assignments and payments to the `changes` table, with
+a sequence number that only grows. Entries carry the row id and operation,
+not the data: a consumer re-reads the rows it cares about.
+
+    batch = read_changes(cursor, since=seq, tables=('payments',))
+    ...process batch['changes']...
+    seq = batch['last_seq']
+
+or, for a named consumer that resumes where it left off:
+
+    batch = consume(conn, 'my-job')
+    ...process batch['changes']...
+    ack(conn, 'my-job', batch['last_seq'])
+
+compact() drops entries every registered consumer has acknowledged and
+anything older than CHANGES_RETENTION_DAYS. A reader that fell behind the
+retained log, or whose position is past the end of a log restored from a
+backup or template, gets resync=True and must reload from the tables.
+"""
+
+import os
+
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', '7'))
+# ack() compacts the log each time a consumer crosses a multiple of this seq
+COMPACT_EVERY = int(os.getenv('CHANGES_COMPACT_EVERY', '5000'))
+
+
+def latest_seq(cursor):
+    """Sequence number of the newest change (0 when nothing was ever logged)."""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'")
+    row = cursor.fetchone()
+    return row['seq'] if row else 0
+
+
+def read_changes(cursor, since=0, tables=None, limit=1000):
+    """
+    Changes with seq > since, oldest first, at most `limit`.
+    Returns {'changes': [...], 'last_seq', 'resync', 'more'}; `resync` is True
+    when entries after `since` were already compacted away, or when `since` is
+    past the end of the log (the database was replaced by an older copy).
+    """
+    cursor.execute("SELECT MIN(seq) AS first_seq FROM changes")
+    first_seq = cursor.fetchone()['first_seq']
+    newest = latest_seq(cursor)
+    # The log is empty after compaction of everything up to `newest`
+    oldest_kept = first_seq if first_seq is not None else newest + 1
+    resync = since + 1 < oldest_kept or since > newest
+
+    query = "SELECT seq, table_name, row_id, op, changed_at FROM changes WHERE seq > ?"
+    params = [since]
+    if tables:
+        query += f" AND table_name IN ({','.join('?' * len(tables))})"
+        params.extend(tables)
+    query += " ORDER BY seq LIMIT ?"
+    params.append(limit + 1)
+    cursor.execute(query, params)
+    rows = [dict(row) for row in cursor.fetchall()]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    # With a table filter the last returned seq can trail the log; jump to its
+    # end when nothing matching is left so the consumer does not rescan
+    last_seq = rows[-1]['seq'] if more else max([since, newest] + [r['seq'] for r in rows[-1:]])
+    return {'changes': rows, 'last_seq': last_seq, 'resync': resync, 'more': more}
+
+
+def changed_rows(changes):
+    """{table: {row_id: last op}} for a list of changes."""
+    rows = {}
+    for change in changes:
+        rows.setdefault(change['table_name'], {})[change['row_id']] = change['op']
+    return rows
+
+
+def acked_seq(cursor, consumer):
+    cursor.execute("SELECT acked_seq FROM change_consumers WHERE consumer = ?", (consumer,))
+    row = cursor.fetchone()
+    return row['acked_seq'] if row else 0
+
+
+def ack(conn, consumer, seq):
+    """Record that `consumer` processed everything up to `seq` (never moves backwards)."""
+    cursor = conn.cursor()
+    try:
+        previous = acked_seq(cursor, consumer)
+        cursor.execute("""
+            INSERT INTO change_consumers (consumer, acked_seq, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(consumer) DO UPDATE SET
+                acked_seq = MAX(acked_seq, excluded.acked_seq),
+                updated_at = CURRENT_TIMESTAMP
+        """, (consumer, seq))
+        conn.commit()
+        if COMPACT_EVERY and previous // COMPACT_EVERY != seq // COMPACT_EVERY:
+            compact(conn)
+    finally:
+        cursor.close()
+
+
+def consume(conn, consumer, tables=None, limit=1000):
+    """Read the next batch for a named consumer (acknowledge it with ack())."""
+    cursor = conn.cursor()
+    try:
+        return read_changes(cursor, acked_seq(cursor, consumer), tables, limit)
+    finally:
+        cursor.close()
+
+
+def compact(conn, retention_days=None):
+    """
+    Delete entries every consumer has acknowledged, plus anything older than
+    the retention window. Returns the number of entries removed.
+    """
+    retention_days = CHANGES_RETENTION_DAYS if retention_days is None else retention_days
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MIN(acked_seq) AS low FROM change_consumers")
+        low = cursor.fetchone()['low']
+        # Unregistered readers (in-process caches) rely on the retention window alone
+        low = low or 0
+        cursor.execute("""
+            DELETE FROM changes
+            WHERE seq <= ? OR changed_at < datetime('now', ?)
+        """, (low, f'-{retention_days} days'))
+        removed = cursor.rowcount
+        conn.commit()
+        return removed
+    finally:
+        cursor.close()
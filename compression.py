@@ -0,0 +1,123 @@
+"""
+Response compression.
+
+Rendered pages, JSON and CSV exports are compressed on the way out (an
+after_request hook in app.py) when the client accepts it: brotli when the
+optional `brotli` package is installed and preferred by the client, gzip
+otherwise.
+
+    COMPRESS_ENABLED          True
+    COMPRESS_MIN_SIZE         bytes below which a response is sent as is (500)
+    COMPRESS_LEVEL            gzip level, 1-9 (6)
+    COMPRESS_BROTLI_QUALITY   brotli quality, 0-11 (4: cheap enough per request)
+
+Streamed responses (stream_with_context, stream_template) are compressed
+chunk by chunk with a sync flush after each chunk, so the client still gets
+every piece as soon as the app yields it. Responses that already carry a
+Content-Encoding (precompressed assets), files handed to the server
+(direct_passthrough, so sendfile keeps working), partial content, other media
+types and Cache-Control: no-transform are left alone.
+"""
+
+import gzip
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli  # Optional: enables br encoding
+except ImportError:
+    brotli = None
+
+ENABLED = os.getenv('COMPRESS_ENABLED', 'True').lower() == 'true'
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml', 'text/javascript',
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'image/svg+xml',
+}
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    choices = [('gzip', accepted.quality('gzip'))]
+    if brotli is not None:
+        # Listed first so it wins ties with gzip
+        choices.insert(0, ('br', accepted.quality('br')))
+    encoding, quality = max(choices, key=lambda choice: choice[1])
+    return encoding if quality > 0 else None
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=LEVEL, mtime=0)
+
+
+def _stream(source, encoding):
+    """Compress a streamed body chunk by chunk, flushing after each so nothing is held back."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    try:
+        for chunk in source:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                out = process(chunk) + flush()
+                if out:
+                    yield out
+        yield finish()
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+
+
+def _skip(response):
+    return (
+        request.method == 'HEAD'
+        or response.status_code < 200 or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or 'no-transform' in (response.headers.get('Cache-Control') or '')
+    )
+
+
+def compress_response(response):
+    """after_request hook: compress `response` in place when worthwhile and accepted."""
+    if not ENABLED or _skip(response):
+        return response
+    # Whether or not this one is compressed, the body depends on Accept-Encoding
+    response.vary.add('Accept-Encoding')
+    size = None if response.is_streamed else response.calculate_content_length()
+    if size is not None and size < MIN_SIZE:
+        return response
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+        # A view that already ran make_conditional compared the bare tag, but
+        # clients revalidate with the encoded one: check again against that
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(_compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -1,25 +1,193 @@
 
 import sqlite3
 import os
+import threading
+from contextvars import ContextVar
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Tables whose writes are counted in table_versions (see init_db)
+VERSIONED_TABLES = ('users', 'buildings', 'room_types', 'rooms', 'room_assignments', 'payments')
+
+# Tables whose row changes are logged to the changes table, with their primary keys
+CDC_TABLES = {
+    'users': 'user_id',
+    'buildings': 'building_id',
+    'rooms': 'room_id',
+    'room_assignments': 'assignment_id',
+    'payments': 'payment_id',
+}
+
+# Tables served by the incremental sync API (sync.py): updated_at is kept by
+# triggers and deletes leave tombstones, with their primary keys
+SYNC_TABLES = dict(CDC_TABLES, room_types='type_id')
+
+# Set per request by the app: safe methods (GET/HEAD/OPTIONS) only read
+_read_only = ContextVar('read_only', default=False)
+
+
+class ReadOnlyViolation(sqlite3.OperationalError):
+    """A write was attempted through a read-only connection."""
+
+
+class ReadOnlyCursor(sqlite3.Cursor):
+    """Cursor that reports writes rejected by the read-only connection as ReadOnlyViolation."""
+
+    def _guard(self, method, sql, *args):
+        try:
+            return method(sql, *args)
+        except sqlite3.OperationalError as e:
+            if 'readonly' in str(e) or 'read-only' in str(e):
+                raise ReadOnlyViolation(f"Write attempted on a read-only connection: {' '.join(sql.split())[:80]}") from e
+            raise
+
+    def execute(self, sql, parameters=()):
+        return self._guard(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._guard(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._guard(super().executescript, sql_script)
+
+
+class ReadOnlyConnection(sqlite3.Connection):
+
+    def cursor(self, factory=ReadOnlyCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def set_read_only(read_only):
+    """Make get_db_connection() hand out read-only connections in the current context."""
+    return _read_only.set(read_only)
+
+
+def get_db_path():
+    return os.getenv('DB_PATH', 'database/manager.db')
+
+
+# In-memory mode: DB_PATH=':memory:' (or a file:...?mode=memory URI) names one
+# shared-cache database that every connection of the process sees. It lives as
+# long as a connection to it is open, so the first connection is kept as an
+# anchor; DB_TEMPLATE, when set, is copied into it at that point.
+_memory = {'anchor': None, 'uri': None, 'generation': 0}
+_memory_lock = threading.Lock()
+
+
+def is_memory_db(db_path=None):
+    db_path = get_db_path() if db_path is None else db_path
+    return db_path == ':memory:' or (db_path.startswith('file:') and 'mode=memory' in db_path)
+
+
+def _memory_uri(db_path):
+    if db_path != ':memory:':
+        return db_path
+    # A new name per generation: close_memory_db() starts from an empty database
+    # even if a leaked connection still holds the old one open
+    return f"file:dorm_memdb_{os.getpid()}_{_memory['generation']}?mode=memory&cache=shared"
+
+
+def _connect_memory(factory=sqlite3.Connection):
+    db_path = get_db_path()
+    with _memory_lock:
+        if _memory['anchor'] is None or _memory['uri'] != _memory_uri(db_path):
+            _memory['uri'] = _memory_uri(db_path)
+            _memory['anchor'] = sqlite3.connect(_memory['uri'], uri=True, check_same_thread=False)
+            template = os.getenv('DB_TEMPLATE')
+            if template:
+                restore_database(template, _memory['anchor'])
+                _memory['anchor'].commit()
+        uri = _memory['uri']
+    return sqlite3.connect(uri, uri=True, factory=factory)
+
+
+def close_memory_db():
+    """Drop the in-memory database; the next connection starts a fresh one (from DB_TEMPLATE, if set)."""
+    with _memory_lock:
+        if _memory['anchor'] is not None:
+            _memory['anchor'].close()
+        _memory.update(anchor=None, uri=None, generation=_memory['generation'] + 1)
+
+
+def restore_database(source_path, dest_conn):
+    """
+    Overwrite the database behind `dest_conn` with a copy of `source_path`
+    (SQLite backup API), then move every table version past what it was
+    before, so no process cache mistakes the copied data for the old rows.
+    The caller commits.
+    """
+    before = {}
+    if dest_conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'table_versions'").fetchone():
+        before = dict(dest_conn.execute("SELECT table_name, version FROM table_versions").fetchall())
+    source = sqlite3.connect(Path(source_path).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        source.backup(dest_conn)
+    finally:
+        source.close()
+    for table, version in before.items():
+        dest_conn.execute("UPDATE table_versions SET version = MAX(version, ?) + 1 WHERE table_name = ?",
+                          (version, table))
+
+
 def get_db_connection():
     """
     Create and return a SQLite database connection.
     Returns a connection with row_factory set to sqlite3.Row for dictionary-like access.
+    Inside a read-only request this is a read-only connection (see get_read_only_connection).
     """
-    db_path = os.getenv('DB_PATH', 'database/manager.db')
-    
-    # Ensure database directory exists
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
+    if _read_only.get():
+        return get_read_only_connection()
+
+    db_path = get_db_path()
+    if is_memory_db(db_path):
+        conn = _connect_memory()
+    else:
+        # Ensure database directory exists
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row  # Enable column access by name
     return conn
 
+
+def get_read_only_connection():
+    """
+    Open the database read-only (mode=ro URI plus PRAGMA query_only).
+    With the WAL journal (see init_db) readers never block, or wait for, writers.
+    A write through this connection raises ReadOnlyViolation.
+    """
+    if is_memory_db():
+        # mode=ro does not combine with mode=memory; query_only alone enforces it
+        conn = _connect_memory(factory=ReadOnlyConnection)
+    else:
+        uri = Path(get_db_path()).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, factory=ReadOnlyConnection)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def iter_rows(cursor, batch=500):
+    """
+    Lazily yield the rows of an executed query, `batch` at a time, so a
+    streamed page never holds the whole result set. The cursor's connection
+    must stay open until iteration ends (see Response.call_on_close).
+    """
+    while True:
+        rows = cursor.fetchmany(batch)
+        if not rows:
+            return
+        yield from rows
+
+
 def init_db():
     """
     Initialize the database with all required tables.
@@ -30,6 +198,9 @@ def init_db():
     
     # Enable foreign keys
     cursor.execute("PRAGMA foreign_keys = ON")
+
+    # Write-ahead log: readers and the single writer no longer block each other
+    cursor.execute("PRAGMA journal_mode = WAL")
     
     # Create users table
     cursor.execute("""
@@ -69,7 +240,7 @@ def init_db():
         CREATE TABLE IF NOT EXISTS room_types (
             type_id INTEGER PRIMARY KEY AUTOINCREMENT,
             type_name VARCHAR(50) NOT NULL,
-            base_rate DECIMAL(10,2) NOT NULL,
+            base_rate INTEGER NOT NULL,  -- cents (money.py)
             capacity INTEGER NOT NULL,
             description TEXT,
             features TEXT,
@@ -88,6 +259,7 @@ def init_db():
             room_number VARCHAR(50) NOT NULL,
             floor_number INTEGER,
             is_available BOOLEAN DEFAULT 1,
+            occupied_beds INTEGER NOT NULL DEFAULT 0,
             notes TEXT,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -104,7 +276,7 @@ def init_db():
             room_id INTEGER,
             start_date DATE,
             end_date DATE,
-            monthly_rate DECIMAL(10,2),
+            monthly_rate INTEGER,  -- cents (money.py)
             status VARCHAR(20) DEFAULT 'active' CHECK(status IN ('active', 'completed', 'cancelled', 'pending')),
             assigned_by INTEGER,
             notes TEXT,
@@ -116,13 +288,23 @@ def init_db():
         )
     """)
     
+    # Overlap checks (overlaps.py) probe a student's or a room's leases by start date
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_assignments_user_dates
+        ON room_assignments(user_id, start_date, end_date) WHERE status != 'cancelled'
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_assignments_room_dates
+        ON room_assignments(room_id, start_date, end_date) WHERE status != 'cancelled'
+    """)
+
     # Create payments table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS payments (
             payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER,
             assignment_id INTEGER,
-            amount DECIMAL(10,2),
+            amount INTEGER,  -- cents (money.py)
             payment_method VARCHAR(30),
             payment_date DATE,
             payment_period_start DATE,
@@ -138,6 +320,12 @@ def init_db():
         )
     """)
     
+    # Per-lease payment lookups and totals read this index alone
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_payments_assignment
+        ON payments(assignment_id, payment_period_start, payment_date, amount)
+    """)
+
     # Create reports table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS reports (
@@ -151,9 +339,376 @@ def init_db():
         )
     """)
     
+    # Create table_versions table: bumped by triggers on every write so
+    # in-process caches can cheaply detect that a table has changed
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name VARCHAR(50) PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in VERSIONED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)", (table,))
+        # The UPDATE trigger lists columns; init_sync creates it
+        for event in ('INSERT', 'DELETE'):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+                END
+            """)
+
+    # Create receipt_counters table: one row per day, bumped inside the
+    # payment insert transaction to number receipts (see receipts.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS receipt_counters (
+            day CHAR(8) PRIMARY KEY,
+            last_value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Create login_buckets table: login throttling token buckets shared by
+    # all workers when LOGIN_THROTTLE_STORE=sqlite (see throttle.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS login_buckets (
+            bucket_key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+    # Create occupancy_snapshots table: daily occupancy per building and room
+    # type (see occupancy.py), clustered by date for range reads
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS occupancy_snapshots (
+            snapshot_date DATE NOT NULL,
+            building_id INTEGER NOT NULL,
+            type_id INTEGER NOT NULL,
+            total_rooms INTEGER NOT NULL,
+            occupied_rooms INTEGER NOT NULL,
+            total_beds INTEGER NOT NULL,
+            occupied_beds INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_date, building_id, type_id)
+        ) WITHOUT ROWID
+    """)
+
+    init_bed_occupancy(cursor)
+    init_change_log(cursor)
+    init_sync(cursor)
+    init_periods(cursor)
+    migrate_money_to_cents(cursor)
+
     conn.commit()
     conn.close()
     print("Database initialized successfully!")
 
+
+# (table, column) pairs holding money; stored as integer cents since schema version 1
+MONEY_COLUMNS = (('room_types', 'base_rate'), ('room_assignments', 'monthly_rate'), ('payments', 'amount'))
+MONEY_IN_CENTS_VERSION = 1
+
+
+def migrate_money_to_cents(cursor, schema='main'):
+    """
+    One-time migration of the money columns from REAL pesos to integer cents,
+    recorded in PRAGMA user_version. A new database runs it on empty tables.
+    The updates go through the usual triggers, so caches, the change log and
+    sync consumers all see the new values.
+    """
+    cursor.execute(f"PRAGMA {schema}.user_version")
+    if cursor.fetchone()[0] >= MONEY_IN_CENTS_VERSION:
+        return
+    for table, column in MONEY_COLUMNS:
+        cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if cursor.fetchone():
+            cursor.execute(f"""
+                UPDATE {schema}.{table} SET {column} = CAST(ROUND({column} * 100) AS INTEGER)
+                WHERE {column} IS NOT NULL
+            """)
+    if schema == 'main':
+        import archive  # archive imports this module
+        archive.migrate_money(cursor)
+    cursor.execute(f"PRAGMA {schema}.user_version = {MONEY_IN_CENTS_VERSION}")
+
+
+def init_bed_occupancy(cursor):
+    """
+    Keep rooms.occupied_beds and rooms.is_available in step with room_assignments.
+    occupied_beds counts active/pending assignments; a room stays available
+    while it has fewer occupants than its room type's capacity.
+    """
+    cursor.execute("PRAGMA table_info(rooms)")
+    columns = [row['name'] for row in cursor.fetchall()]
+    migrate = 'occupied_beds' not in columns
+    if migrate:
+        cursor.execute("ALTER TABLE rooms ADD COLUMN occupied_beds INTEGER NOT NULL DEFAULT 0")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rooms_building_available ON rooms(building_id, is_available)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assignments_room_status ON room_assignments(room_id, status)")
+
+    occupying = "('active', 'pending')"
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_assignments_beds_insert
+        AFTER INSERT ON room_assignments
+        WHEN NEW.status IN {occupying}
+        BEGIN
+            UPDATE rooms SET occupied_beds = occupied_beds + 1 WHERE room_id = NEW.room_id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_assignments_beds_delete
+        AFTER DELETE ON room_assignments
+        WHEN OLD.status IN {occupying}
+        BEGIN
+            UPDATE rooms SET occupied_beds = MAX(occupied_beds - 1, 0) WHERE room_id = OLD.room_id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_assignments_beds_update
+        AFTER UPDATE OF status, room_id ON room_assignments
+        WHEN (OLD.status IN {occupying}) != (NEW.status IN {occupying})
+          OR OLD.room_id IS NOT NEW.room_id
+        BEGIN
+            UPDATE rooms SET occupied_beds = MAX(occupied_beds - 1, 0)
+            WHERE room_id = OLD.room_id AND OLD.status IN {occupying};
+            UPDATE rooms SET occupied_beds = occupied_beds + 1
+            WHERE room_id = NEW.room_id AND NEW.status IN {occupying};
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_rooms_beds_available
+        AFTER UPDATE OF occupied_beds, type_id ON rooms
+        BEGIN
+            UPDATE rooms
+            SET is_available = NEW.occupied_beds < COALESCE((SELECT capacity FROM room_types WHERE type_id = NEW.type_id), 1)
+            WHERE room_id = NEW.room_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_room_types_capacity
+        AFTER UPDATE OF capacity ON room_types
+        BEGIN
+            UPDATE rooms SET is_available = occupied_beds < NEW.capacity WHERE type_id = NEW.type_id;
+        END
+    """)
+
+    if migrate:
+        # Backfill existing databases from current assignments
+        cursor.execute(f"""
+            UPDATE rooms SET occupied_beds = (
+                SELECT COUNT(*) FROM room_assignments ra
+                WHERE ra.room_id = rooms.room_id AND ra.status IN {occupying}
+            )
+        """)
+
+def init_change_log(cursor):
+    """
+    Append-only change log: one (seq, table, row id, operation) entry per
+    written row of CDC_TABLES, in commit order. Consumers remember the last
+    seq they processed in change_consumers (see changes.py).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name VARCHAR(50) NOT NULL,
+            row_id INTEGER NOT NULL,
+            op CHAR(1) NOT NULL CHECK(op IN ('I', 'U', 'D')),
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_changes_row ON changes(table_name, row_id)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_consumers (
+            consumer VARCHAR(100) PRIMARY KEY,
+            acked_seq INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # The UPDATE trigger lists columns; init_sync creates it
+    for table, key in CDC_TABLES.items():
+        for event, op, ref in (('INSERT', 'I', 'NEW'), ('DELETE', 'D', 'OLD')):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_cdc_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO changes (table_name, row_id, op) VALUES ('{table}', {ref}.{key}, '{op}');
+                END
+            """)
+
+
+def _update_columns(cursor, table):
+    """Columns an UPDATE can set, except updated_at (generated columns are left out by table_info)."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row['name'] for row in cursor.fetchall() if row['name'] != 'updated_at']
+
+
+def _ensure_trigger(cursor, name, sql):
+    """Create trigger `name` from `sql`, replacing an existing one whose definition differs."""
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+    row = cursor.fetchone()
+    if row and ' '.join(row['sql'].split()) == ' '.join(sql.split()):
+        return
+    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute(sql)
+
+
+# Landlord that owns a deleted row, for scoping its tombstone
+_TOMBSTONE_OWNER = {
+    'users': """(SELECT b.owner_id FROM room_assignments ra JOIN rooms r ON ra.room_id = r.room_id
+                 JOIN buildings b ON r.building_id = b.building_id
+                 WHERE ra.user_id = OLD.user_id ORDER BY ra.start_date DESC LIMIT 1)""",
+    'buildings': "OLD.owner_id",
+    'rooms': "(SELECT owner_id FROM buildings WHERE building_id = OLD.building_id)",
+    'room_assignments': """(SELECT b.owner_id FROM rooms r JOIN buildings b ON r.building_id = b.building_id
+                            WHERE r.room_id = OLD.room_id)""",
+    'payments': """(SELECT b.owner_id FROM room_assignments ra JOIN rooms r ON ra.room_id = r.room_id
+                    JOIN buildings b ON r.building_id = b.building_id
+                    WHERE ra.assignment_id = OLD.assignment_id)""",
+    'room_types': "NULL",
+}
+
+
+def init_sync(cursor):
+    """
+    Incremental sync support for SYNC_TABLES (see sync.py):
+    - updated_at is set by a trigger on every UPDATE that changes another column;
+    - (updated_at, id) indexes serve keyset reads;
+    - deletes leave a row in sync_tombstones, with the owning landlord and
+      student captured at delete time for role scoping.
+
+    The touch trigger writes updated_at with a nested UPDATE, so every UPDATE
+    trigger on these tables (table_versions and change log included) is
+    declared UPDATE OF the other columns and ignores that nested write. Those
+    column lists are rebuilt here on every start, after all migrations.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_tombstones (
+            tombstone_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name VARCHAR(50) NOT NULL,
+            row_id INTEGER NOT NULL,
+            owner_id INTEGER,
+            user_id INTEGER,
+            deleted_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sync_tombstones_cursor
+        ON sync_tombstones(table_name, deleted_at, tombstone_id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_meta (
+            key VARCHAR(50) PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    # The prune watermark used to be a single value for every table: carry it over to each
+    cursor.execute("SELECT value FROM sync_meta WHERE key = 'newest_pruned_tombstone'")
+    legacy = cursor.fetchone()
+    if legacy:
+        cursor.executemany("INSERT OR IGNORE INTO sync_meta (key, value) VALUES (?, ?)",
+                           [(f'newest_pruned_tombstone:{table}', legacy['value']) for table in SYNC_TABLES])
+        cursor.execute("DELETE FROM sync_meta WHERE key = 'newest_pruned_tombstone'")
+
+    for table, key in SYNC_TABLES.items():
+        columns = ', '.join(_update_columns(cursor, table))
+        cursor.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_sync ON {table}(updated_at, {key})")
+        _ensure_trigger(cursor, f"trg_{table}_touch", f"""
+            CREATE TRIGGER trg_{table}_touch
+            AFTER UPDATE OF {columns} ON {table}
+            BEGIN
+                UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE {key} = NEW.{key};
+            END
+        """)
+        user = "OLD.user_id" if table in ('users', 'room_assignments', 'payments') else "NULL"
+        _ensure_trigger(cursor, f"trg_{table}_tombstone", f"""
+            CREATE TRIGGER trg_{table}_tombstone
+            AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO sync_tombstones (table_name, row_id, owner_id, user_id)
+                VALUES ('{table}', OLD.{key}, {_TOMBSTONE_OWNER[table]}, {user});
+            END
+        """)
+
+    for table in VERSIONED_TABLES:
+        _ensure_trigger(cursor, f"trg_{table}_version_update", f"""
+            CREATE TRIGGER trg_{table}_version_update
+            AFTER UPDATE OF {', '.join(_update_columns(cursor, table))} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+            END
+        """)
+    for table, key in CDC_TABLES.items():
+        _ensure_trigger(cursor, f"trg_{table}_cdc_update", f"""
+            CREATE TRIGGER trg_{table}_cdc_update
+            AFTER UPDATE OF {', '.join(_update_columns(cursor, table))} ON {table}
+            BEGIN
+                INSERT INTO changes (table_name, row_id, op) VALUES ('{table}', NEW.{key}, 'U');
+            END
+        """)
+
+
+
+# Academic terms start in these months: 2nd semester, summer, 1st semester
+TERM_START_MONTHS = (1, 6, 8)
+
+# Generated period keys: table -> (date column, year-month column, academic-term column)
+PERIOD_COLUMNS = {
+    'payments': ('payment_date', 'payment_month', 'payment_term'),
+    'room_assignments': ('start_date', 'start_month', 'start_term'),
+}
+
+
+def _month_key_sql(column):
+    """'2025-06-14' -> '2025-06'."""
+    return f"substr({column}, 1, 7)"
+
+
+def _term_key_sql(column):
+    """'2025-06-14' -> '2025-06': year-month of the first month of its academic term (archive.term_start)."""
+    months = sorted(TERM_START_MONTHS, reverse=True)
+    cases = ' '.join(f"WHEN substr({column}, 6, 2) >= '{m:02d}' THEN '{m:02d}'" for m in months[:-1])
+    return f"substr({column}, 1, 5) || CASE {cases} ELSE '{months[-1]:02d}' END"
+
+
+def init_periods(cursor):
+    """
+    Year-month and academic-term keys as virtual generated columns, indexed,
+    so month and term filters and GROUP BYs are index range lookups instead
+    of strftime() over every row:
+
+        WHERE payment_month = '2025-06'           (not strftime('%Y-%m', payment_date) = ...)
+        WHERE payment_term = '2025-08'            1st semester 2025/26
+        GROUP BY start_month
+
+    A column whose expression has changed (TERM_START_MONTHS edited) is
+    dropped and added again.
+    """
+    for table, (date_column, month_column, term_column) in PERIOD_COLUMNS.items():
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        table_sql = ' '.join(cursor.fetchone()['sql'].split())
+        cursor.execute(f"PRAGMA table_xinfo({table})")
+        existing = {row['name'] for row in cursor.fetchall()}
+        for column, expression in ((month_column, _month_key_sql(date_column)),
+                                   (term_column, _term_key_sql(date_column))):
+            definition = f"{column} TEXT GENERATED ALWAYS AS ({expression}) VIRTUAL"
+            if column in existing:
+                if definition in table_sql:
+                    continue
+                cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_{column}")
+                cursor.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+
+    # Month totals (admin and per landlord, through assignment_id) read this index alone
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_payments_payment_month
+        ON payments(payment_month, assignment_id, amount)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payments_payment_term ON payments(payment_term, assignment_id, amount)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_room_assignments_start_month ON room_assignments(start_month)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_room_assignments_start_term ON room_assignments(start_term)")
+
+
 if __name__ == '__main__':
     init_db()
\ No newline at end of file
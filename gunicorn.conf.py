@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment:
+    BIND              address to listen on (default 0.0.0.0:5000)
+    WEB_CONCURRENCY   worker processes (default 2 x CPU cores + 1)
+    WEB_THREADS       threads per worker (default 4)
+    WEB_TIMEOUT       seconds before a stuck worker is restarted (default 30)
+    GRACEFUL_TIMEOUT  seconds in-flight requests get to finish on shutdown/reload (default 30)
+    MAX_REQUESTS      recycle a worker after this many requests, 0 = never (default 0)
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("WEB_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# Import wsgi (and run one-time initialization) in the master, then fork
+preload_app = True
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.post_fork()
+
+
+def worker_int(worker):
+    worker.log.info("Worker %s interrupted, finishing in-flight requests", worker.pid)
+
+
+def worker_exit(server, worker):
+    # Connections are per request, so once gunicorn has drained in-flight
+    # requests (within graceful_timeout) there is nothing left open to close
+    server.log.info("Worker %s exited", worker.pid)
@@ -0,0 +1,161 @@
+"""
+Rooms inventory: buildings -> floors -> rooms in one compact, role-scoped payload.
+Forms fetch it once (revalidated with an ETag) instead of calling
+/building_floors, /get_rooms and /landlord_rooms per building or floor.
+
+Payload:
+    {
+      "version": "3.12.1",                    # buildings.rooms.room_types versions
+      "fields": ["room_id", "room_number", "type_id", "capacity", "is_available", "occupied_beds"],
+      "room_types": {"1": {"type_name": "Single", "capacity": 1, "base_rate": 5000.0}},
+      "buildings": [{"building_id": 1, "building_name": "Dormitory A", "total_floors": 5,
+                     "floors": {"1": [[1, "A101", 1, 1, 0, 1], ...], "2": [], ...}}]
+    }
+
+With ?since=<version> the response only carries what changed since that
+version (see get_delta) when the older snapshot is still held in memory.
+"""
+
+import threading
+from collections import OrderedDict
+
+from db import get_db_connection
+from money import to_pesos
+from ref_cache import get_table_versions
+
+INVENTORY_TABLES = ('buildings', 'rooms', 'room_types')
+ROOM_FIELDS = ['room_id', 'room_number', 'type_id', 'capacity', 'is_available', 'occupied_beds']
+
+# Older snapshots kept per scope to answer delta requests
+SNAPSHOT_HISTORY = 8
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def get_scope(role, user_id):
+    if role == 'admin':
+        return ('admin',)
+    if role == 'landlord':
+        return ('landlord', user_id)
+    # Students (and anonymous visitors) only see rooms that can be booked
+    return ('public',)
+
+
+def _load(cursor, scope):
+    """Query the inventory for a scope. Returns (building headers, room rows, room types)."""
+    query = """
+        SELECT b.building_id, b.building_name, b.total_floors,
+               r.room_id, r.room_number, r.floor_number, r.type_id,
+               rt.capacity, r.is_available, r.occupied_beds
+        FROM buildings b
+        LEFT JOIN rooms r ON r.building_id = b.building_id
+        LEFT JOIN room_types rt ON r.type_id = rt.type_id
+        WHERE b.is_active = 1
+    """
+    params = []
+    if scope[0] == 'landlord':
+        query += " AND b.owner_id = ?"
+        params.append(scope[1])
+    elif scope[0] == 'public':
+        query += " AND (r.room_id IS NULL OR r.is_available = 1)"
+    query += " ORDER BY b.building_name, r.floor_number, r.room_number"
+    cursor.execute(query, params)
+
+    buildings = OrderedDict()
+    rooms = {}
+    for row in cursor.fetchall():
+        buildings.setdefault(row['building_id'], (row['building_name'], row['total_floors'] or 0))
+        if row['room_id'] is not None:
+            rooms[row['room_id']] = (row['building_id'], row['floor_number'], row['room_number'],
+                                     row['type_id'], row['capacity'], row['is_available'], row['occupied_beds'])
+
+    cursor.execute("SELECT type_id, type_name, capacity, base_rate FROM room_types WHERE is_active = 1 ORDER BY type_id")
+    room_types = {str(t['type_id']): {'type_name': t['type_name'], 'capacity': t['capacity'],
+                                      'base_rate': to_pesos(t['base_rate'])} for t in cursor.fetchall()}
+    return buildings, rooms, room_types
+
+
+def _room_entry(room_id, room):
+    return [room_id, room[2], room[3], room[4], room[5], room[6]]
+
+
+def _build_payload(version, buildings, rooms, room_types):
+    nested = OrderedDict()
+    for building_id, (name, total_floors) in buildings.items():
+        floors = OrderedDict((str(f), []) for f in range(1, total_floors + 1))
+        nested[building_id] = {'building_id': building_id, 'building_name': name,
+                               'total_floors': total_floors, 'floors': floors}
+    for room_id, room in rooms.items():
+        floors = nested[room[0]]['floors']
+        floors.setdefault(str(room[1]), []).append(_room_entry(room_id, room))
+    return {
+        'version': version,
+        'fields': ROOM_FIELDS,
+        'room_types': room_types,
+        'buildings': list(nested.values()),
+    }
+
+
+def get_inventory(role, user_id):
+    """
+    Return (version, payload) for the caller's scope.
+    The payload is rebuilt only when buildings, rooms or room_types changed.
+    """
+    scope = get_scope(role, user_id)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        versions = get_table_versions(cursor)
+        version = '.'.join(str(versions.get(t, 0)) for t in INVENTORY_TABLES)
+
+        history = _snapshots.get(scope)
+        if history and version in history:
+            return version, history[version]['payload']
+
+        buildings, rooms, room_types = _load(cursor, scope)
+    finally:
+        cursor.close()
+        conn.close()
+
+    snapshot = {
+        'buildings': buildings,
+        'rooms': rooms,
+        'room_types': room_types,
+        'payload': _build_payload(version, buildings, rooms, room_types),
+    }
+    with _lock:
+        history = _snapshots.setdefault(scope, OrderedDict())
+        history[version] = snapshot
+        while len(history) > SNAPSHOT_HISTORY:
+            history.popitem(last=False)
+    return version, snapshot['payload']
+
+
+def get_delta(role, user_id, since):
+    """
+    Return the changes between version `since` and the current version, or
+    None when that snapshot is no longer held (the caller should send the full payload).
+    """
+    version, payload = get_inventory(role, user_id)
+    history = _snapshots.get(get_scope(role, user_id), {})
+    old, new = history.get(since), history.get(version)
+    if old is None or new is None:
+        return None
+
+    changed_rooms = [[room[0], room[1]] + _room_entry(room_id, room)
+                     for room_id, room in new['rooms'].items()
+                     if old['rooms'].get(room_id) != room]
+    changed_buildings = [{'building_id': building_id, 'building_name': header[0], 'total_floors': header[1]}
+                         for building_id, header in new['buildings'].items()
+                         if old['buildings'].get(building_id) != header]
+    return {
+        'version': version,
+        'since': since,
+        'fields': ['building_id', 'floor_number'] + ROOM_FIELDS,
+        'rooms': changed_rooms,
+        'removed_rooms': [room_id for room_id in old['rooms'] if room_id not in new['rooms']],
+        'buildings': changed_buildings,
+        'removed_buildings': [b for b in old['buildings'] if b not in new['buildings']],
+        'room_types': payload['room_types'] if old['room_types'] != new['room_types'] else None,
+    }
@@ -0,0 +1,220 @@
+"""
+Student ledger and balance engine.
+
+Charges accrue once per calendar month of every active or completed
+assignment, from the month of start_date through the month of end_date
+(or the as-of month for open leases), at the assignment's monthly_rate.
+Payments are applied by payment_period_start (falling back to
+payment_date). Payments for periods that have not started yet count as
+prepayments and do not reduce arrears.
+
+Amounts are integer cents like the columns they come from (see money.py), so
+per-student and per-landlord rollups add up exactly; callers convert at the
+edges (to_pesos for JSON and CSV, the `money` filter in templates).
+
+All students are computed together in one vectorized NumPy pass. The result
+is cached until room_assignments or payments are written again (tracked
+through table_versions) or the as-of date changes.
+"""
+
+import threading
+from datetime import date
+
+import numpy as np
+
+from db import get_db_connection
+from ref_cache import get_table_versions
+
+LEDGER_TABLES = ('room_assignments', 'payments')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _months(values, default=None):
+    """ISO date strings -> month numbers (months since 1970-01). Missing values become `default`."""
+    raw = np.array([v[:10] if v else 'NaT' for v in values], dtype='datetime64[D]')
+    months = raw.astype('datetime64[M]').astype(np.int64)
+    if default is not None:
+        months = np.where(np.isnat(raw), default, months)
+    return months
+
+
+def _sum_by(slots, values, size):
+    """Integer per-slot sums (np.bincount with weights would go through float64)."""
+    totals = np.zeros(size, dtype=np.int64)
+    np.add.at(totals, slots, values)
+    return totals
+
+
+def month_label(month):
+    """'YYYY-MM' of a month number (months since 1970-01)."""
+    return str(np.datetime64(int(month), 'M'))
+
+
+def _load(cursor):
+    cursor.execute("""
+        SELECT ra.assignment_id, ra.user_id, ra.start_date, ra.end_date,
+               COALESCE(ra.monthly_rate, 0) AS monthly_rate, b.owner_id
+        FROM room_assignments ra
+        LEFT JOIN rooms r ON ra.room_id = r.room_id
+        LEFT JOIN buildings b ON r.building_id = b.building_id
+        WHERE ra.status IN ('active', 'completed') AND ra.start_date IS NOT NULL
+        ORDER BY ra.assignment_id
+    """)
+    assignments = cursor.fetchall()
+    cursor.execute("""
+        SELECT user_id, assignment_id, COALESCE(amount, 0) AS amount,
+               COALESCE(payment_period_start, payment_date) AS period_start,
+               payment_period_end
+        FROM payments
+        WHERE user_id IS NOT NULL
+    """)
+    payments = cursor.fetchall()
+    return assignments, payments
+
+
+def compute_ledger(assignments, payments, as_of=None):
+    """
+    Vectorized ledger over raw rows (see _load for the columns).
+    Returns {'students': {user_id: {...}}, 'assignments': {assignment_id: {...}}}.
+    """
+    as_of = as_of or date.today()
+    as_of_month = int(np.datetime64(as_of.isoformat(), 'M').astype(np.int64))
+
+    # -- charges per assignment ---------------------------------------------
+    a_ids = np.array([a['assignment_id'] for a in assignments], dtype=np.int64)
+    a_users = np.array([a['user_id'] or 0 for a in assignments], dtype=np.int64)
+    rates = np.array([a['monthly_rate'] for a in assignments], dtype=np.int64)
+    starts = _months([a['start_date'] for a in assignments])
+    ends = _months([a['end_date'] for a in assignments], default=as_of_month)
+    last_billed = np.minimum(ends, as_of_month)
+    months_billed = np.clip(last_billed - starts + 1, 0, None)
+    charged = months_billed * rates
+
+    # -- payments -----------------------------------------------------------
+    p_users = np.array([p['user_id'] for p in payments], dtype=np.int64)
+    amounts = np.array([p['amount'] for p in payments], dtype=np.int64)
+    p_months = _months([p['period_start'] for p in payments], default=as_of_month)
+    p_ends = _months([p['payment_period_end'] for p in payments], default=-1)
+    advance = p_months > as_of_month
+    due_amounts = np.where(advance, 0, amounts)
+    advance_amounts = np.where(advance, amounts, 0)
+
+    # Map payments onto loaded assignments (-1 when unlinked or unknown)
+    n = len(a_ids)
+    p_assign = np.array([p['assignment_id'] or -1 for p in payments], dtype=np.int64)
+    if n:
+        order = np.argsort(a_ids)
+        pos = order[np.clip(np.searchsorted(a_ids, p_assign, sorter=order), 0, n - 1)]
+        p_index = np.where(a_ids[pos] == p_assign, pos, -1)
+    else:
+        p_index = np.full(len(p_assign), -1, dtype=np.int64)
+
+    mask = p_index >= 0
+    a_paid = _sum_by(p_index[mask], due_amounts[mask], n)
+    a_prepaid = _sum_by(p_index[mask], advance_amounts[mask], n)
+    covered = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(covered, p_index[mask], p_ends[mask])
+
+    a_arrears = np.clip(charged - a_paid, 0, None)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        months_overdue = np.where(rates > 0, np.ceil(a_arrears / rates), 0).astype(np.int64)
+    # First unpaid month: the month after the last covered period, but never before the lease start
+    arrears_since = np.where(a_arrears > 0, np.maximum(covered + 1, starts), -1)
+
+    # -- per student ----------------------------------------------------------
+    user_ids, a_slot = np.unique(np.concatenate([a_users, p_users]), return_inverse=True)
+    a_slot, p_slot = a_slot[:n], a_slot[n:]
+    m = len(user_ids)
+    s_charged = _sum_by(a_slot, charged, m)
+    s_paid = _sum_by(p_slot, due_amounts, m)
+    s_prepaid = _sum_by(p_slot, advance_amounts, m)
+    s_balance = s_charged - s_paid - s_prepaid
+    s_arrears = np.clip(s_charged - s_paid, 0, None)
+    s_since = np.full(m, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(s_since, a_slot[arrears_since >= 0], arrears_since[arrears_since >= 0])
+
+    students = {}
+    for i, user_id in enumerate(user_ids.tolist()):
+        if not user_id:
+            continue
+        students[user_id] = {
+            'user_id': user_id,
+            'charged': int(s_charged[i]),
+            'paid': int(s_paid[i]),
+            'prepaid': int(s_prepaid[i]),
+            'balance': int(s_balance[i]),
+            'arrears': int(s_arrears[i]),
+            'arrears_since': month_label(s_since[i]) if s_arrears[i] > 0 and s_since[i] != np.iinfo(np.int64).max else None,
+        }
+
+    assignment_rows = {}
+    for i, assignment_id in enumerate(a_ids.tolist()):
+        assignment_rows[assignment_id] = {
+            'assignment_id': assignment_id,
+            'user_id': int(a_users[i]),
+            'owner_id': assignments[i]['owner_id'],
+            'months_billed': int(months_billed[i]),
+            'charged': int(charged[i]),
+            'paid': int(a_paid[i]),
+            'prepaid': int(a_prepaid[i]),
+            'arrears': int(a_arrears[i]),
+            'months_overdue': int(months_overdue[i]),
+            'arrears_since': month_label(arrears_since[i]) if arrears_since[i] >= 0 else None,
+        }
+
+    return {'as_of': as_of.isoformat(), 'students': students, 'assignments': assignment_rows}
+
+
+def get_ledger(as_of=None):
+    """Return the cached ledger, recomputing it only after a payment or assignment write."""
+    as_of = as_of or date.today()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        versions = get_table_versions(cursor)
+        stamp = tuple(versions.get(t, 0) for t in LEDGER_TABLES) + (as_of,)
+        cached = _cache.get('ledger')
+        if cached and cached[0] == stamp:
+            return cached[1]
+        assignments, payments = _load(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
+    ledger = compute_ledger(assignments, payments, as_of)
+    with _lock:
+        _cache['ledger'] = (stamp, ledger)
+    return ledger
+
+
+def student_balance(user_id, as_of=None):
+    """Ledger entry for one student (zeros when they have no charges or payments)."""
+    empty = {'user_id': user_id, 'charged': 0, 'paid': 0, 'prepaid': 0,
+             'balance': 0, 'arrears': 0, 'arrears_since': None}
+    return get_ledger(as_of)['students'].get(user_id, empty)
+
+
+def arrears_report(owner_id=None, as_of=None):
+    """
+    Students with unpaid charges, largest arrears first.
+    With owner_id, only assignments in that landlord's buildings are counted.
+    """
+    ledger = get_ledger(as_of)
+    if owner_id is None:
+        rows = [dict(s) for s in ledger['students'].values() if s['arrears'] > 0]
+    else:
+        totals = {}
+        for a in ledger['assignments'].values():
+            if a['owner_id'] != owner_id or a['arrears'] <= 0:
+                continue
+            row = totals.setdefault(a['user_id'], {'user_id': a['user_id'], 'charged': 0, 'paid': 0,
+                                                   'arrears': 0, 'arrears_since': a['arrears_since']})
+            row['charged'] += a['charged']
+            row['paid'] += a['paid']
+            row['arrears'] += a['arrears']
+            row['arrears_since'] = min(row['arrears_since'], a['arrears_since'])
+        rows = list(totals.values())
+    rows.sort(key=lambda r: r['arrears'], reverse=True)
+    return rows
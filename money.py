@@ -0,0 +1,117 @@
+"""
+Money amounts.
+
+payments.amount, room_assignments.monthly_rate and room_types.base_rate are
+stored as integer cents (see the migration in db.init_db), so SUMs, rollups
+and comparisons are exact integer arithmetic instead of accumulating REAL
+rounding error. Conversion happens only at the edges:
+
+    to_cents('1,234.50')  -> 123450     form fields, CSV imports, query args
+    Money(123450)                       arithmetic and display in Python
+    {{ cents|money }}     -> 1,234.50   templates
+    to_pesos(123450)      -> 1234.5     JSON and CSV output
+
+Money binds to SQLite as its integer cents, so it can be passed straight
+into queries.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+
+CENTS_PER_UNIT = 100
+_CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Peso amount (str, int, float or Decimal) -> integer cents, rounded half up; None for blank."""
+    if value is None or isinstance(value, Money):
+        return None if value is None else value.cents
+    if isinstance(value, str):
+        value = value.replace(',', '').replace('₱', '').strip()
+        if not value:
+            return None
+    try:
+        amount = Decimal(str(value)).quantize(_CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Not a money amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Not a money amount: {value!r}")
+    return int(amount * CENTS_PER_UNIT)
+
+
+def to_pesos(cents):
+    """Integer cents -> pesos as a JSON-friendly number (None stays None)."""
+    return None if cents is None else int(cents) / CENTS_PER_UNIT
+
+
+def format_money(cents):
+    """Integer cents -> '1,234.50' (template filter `money`); blank for None."""
+    if cents is None or cents == '':
+        return ''
+    return f"{Decimal(int(cents)).scaleb(-2):,.2f}"
+
+
+@total_ordering
+class Money:
+    """An exact amount of money held as integer cents."""
+
+    __slots__ = ('cents',)
+
+    def __init__(self, cents=0):
+        self.cents = int(cents or 0)
+
+    @classmethod
+    def from_pesos(cls, value):
+        return cls(to_cents(value))
+
+    @property
+    def pesos(self):
+        return to_pesos(self.cents)
+
+    def __add__(self, other):
+        return Money(self.cents + _cents(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Money(self.cents - _cents(other))
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __truediv__(self, count):
+        """Split into `count` parts, rounded half up to the cent (e.g. an average)."""
+        quotient = (Decimal(self.cents) / Decimal(count)).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+        return Money(int(quotient))
+
+    def __eq__(self, other):
+        return isinstance(other, (Money, int)) and self.cents == _cents(other)
+
+    def __lt__(self, other):
+        return self.cents < _cents(other)
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __int__(self):
+        return self.cents
+
+    def __str__(self):
+        return format_money(self.cents)
+
+    def __repr__(self):
+        return f"Money({self.cents})"
+
+    def __format__(self, spec):
+        return format(Decimal(self.cents).scaleb(-2), spec) if spec else str(self)
+
+    def __conform__(self, protocol):
+        # sqlite3 adaptation: bind as integer cents
+        return self.cents
+
+
+def _cents(value):
+    return value.cents if isinstance(value, Money) else int(value)
@@ -0,0 +1,211 @@
+"""
+Daily occupancy time series.
+
+occupancy_snapshots holds one row per day, building and room type with room
+and bed totals and how many were taken that day. A bed is taken on a day
+when a non-cancelled assignment covers it (start_date <= day <= end_date, open
+leases run on); a room counts as occupied when all its beds are taken, the
+same rule that drives rooms.is_available. Rooms are counted with their
+current building and type for every day.
+
+Snapshots are computed a month at a time in one vectorized sweep over
+room_assignments, archived history included when the month reaches it (a
+per-room difference array, cumulatively summed over the days), so
+backfilling years of history takes one pass per month and memory stays at
+rooms x 31 days however long the history is.
+
+    flask --app app snapshot-occupancy                      # today, plus any missed days
+    flask --app app snapshot-occupancy --from 2024-06-01    # backfill
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+import archive
+from db import get_db_connection
+
+
+def _days(value):
+    return np.datetime64(str(value)[:10], 'D')
+
+
+def compute_snapshots(cursor, start, end):
+    """Rows of (date, building_id, type_id, total_rooms, occupied_rooms, total_beds, occupied_beds) for start..end."""
+    start, end = _days(start), _days(end)
+    n_days = int((end - start).astype(np.int64)) + 1
+    if n_days <= 0:
+        return []
+
+    cursor.execute("""
+        SELECT r.room_id, COALESCE(r.building_id, 0) AS building_id, COALESCE(r.type_id, 0) AS type_id,
+               COALESCE(rt.capacity, 1) AS capacity
+        FROM rooms r
+        LEFT JOIN room_types rt ON r.type_id = rt.type_id
+        ORDER BY r.room_id
+    """)
+    rooms = cursor.fetchall()
+    if not rooms:
+        return []
+    room_ids = np.array([r['room_id'] for r in rooms], dtype=np.int64)
+    capacity = np.array([r['capacity'] for r in rooms], dtype=np.int64)
+
+    source = archive.table_source(cursor, 'room_assignments', str(start))
+    cursor.execute(f"""
+        SELECT room_id, start_date, end_date FROM {source} ra
+        WHERE status != 'cancelled' AND room_id IS NOT NULL AND start_date IS NOT NULL
+          AND start_date <= ? AND (end_date IS NULL OR end_date >= ?)
+    """, (str(end), str(start)))
+    leases = cursor.fetchall()
+
+    # Per-room difference array over the days; column n_days absorbs open ends
+    diff = np.zeros((len(rooms), n_days + 1), dtype=np.int64)
+    if leases:
+        lease_rooms = np.array([l['room_id'] for l in leases], dtype=np.int64)
+        slot = np.minimum(np.searchsorted(room_ids, lease_rooms), len(room_ids) - 1)
+        known = room_ids[slot] == lease_rooms
+        first = np.array([_days(l['start_date']) for l in leases]) - start
+        last = np.array([_days(l['end_date']) if l['end_date'] else end for l in leases]) - start
+        first = np.clip(first.astype(np.int64), 0, n_days)
+        last = np.clip(last.astype(np.int64), -1, n_days - 1)
+        np.add.at(diff, (slot[known], first[known]), 1)
+        np.add.at(diff, (slot[known], last[known] + 1), -1)
+    taken = np.minimum(np.cumsum(diff, axis=1)[:, :n_days], capacity[:, None])
+    full = taken >= capacity[:, None]
+
+    # Sum rooms into (building, type) groups
+    keys = [(r['building_id'], r['type_id']) for r in rooms]
+    groups = sorted(set(keys))
+    position = {key: i for i, key in enumerate(groups)}
+    group_of = np.array([position[k] for k in keys], dtype=np.int64)
+    g = len(groups)
+    total_rooms = np.bincount(group_of, minlength=g)
+    total_beds = np.bincount(group_of, weights=capacity, minlength=g).astype(np.int64)
+    occupied_beds = np.zeros((g, n_days), dtype=np.int64)
+    occupied_rooms = np.zeros((g, n_days), dtype=np.int64)
+    np.add.at(occupied_beds, group_of, taken)
+    np.add.at(occupied_rooms, group_of, full.astype(np.int64))
+
+    rows = []
+    for d in range(n_days):
+        day = str(start + d)
+        for i, (building_id, type_id) in enumerate(groups):
+            rows.append((day, building_id, type_id, int(total_rooms[i]), int(occupied_rooms[i, d]),
+                         int(total_beds[i]), int(occupied_beds[i, d])))
+    return rows
+
+
+def _month_spans(start, end):
+    """Split start..end (ISO dates) into (first, last) spans that never cross a month."""
+    day, end = date.fromisoformat(str(start)[:10]), date.fromisoformat(str(end)[:10])
+    while day <= end:
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        last = min(end, next_month - timedelta(days=1))
+        yield day.isoformat(), last.isoformat()
+        day = next_month
+
+
+def take_snapshots(conn, start=None, end=None):
+    """
+    Compute and store snapshots for start..end (default: today), one month per
+    transaction. Returns the number of days written.
+    """
+    end = end or date.today().isoformat()
+    start = start or end
+    cursor = conn.cursor()
+    days = 0
+    try:
+        for first, last in _month_spans(start, end):
+            rows = compute_snapshots(cursor, first, last)
+            # Replace whole days so rooms moved to another building/type leave no stale groups
+            cursor.execute("DELETE FROM occupancy_snapshots WHERE snapshot_date BETWEEN ? AND ?", (first, last))
+            cursor.executemany("""
+                INSERT INTO occupancy_snapshots (snapshot_date, building_id, type_id, total_rooms,
+                                                 occupied_rooms, total_beds, occupied_beds)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+            days += len({row[0] for row in rows})
+        return days
+    finally:
+        cursor.close()
+
+
+def fill_missing(conn, backfill_from=None):
+    """
+    Snapshot every day after the newest stored snapshot through today; with
+    no snapshots yet, backfill from `backfill_from` or the earliest lease.
+    Today is always recomputed, since it is still changing.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(snapshot_date) AS newest FROM occupancy_snapshots WHERE snapshot_date < date('now')")
+        newest = cursor.fetchone()['newest']
+        if newest:
+            start = (date.fromisoformat(newest) + timedelta(days=1)).isoformat()
+        else:
+            # The whole history, archived leases included
+            source = archive.table_source(cursor, 'room_assignments', date.min.isoformat())
+            cursor.execute(f"SELECT MIN(start_date) AS earliest FROM {source} ra WHERE status != 'cancelled'")
+            start = backfill_from or cursor.fetchone()['earliest'] or date.today().isoformat()
+    finally:
+        cursor.close()
+    today = date.today().isoformat()
+    return take_snapshots(conn, min(start, today), today)
+
+
+def get_series(cursor, start, end, owner_id=None, building_id=None, type_id=None, group='day'):
+    """
+    Occupancy per day (or per month, averaged over its days) between start and
+    end, summed over the selected buildings and room types.
+    """
+    period = "snapshot_date" if group == 'day' else "substr(snapshot_date, 1, 7)"
+    query = f"""
+        SELECT period, AVG(total_rooms) AS total_rooms, AVG(occupied_rooms) AS occupied_rooms,
+               AVG(total_beds) AS total_beds, AVG(occupied_beds) AS occupied_beds, COUNT(*) AS days
+        FROM (
+            SELECT {period} AS period, snapshot_date,
+                   SUM(total_rooms) AS total_rooms, SUM(occupied_rooms) AS occupied_rooms,
+                   SUM(total_beds) AS total_beds, SUM(occupied_beds) AS occupied_beds
+            FROM occupancy_snapshots s
+            WHERE snapshot_date BETWEEN ? AND ?
+    """
+    params = [start, end]
+    if owner_id is not None:
+        query += " AND building_id IN (SELECT building_id FROM buildings WHERE owner_id = ?)"
+        params.append(owner_id)
+    if building_id is not None:
+        query += " AND building_id = ?"
+        params.append(building_id)
+    if type_id is not None:
+        query += " AND type_id = ?"
+        params.append(type_id)
+    query += """
+            GROUP BY snapshot_date
+        )
+        GROUP BY period
+        ORDER BY period
+    """
+    cursor.execute(query, params)
+    series = []
+    for row in cursor.fetchall():
+        beds = row['total_beds'] or 0
+        series.append({
+            'period': row['period'],
+            'days': row['days'],
+            'total_rooms': round(row['total_rooms'], 2),
+            'occupied_rooms': round(row['occupied_rooms'], 2),
+            'total_beds': round(beds, 2),
+            'occupied_beds': round(row['occupied_beds'], 2),
+            'occupancy_rate': round(row['occupied_beds'] / beds, 4) if beds else 0,
+        })
+    return series
+
+
+def refresh():
+    """Bring the time series up to date (run daily, and at startup)."""
+    conn = get_db_connection()
+    try:
+        return fill_missing(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,210 @@
+"""
+Assignment overlap validation.
+
+A student may not hold two assignments whose date ranges overlap, and a room
+may not hold more overlapping assignments than its room type's capacity.
+Cancelled assignments never conflict; open leases (no end_date) run on.
+
+Single writes are checked with index probes on the partial indexes
+idx_assignments_user_dates / idx_assignments_room_dates (room_id or
+user_id, start_date, end_date over non-cancelled rows). Because every write
+goes through this check, a student's (or single room's) intervals never
+overlap, so sorted by start they are sorted by end too: only the interval
+with the latest start on or before the new end can overlap, and one
+descending index seek finds it in O(log n). Shared rooms read just the
+room's intervals that overlap the new range from the covering index.
+
+Batch validation loads the existing intervals of every room and student
+involved once, then sorts proposed and existing intervals together per key
+and sweeps them with a heap of end dates, so thousands of proposals are
+checked in O((n + m) log(n + m)) rather than pairwise.
+
+Conflicts are dicts:
+    {'kind': 'student' | 'room', 'user_id' | 'room_id': ..., 'capacity': (rooms only),
+     'conflicts_with': [{'assignment_id': ...} | {'index': ...}, with start_date/end_date]}
+Batch conflicts also carry the 'index' of the proposal they belong to.
+"""
+
+import heapq
+
+# Open-ended leases sort after any real date
+OPEN_END = '9999-12-31'
+
+
+def _end(value):
+    return str(value)[:10] if value else OPEN_END
+
+
+def _entry(row):
+    return {'assignment_id': row['assignment_id'], 'start_date': row['start_date'], 'end_date': row['end_date']}
+
+
+def _room_capacity(cursor, room_id):
+    cursor.execute("""
+        SELECT COALESCE(rt.capacity, 1) AS capacity
+        FROM rooms r LEFT JOIN room_types rt ON r.type_id = rt.type_id
+        WHERE r.room_id = ?
+    """, (room_id,))
+    row = cursor.fetchone()
+    return row['capacity'] if row else 1
+
+
+def _latest_before(cursor, column, key, end, exclude):
+    """The non-cancelled interval of `key` with the latest start on or before `end`."""
+    cursor.execute(f"""
+        SELECT assignment_id, start_date, end_date FROM room_assignments
+        WHERE {column} = ? AND status != 'cancelled' AND start_date <= ? AND assignment_id != ?
+        ORDER BY start_date DESC LIMIT 1
+    """, (key, end, exclude or -1))
+    return cursor.fetchone()
+
+
+def _peak(intervals, start, end):
+    """Most intervals (start, end) in force on any one day of [start, end]."""
+    events = sorted([(max(s, start), 0) for s, _ in intervals] + [(min(e, end), 1) for _, e in intervals])
+    peak = running = 0
+    for _, kind in events:
+        running += 1 if kind == 0 else -1
+        peak = max(peak, running)
+    return peak
+
+
+def check_assignment(cursor, user_id, room_id, start_date, end_date=None, assignment_id=None):
+    """
+    Conflicts for one assignment (excluding `assignment_id`, the row being
+    written). Call it inside the write transaction, after the write and
+    before commit, so no concurrent write can slip in between.
+    """
+    start, end = str(start_date)[:10], _end(end_date)
+    conflicts = []
+
+    if user_id:
+        row = _latest_before(cursor, 'user_id', user_id, end, assignment_id)
+        if row and _end(row['end_date']) >= start:
+            conflicts.append({'kind': 'student', 'user_id': user_id, 'conflicts_with': [_entry(row)]})
+
+    if room_id:
+        capacity = _room_capacity(cursor, room_id)
+        if capacity <= 1:
+            row = _latest_before(cursor, 'room_id', room_id, end, assignment_id)
+            overlapping = [row] if row and _end(row['end_date']) >= start else []
+        else:
+            cursor.execute("""
+                SELECT assignment_id, start_date, end_date FROM room_assignments
+                WHERE room_id = ? AND status != 'cancelled' AND start_date <= ?
+                  AND COALESCE(end_date, ?) >= ? AND assignment_id != ?
+            """, (room_id, end, OPEN_END, start, assignment_id or -1))
+            overlapping = cursor.fetchall()
+        if overlapping and _peak([(r['start_date'], _end(r['end_date'])) for r in overlapping], start, end) >= capacity:
+            conflicts.append({'kind': 'room', 'room_id': room_id, 'capacity': capacity,
+                              'conflicts_with': [_entry(r) for r in overlapping]})
+    return conflicts
+
+
+def conflict_message(conflicts):
+    """One human-readable line for flash messages."""
+    parts = []
+    for c in conflicts:
+        ranges = ', '.join(f"#{o.get('assignment_id', o.get('index'))} ({o['start_date']} to {o['end_date'] or 'open'})"
+                           for o in c['conflicts_with'][:3])
+        if c['kind'] == 'student':
+            parts.append(f"the student already has an assignment for these dates: {ranges}")
+        else:
+            parts.append(f"the room is full (capacity {c['capacity']}) for these dates: {ranges}")
+    return '; '.join(parts)
+
+
+def _load_existing(cursor, column, keys, chunk=500):
+    """Non-cancelled intervals for every key, as {key: [row, ...]}."""
+    existing = {}
+    keys = list(keys)
+    for i in range(0, len(keys), chunk):
+        part = keys[i:i + chunk]
+        cursor.execute(f"""
+            SELECT assignment_id, {column} AS owner, start_date, end_date FROM room_assignments
+            WHERE {column} IN ({','.join('?' * len(part))}) AND status != 'cancelled' AND start_date IS NOT NULL
+        """, part)
+        for row in cursor.fetchall():
+            existing.setdefault(row['owner'], []).append(row)
+    return existing
+
+
+def _sweep(intervals, capacity, on_conflict):
+    """
+    intervals: (start, end, is_proposal, ref) tuples for one key. Calls
+    on_conflict(involved) whenever more than `capacity` intervals are in force
+    at once and at least one of them is a proposal.
+    """
+    # Existing rows first on equal starts, so overflow is blamed on proposals
+    intervals.sort(key=lambda iv: (iv[0], iv[2]))
+    active = []  # heap of (end, position)
+    for position, (start, end, is_proposal, _) in enumerate(intervals):
+        while active and active[0][0] < start:
+            heapq.heappop(active)
+        heapq.heappush(active, (end, position))
+        if len(active) > capacity:
+            involved = [intervals[p] for _, p in active]
+            if any(iv[2] for iv in involved):
+                on_conflict(involved)
+
+
+def validate_batch(cursor, proposals):
+    """
+    Validate many proposed assignments against the database and each other.
+    `proposals` are dicts with user_id, room_id, start_date, end_date and
+    optionally assignment_id (when a proposal updates that row) and status.
+    Returns a list of conflicts, each with the 'index' of its proposal.
+    """
+    replaced = {p['assignment_id'] for p in proposals if p.get('assignment_id')}
+    live = [(i, p) for i, p in enumerate(proposals)
+            if p.get('status', 'active') != 'cancelled' and p.get('start_date')]
+
+    def reference(interval):
+        start, end, is_proposal, ref = interval
+        item = {'index': ref} if is_proposal else {'assignment_id': ref}
+        item.update({'start_date': start, 'end_date': None if end == OPEN_END else end})
+        return item
+
+    found = {}
+
+    def collect(kind, key_name, key, capacity=None):
+        def on_conflict(involved):
+            for interval in involved:
+                if not interval[2]:
+                    continue
+                entry = found.setdefault((interval[3], kind), {
+                    'index': interval[3], 'kind': kind, key_name: key, 'conflicts_with': {}})
+                if capacity is not None:
+                    entry['capacity'] = capacity
+                for other in involved:
+                    if other is not interval:
+                        entry['conflicts_with'][(other[2], other[3])] = reference(other)
+        return on_conflict
+
+    for kind, column in (('student', 'user_id'), ('room', 'room_id')):
+        grouped = {}
+        for i, p in live:
+            if p.get(column):
+                grouped.setdefault(int(p[column]), []).append(
+                    (str(p['start_date'])[:10], _end(p.get('end_date')), True, i))
+        existing = _load_existing(cursor, column, grouped)
+        capacities = {}
+        if kind == 'room' and grouped:
+            keys = list(grouped)
+            cursor.execute(f"""
+                SELECT r.room_id, COALESCE(rt.capacity, 1) AS capacity
+                FROM rooms r LEFT JOIN room_types rt ON r.type_id = rt.type_id
+                WHERE r.room_id IN ({','.join('?' * len(keys))})
+            """, keys)
+            capacities = {row['room_id']: row['capacity'] for row in cursor.fetchall()}
+        for key, intervals in grouped.items():
+            intervals += [(row['start_date'][:10], _end(row['end_date']), False, row['assignment_id'])
+                          for row in existing.get(key, []) if row['assignment_id'] not in replaced]
+            capacity = capacities.get(key, 1) if kind == 'room' else 1
+            _sweep(intervals, capacity, collect(kind, column, key, capacity if kind == 'room' else None))
+
+    conflicts = []
+    for entry in sorted(found.values(), key=lambda e: (e['index'], e['kind'])):
+        entry['conflicts_with'] = list(entry['conflicts_with'].values())
+        conflicts.append(entry)
+    return conflicts
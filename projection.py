@@ -0,0 +1,257 @@
+"""
+Revenue projection.
+
+Projects, per building and calendar month over the next PROJECTION_MONTHS
+months (starting with the current one), what active and pending leases will
+bill, how much of it is expected to be collected inside the window, and how
+much is at risk:
+
+- expected revenue: monthly_rate for every month a lease covers (open leases
+  run through the window);
+- collection rate: each lease's share of its charges paid so far, or its
+  building's rate when it has no billing history yet (the portfolio rate
+  when the building has none either);
+- payment lag: the historical distribution of months between a payment's
+  period and the month it was paid; expected collection for month m is
+  sum over k of collectable[m - k] * lag[k], so late payers shift cash into
+  later months and collections that land after the window are left out;
+- at risk: expected revenue that is not expected to be collected at all.
+
+Rates and payments are integer cents (money.py); projected amounts are
+fractional cents until they are reported, in pesos, by projection_report().
+
+Leases and payments are loaded into columnar arrays and everything is
+computed in one vectorized pass. The result is cached until leases,
+payments, rooms or buildings are written again (table_versions) or the
+month changes.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date
+
+import numpy as np
+
+from db import get_db_connection
+from ledger import month_label
+from money import CENTS_PER_UNIT
+from ref_cache import get_table_versions
+
+PROJECTION_MONTHS = int(os.getenv('PROJECTION_MONTHS', '12'))
+# Payments later than this many months count as paid in the last lag bucket
+MAX_LAG_MONTHS = 6
+
+PROJECTION_TABLES = ('room_assignments', 'payments', 'rooms', 'buildings')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+# Month number (months since 1970-01) of an ISO date column, as ledger._months computes it
+_MONTH = "((CAST(substr({0}, 1, 4) AS INTEGER) - 1970) * 12 + CAST(substr({0}, 6, 2) AS INTEGER) - 1)"
+# End month of an open lease: past any window
+OPEN_END = 1 << 40
+
+
+def _columns(cursor, query, count):
+    """Run `query` and return its result as `count` float64 column arrays."""
+    cursor.row_factory = None
+    cursor.execute(query)
+    rows = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, count)
+    return rows.T
+
+
+def _load(cursor, as_of):
+    """
+    Columnar lease arrays (months as month numbers), payments already due per
+    lease, amounts paid per lag in months, and building names. Payments are
+    aggregated in SQL over idx_payments_assignment rather than fetched row by row.
+    """
+    a_ids, b_ids, rates, starts, ends = _columns(cursor, f"""
+        SELECT ra.assignment_id, COALESCE(r.building_id, 0), COALESCE(ra.monthly_rate, 0),
+               {_MONTH.format('ra.start_date')},
+               COALESCE({_MONTH.format('ra.end_date')}, {OPEN_END})
+        FROM room_assignments ra
+        LEFT JOIN rooms r ON ra.room_id = r.room_id
+        WHERE ra.status IN ('active', 'pending') AND ra.start_date IS NOT NULL
+    """, 5)
+    leases = {'assignment_id': a_ids.astype(np.int64), 'building_id': b_ids.astype(np.int64),
+              'monthly_rate': rates, 'start': starts.astype(np.int64), 'end': ends.astype(np.int64)}
+
+    # Only payments for periods already billed count towards a lease's collection rate
+    next_month = (np.datetime64(as_of.isoformat(), 'M') + 1).astype('datetime64[D]')
+    p_assign, p_amount = _columns(cursor, f"""
+        SELECT assignment_id, SUM(amount)
+        FROM payments
+        WHERE assignment_id IS NOT NULL AND COALESCE(payment_period_start, payment_date) < '{next_month}'
+        GROUP BY assignment_id
+    """, 2)
+    paid = {'assignment_id': p_assign.astype(np.int64), 'amount': p_amount}
+
+    lag, lag_amount = _columns(cursor, f"""
+        SELECT MIN(MAX({_MONTH.format('payment_date')} - {_MONTH.format('COALESCE(payment_period_start, payment_date)')}, 0),
+                   {MAX_LAG_MONTHS}) AS lag,
+               SUM(COALESCE(amount, 0))
+        FROM payments
+        WHERE payment_date IS NOT NULL
+        GROUP BY lag
+    """, 2)
+    lag_amounts = np.bincount(lag.astype(np.int64), weights=lag_amount, minlength=MAX_LAG_MONTHS + 1)
+
+    cursor.row_factory = sqlite3.Row
+    cursor.execute("SELECT building_id, building_name, owner_id FROM buildings")
+    buildings = {row['building_id']: dict(row) for row in cursor.fetchall()}
+    return leases, paid, lag_amounts, buildings
+
+
+def compute_projection(leases, paid, lag_amounts, as_of=None, horizon=None):
+    """
+    Vectorized projection over the arrays from _load.
+    Returns the month labels, lag distribution, portfolio collection rate and
+    per-building arrays of shape (buildings, months).
+    """
+    as_of = as_of or date.today()
+    horizon = horizon or PROJECTION_MONTHS
+    first_month = int(np.datetime64(as_of.isoformat(), 'M').astype(np.int64))
+    window = first_month + np.arange(horizon)
+
+    # -- leases ---------------------------------------------------------------
+    a_ids = leases['assignment_id']
+    rates = leases['monthly_rate']
+    starts, ends = leases['start'], leases['end']
+    b_ids, b_slot = np.unique(leases['building_id'], return_inverse=True)
+    n, nb = len(a_ids), len(b_ids)
+
+    # -- payment history: lag distribution and amount paid per lease -----------
+    total = lag_amounts.sum()
+    lag_weights = lag_amounts / total if total > 0 else np.eye(MAX_LAG_MONTHS + 1)[0]
+
+    p_assign = paid['assignment_id']
+    if n:
+        order = np.argsort(a_ids)
+        pos = order[np.clip(np.searchsorted(a_ids, p_assign, sorter=order), 0, n - 1)]
+        linked = a_ids[pos] == p_assign
+        paid = np.bincount(pos[linked], weights=paid['amount'][linked], minlength=n)
+    else:
+        paid = np.zeros(0)
+
+    # Billed so far: every month from start through the current month (as in the ledger)
+    charged = np.clip(np.minimum(ends, first_month) - starts + 1, 0, None) * rates
+    has_history = charged > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lease_rate = np.where(has_history, np.clip(paid / charged, 0, 1), 0)
+        b_charged = np.bincount(b_slot, weights=charged, minlength=nb)
+        b_paid = np.bincount(b_slot, weights=np.minimum(paid, charged), minlength=nb)
+        portfolio_rate = float(b_paid.sum() / b_charged.sum()) if b_charged.sum() > 0 else 1.0
+        building_rate = np.where(b_charged > 0, b_paid / b_charged, portfolio_rate)
+    lease_rate = np.where(has_history, lease_rate, building_rate[b_slot])
+
+    # -- leases x months, summed per building ----------------------------------
+    covers = (starts[:, None] <= window[None, :]) & (ends[:, None] >= window[None, :])
+    billed = covers * rates[:, None]
+    expected = billed * lease_rate[:, None]
+    revenue = np.zeros((nb, horizon))
+    collectable = np.zeros((nb, horizon))
+    for j in range(horizon):
+        revenue[:, j] = np.bincount(b_slot, weights=billed[:, j], minlength=nb)
+        collectable[:, j] = np.bincount(b_slot, weights=expected[:, j], minlength=nb)
+
+    # Spread each month's collectable amount over the following months by lag
+    collection = np.zeros((nb, horizon))
+    for k, weight in enumerate(lag_weights[:horizon]):
+        collection[:, k:] += weight * collectable[:, :horizon - k]
+
+    return {
+        'as_of': as_of.isoformat(),
+        'months': [month_label(m) for m in window],
+        'lag_distribution': [round(float(w), 4) for w in lag_weights],
+        'collection_rate': round(portfolio_rate, 4),
+        'building_ids': b_ids.tolist(),
+        'revenue': revenue,
+        'collection': collection,
+        'at_risk': revenue - collectable,
+    }
+
+
+def get_projection(as_of=None):
+    """Return the cached projection, recomputing it only after a relevant write or a new month."""
+    as_of = as_of or date.today()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        versions = get_table_versions(cursor)
+        stamp = tuple(versions.get(t, 0) for t in PROJECTION_TABLES) + (as_of.strftime('%Y-%m'), PROJECTION_MONTHS)
+        cached = _cache.get('projection')
+        if cached and cached[0] == stamp:
+            return cached[1]
+        leases, paid, lag_amounts, buildings = _load(cursor, as_of)
+    finally:
+        cursor.close()
+        conn.close()
+
+    projection = compute_projection(leases, paid, lag_amounts, as_of.replace(day=1))
+    projection['buildings'] = buildings
+    with _lock:
+        _cache['projection'] = (stamp, projection)
+    return projection
+
+
+def _pesos(cents):
+    return round(float(cents) / CENTS_PER_UNIT, 2)
+
+
+def _series(months, revenue, collection, at_risk):
+    return [{
+        'month': month,
+        'expected_revenue': _pesos(revenue[i]),
+        'expected_collection': _pesos(collection[i]),
+        'at_risk': _pesos(at_risk[i]),
+    } for i, month in enumerate(months)]
+
+
+def projection_report(months=None, owner_id=None, building_id=None, as_of=None):
+    """
+    Projection for the next `months` months (at most PROJECTION_MONTHS), per
+    building and in total. With owner_id, only that landlord's buildings.
+    """
+    projection = get_projection(as_of)
+    months = min(months or PROJECTION_MONTHS, PROJECTION_MONTHS)
+    labels = projection['months'][:months]
+    names = projection['buildings']
+
+    selected = []
+    for i, b_id in enumerate(projection['building_ids']):
+        building = names.get(b_id, {})
+        if owner_id is not None and building.get('owner_id') != owner_id:
+            continue
+        if building_id is not None and b_id != building_id:
+            continue
+        selected.append(i)
+
+    revenue = projection['revenue'][selected, :months]
+    collection = projection['collection'][selected, :months]
+    at_risk = projection['at_risk'][selected, :months]
+    buildings = []
+    for row, i in enumerate(selected):
+        b_id = projection['building_ids'][i]
+        buildings.append({
+            'building_id': b_id or None,
+            'building_name': names.get(b_id, {}).get('building_name'),
+            'expected_revenue': _pesos(revenue[row].sum()),
+            'expected_collection': _pesos(collection[row].sum()),
+            'at_risk': _pesos(at_risk[row].sum()),
+            'months': _series(labels, revenue[row], collection[row], at_risk[row]),
+        })
+
+    return {
+        'as_of': projection['as_of'],
+        'months': labels,
+        'collection_rate': projection['collection_rate'],
+        'lag_distribution': projection['lag_distribution'],
+        'expected_revenue': _pesos(revenue.sum()),
+        'expected_collection': _pesos(collection.sum()),
+        'at_risk': _pesos(at_risk.sum()),
+        'totals': _series(labels, revenue.sum(axis=0), collection.sum(axis=0), at_risk.sum(axis=0)),
+        'buildings': buildings,
+    }
@@ -0,0 +1,98 @@
+"""
+Receipt number allocator.
+
+Receipts look like PMT-YYYYMMDD-0001 and are numbered from a per-day
+counter row in receipt_counters. allocate_receipt() bumps the counter with
+the caller's cursor, so the number is taken inside the same transaction as
+the payment insert: SQLite's write lock serialises concurrent writers and a
+rolled-back insert also rolls back its number.
+
+Setting RECEIPT_BLOCK_SIZE (e.g. 50) makes each worker process reserve a
+block of numbers at once in a short transaction of its own and hand them out
+from memory, so concurrent entry touches the counter row once per block.
+Numbers left in a block when the worker exits are skipped, not reused.
+"""
+
+import os
+import threading
+from datetime import date, datetime
+
+from db import get_db_connection
+
+RECEIPT_PREFIX = 'PMT'
+BLOCK_SIZE = int(os.getenv('RECEIPT_BLOCK_SIZE', '0'))
+
+_blocks = {}    # day -> [next value, last reserved value]
+_lock = threading.Lock()
+
+
+def _day_key(day):
+    if day is None:
+        day = date.today()
+    elif isinstance(day, str):
+        day = datetime.strptime(day[:10], '%Y-%m-%d').date()
+    elif isinstance(day, datetime):
+        day = day.date()
+    return day.strftime('%Y%m%d')
+
+
+def format_receipt(day_key, value):
+    return f"{RECEIPT_PREFIX}-{day_key}-{value:04d}"
+
+
+def _reserve(cursor, day_key, count):
+    """Advance the day's counter by `count` and return the last value reserved."""
+    cursor.execute("UPDATE receipt_counters SET last_value = last_value + ? WHERE day = ?", (count, day_key))
+    if cursor.rowcount == 0:
+        # First allocation of the day: start above any receipt already issued for
+        # it (e.g. by the old timestamp-based scheme). The range uses the UNIQUE index.
+        prefix = f"{RECEIPT_PREFIX}-{day_key}-"
+        cursor.execute("""
+            INSERT INTO receipt_counters (day, last_value)
+            VALUES (?, COALESCE((
+                SELECT MAX(CAST(substr(receipt_number, ?) AS INTEGER)) FROM payments
+                WHERE receipt_number >= ? AND receipt_number < ?
+            ), 0) + ?)
+            ON CONFLICT(day) DO UPDATE SET last_value = last_value + ?
+        """, (day_key, len(prefix) + 1, prefix, prefix[:-1] + '.', count, count))
+    cursor.execute("SELECT last_value FROM receipt_counters WHERE day = ?", (day_key,))
+    return cursor.fetchone()['last_value']
+
+
+def allocate_receipt(cursor, day=None):
+    """
+    Return the next receipt number for `day` (date or 'YYYY-MM-DD', default today).
+    Without block reservation the counter is bumped on `cursor`, so the
+    caller's commit (or rollback) covers the receipt together with the payment.
+    """
+    day_key = _day_key(day)
+    if BLOCK_SIZE > 1:
+        return format_receipt(day_key, _next_from_block(day_key))
+    return format_receipt(day_key, _reserve(cursor, day_key, 1))
+
+
+def _next_from_block(day_key):
+    with _lock:
+        block = _blocks.get(day_key)
+        if block is None or block[0] > block[1]:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                last = _reserve(cursor, day_key, BLOCK_SIZE)
+                conn.commit()
+            finally:
+                cursor.close()
+                conn.close()
+            block = _blocks[day_key] = [last - BLOCK_SIZE + 1, last]
+            # Drop blocks for earlier days
+            for old in [d for d in _blocks if d < day_key]:
+                del _blocks[old]
+        value = block[0]
+        block[0] += 1
+        return value
+
+
+def reset_blocks():
+    """Forget reserved blocks; a forked worker must not hand out its parent's numbers."""
+    with _lock:
+        _blocks.clear()
@@ -0,0 +1,252 @@
+"""
+Bank / GCash statement reconciliation import.
+
+A statement CSV is streamed line by line and each credit is matched to a
+student and one of their assignments using in-memory hash indexes built
+once per import:
+
+  * receipt numbers already in payments  -> line was imported before
+  * student phone numbers, usernames, emails and names (found in the
+    reference/description text)          -> student
+  * assignment monthly_rate (cents)      -> assignments expecting that amount
+  * assignment start/end dates           -> lease active on the transfer date
+                                            (with DATE_WINDOW_DAYS of slack)
+
+Lines that resolve to exactly one assignment are inserted together in a
+single executemany transaction (lines without a reference get a receipt
+number from receipts.py); everything else is reported back with a reason.
+"""
+
+import calendar
+import csv
+import io
+import re
+from datetime import datetime, timedelta
+
+from db import get_db_connection
+from money import format_money, to_cents
+from receipts import allocate_receipt
+
+DATE_WINDOW_DAYS = 7
+
+# Accepted header spellings for each logical column (compared lower-cased)
+COLUMN_ALIASES = {
+    'date': ('date', 'transaction date', 'txn date', 'posting date', 'value date', 'date/time'),
+    'amount': ('amount', 'credit', 'credit amount', 'deposit', 'amount received'),
+    'reference': ('reference', 'reference no', 'reference no.', 'reference number', 'ref', 'ref no',
+                  'receipt', 'receipt number', 'transaction id'),
+    'description': ('description', 'details', 'particulars', 'remarks', 'memo', 'sender', 'name', 'account'),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M', '%b %d, %Y')
+
+TOKEN = re.compile(r"[A-Za-z0-9@._+-]+")
+DIGITS = re.compile(r"\d+")
+
+
+def _normalize_phone(value):
+    """Last 10 digits, so 0917..., +63917... and 63917... all compare equal."""
+    digits = ''.join(DIGITS.findall(value or ''))
+    return digits[-10:] if len(digits) >= 10 else None
+
+
+def _parse_date(value):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_amount(value):
+    """Statement amount -> integer cents (None when it is not a number)."""
+    cleaned = re.sub(r"[^\d.\-]", "", value or '')
+    try:
+        return to_cents(cleaned)
+    except ValueError:
+        return None
+
+
+def _resolve_columns(fieldnames):
+    lookup = {name.strip().lower(): name for name in fieldnames or []}
+    columns = {}
+    for logical, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lookup:
+                columns[logical] = lookup[alias]
+                break
+    return columns
+
+
+class StatementIndex:
+    """Hash indexes over students, assignments and receipts used to match statement lines."""
+
+    def __init__(self, cursor, owner_id=None):
+        cursor.execute("SELECT receipt_number FROM payments WHERE receipt_number IS NOT NULL")
+        self.receipts = {row['receipt_number'].strip().upper() for row in cursor.fetchall()}
+
+        query = """
+            SELECT ra.assignment_id, ra.user_id, ra.monthly_rate, ra.start_date, ra.end_date,
+                   u.username, u.email, u.phone, u.first_name, u.last_name
+            FROM room_assignments ra
+            JOIN users u ON ra.user_id = u.user_id
+            LEFT JOIN rooms r ON ra.room_id = r.room_id
+            LEFT JOIN buildings b ON r.building_id = b.building_id
+            WHERE ra.status IN ('active', 'pending')
+        """
+        params = []
+        if owner_id is not None:
+            query += " AND b.owner_id = ?"
+            params.append(owner_id)
+        cursor.execute(query, params)
+
+        self.assignments = {}      # assignment_id -> row
+        self.by_amount = {}        # monthly_rate in cents -> [assignment_id]
+        self.by_user = {}          # user_id -> [assignment_id]
+        self.by_token = {}         # username / email / phone / full name -> user_id
+        for row in cursor.fetchall():
+            a = dict(row)
+            a['start'] = _parse_date(a['start_date'])
+            a['end'] = _parse_date(a['end_date'])
+            self.assignments[a['assignment_id']] = a
+            if a['monthly_rate'] is not None:
+                self.by_amount.setdefault(a['monthly_rate'], []).append(a['assignment_id'])
+            self.by_user.setdefault(a['user_id'], []).append(a['assignment_id'])
+            for token in (a['username'], a['email']):
+                if token:
+                    self.by_token[token.lower()] = a['user_id']
+            phone = _normalize_phone(a['phone'])
+            if phone:
+                self.by_token[phone] = a['user_id']
+            full_name = ' '.join(f"{a['first_name'] or ''} {a['last_name'] or ''}".lower().split())
+            if full_name:
+                self.by_token[full_name] = a['user_id']
+
+    def _users_in_text(self, text):
+        text = (text or '').lower()
+        found = set()
+        for token in TOKEN.findall(text):
+            if token in self.by_token:
+                found.add(self.by_token[token])
+        phone = _normalize_phone(text)
+        if phone and phone in self.by_token:
+            found.add(self.by_token[phone])
+        # Full names are keyed with single spaces: probe runs of 2-4 consecutive words
+        words = re.findall(r"[a-z]+", text)
+        for size in range(2, 5):
+            for i in range(len(words) - size + 1):
+                user_id = self.by_token.get(' '.join(words[i:i + size]))
+                if user_id is not None:
+                    found.add(user_id)
+        return found
+
+    def _in_window(self, assignment_id, day):
+        a = self.assignments[assignment_id]
+        slack = timedelta(days=DATE_WINDOW_DAYS)
+        if a['start'] and day < a['start'] - slack:
+            return False
+        if a['end'] and day > a['end'] + slack:
+            return False
+        return True
+
+    def match(self, day, amount, reference, description):
+        """Return (assignment row or None, status, reason)."""
+        if reference and reference.strip().upper() in self.receipts:
+            return None, 'duplicate', 'Reference already recorded as a receipt'
+
+        users = self._users_in_text(f"{reference or ''} {description or ''}")
+        if users:
+            candidates = [aid for uid in users for aid in self.by_user.get(uid, [])]
+            candidates = [aid for aid in candidates if self._in_window(aid, day)]
+            # Prefer the lease whose rate equals the transfer when a student has several
+            exact = [aid for aid in candidates if aid in self.by_amount.get(amount, ())]
+            if len(exact) == 1 or len(candidates) == 1:
+                return self.assignments[(exact or candidates)[0]], 'matched', None
+            if not candidates:
+                return None, 'unmatched', 'Student found but no active lease on that date'
+            return None, 'ambiguous', f'{len(candidates)} leases for the identified student'
+
+        candidates = [aid for aid in self.by_amount.get(amount, ()) if self._in_window(aid, day)]
+        if len(candidates) == 1:
+            return self.assignments[candidates[0]], 'matched', None
+        if candidates:
+            return None, 'ambiguous', f'{len(candidates)} leases expect {format_money(amount)} on that date'
+        return None, 'unmatched', 'No student or lease matches this line'
+
+
+def import_statement(stream, recorded_by, payment_method='gcash', owner_id=None, dry_run=False):
+    """
+    Reconcile a statement CSV (binary or text stream) and record the matched payments.
+    Returns a summary dict with counts and the per-line results that need attention.
+    """
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) or hasattr(stream, 'readinto'):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(stream)
+    columns = _resolve_columns(reader.fieldnames)
+    missing = [c for c in ('date', 'amount') if c not in columns]
+    if missing:
+        raise ValueError(f"Statement is missing required column(s): {', '.join(missing)}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    summary = {'lines': 0, 'matched': 0, 'duplicate': 0, 'ambiguous': 0, 'unmatched': 0,
+               'skipped': 0, 'total_amount': 0, 'issues': []}
+    try:
+        index = StatementIndex(cursor, owner_id)
+        batch = []
+        seen_references = set()
+
+        for line_no, row in enumerate(reader, start=2):
+            summary['lines'] += 1
+            day = _parse_date(row.get(columns['date']))
+            amount = _parse_amount(row.get(columns['amount']))
+            reference = (row.get(columns.get('reference', ''), '') or '').strip() or None
+            description = (row.get(columns.get('description', ''), '') or '').strip()
+
+            if day is None or amount is None or amount <= 0:
+                summary['skipped'] += 1
+                summary['issues'].append({'line': line_no, 'status': 'skipped', 'reference': reference,
+                                          'amount': amount, 'reason': 'Not a dated credit line'})
+                continue
+
+            if reference and reference.upper() in seen_references:
+                assignment, status, reason = None, 'duplicate', 'Reference repeated within the statement'
+            else:
+                assignment, status, reason = index.match(day, amount, reference, description)
+
+            summary[status] += 1
+            if status != 'matched':
+                summary['issues'].append({'line': line_no, 'status': status, 'date': day.isoformat(),
+                                          'amount': amount, 'reference': reference,
+                                          'description': description, 'reason': reason})
+                continue
+
+            if reference:
+                seen_references.add(reference.upper())
+            last_day = calendar.monthrange(day.year, day.month)[1]
+            batch.append((
+                assignment['user_id'], assignment['assignment_id'], amount, payment_method,
+                day.isoformat(), day.replace(day=1).isoformat(), day.replace(day=last_day).isoformat(),
+                reference, recorded_by, f"Imported from statement: {description}"[:500],
+            ))
+            summary['total_amount'] += amount
+
+        if batch and not dry_run:
+            # Lines without a bank reference get a regular receipt number
+            batch = [line[:7] + (line[7] or allocate_receipt(cursor, line[4]),) + line[8:] for line in batch]
+            cursor.executemany("""
+                INSERT INTO payments (
+                    user_id, assignment_id, amount, payment_method, payment_date,
+                    payment_period_start, payment_period_end, receipt_number,
+                    recorded_by, notes
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+            conn.commit()
+        return summary
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
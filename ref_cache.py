@@ -0,0 +1,139 @@
+"""
+Process-local cache for the small reference sets behind form dropdowns
+(active buildings, room types, landlords, students).
+
+Each set is cached per role scope together with the versions of the tables it
+was built from. A request costs a single read of table_versions; the lookup
+query itself only runs again after one of those tables has been written.
+"""
+
+import threading
+
+from db import get_db_connection
+
+# name -> (tables it depends on, SQL for every scope, SQL for a landlord scope)
+REFERENCE_SETS = {
+    'buildings': (
+        ('buildings',),
+        """
+            SELECT building_id, building_name, total_floors, owner_id
+            FROM buildings
+            WHERE is_active = 1
+            ORDER BY building_name
+        """,
+        """
+            SELECT building_id, building_name, total_floors, owner_id
+            FROM buildings
+            WHERE is_active = 1 AND owner_id = ?
+            ORDER BY building_name
+        """,
+    ),
+    'room_types': (
+        ('room_types',),
+        "SELECT type_id, type_name, base_rate, capacity FROM room_types WHERE is_active = 1 ORDER BY type_id",
+        None,
+    ),
+    'landlords': (
+        ('users',),
+        """
+            SELECT user_id, username, first_name, last_name
+            FROM users
+            WHERE role = 'landlord' AND is_active = 1
+            ORDER BY username
+        """,
+        None,
+    ),
+    'students': (
+        ('users', 'buildings', 'rooms', 'room_assignments'),
+        """
+            SELECT user_id, username, role, first_name, last_name
+            FROM users
+            WHERE role = 'student' AND is_active = 1
+            ORDER BY first_name, last_name
+        """,
+        """
+            SELECT DISTINCT u.user_id, u.username, u.role, u.first_name, u.last_name
+            FROM users u
+            JOIN room_assignments ra ON u.user_id = ra.user_id
+            JOIN rooms r ON ra.room_id = r.room_id
+            JOIN buildings b ON r.building_id = b.building_id
+            WHERE b.owner_id = ? AND u.is_active = 1
+            ORDER BY u.first_name, u.last_name
+        """,
+    ),
+}
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def get_table_versions(cursor):
+    """Return {table_name: version} for every versioned table in one query."""
+    cursor.execute("SELECT table_name, version FROM table_versions")
+    return {row['table_name']: row['version'] for row in cursor.fetchall()}
+
+
+def _scope(name, role, user_id):
+    """Landlords only see their own rows for sets that have a landlord query."""
+    if role == 'landlord' and REFERENCE_SETS[name][2] is not None:
+        return user_id
+    return None
+
+
+def get_reference(name, role=None, user_id=None, cursor=None, versions=None):
+    """
+    Return the cached rows (list of dicts) of a reference set for a role scope.
+    Pass an open cursor to reuse the caller's connection, and versions to reuse
+    a table_versions read already made during the same request.
+    """
+    tables, query, landlord_query = REFERENCE_SETS[name]
+    scope = _scope(name, role, user_id)
+
+    own_conn = None
+    if cursor is None:
+        own_conn = get_db_connection()
+        cursor = own_conn.cursor()
+    try:
+        if versions is None:
+            versions = get_table_versions(cursor)
+        stamp = tuple(versions.get(t, 0) for t in tables)
+
+        key = (name, scope)
+        entry = _cache.get(key)
+        if entry and entry[0] == stamp:
+            return entry[1]
+
+        if scope is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(landlord_query, (scope,))
+        rows = [dict(row) for row in cursor.fetchall()]
+
+        with _lock:
+            _cache[key] = (stamp, rows)
+        return rows
+    finally:
+        if own_conn is not None:
+            cursor.close()
+            own_conn.close()
+
+
+def preload():
+    """Warm every reference set for the global scope and each landlord's scope."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        versions = get_table_versions(cursor)
+        for name in REFERENCE_SETS:
+            get_reference(name, cursor=cursor, versions=versions)
+        for landlord in get_reference('landlords', cursor=cursor, versions=versions):
+            for name in ('buildings', 'students'):
+                get_reference(name, 'landlord', landlord['user_id'], cursor=cursor, versions=versions)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def clear():
+    with _lock:
+        _cache.clear()
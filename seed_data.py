@@ -6,6 +6,7 @@ Run this after initializing the database with db.init_db()
 import sqlite3
 from werkzeug.security import generate_password_hash
 from db import get_db_connection
+from money import to_cents
 
 def seed_database():
     conn = get_db_connection()
@@ -43,9 +44,9 @@ def seed_database():
         # 3. Insert Room Types
         print("Seeding room types...")
         room_types_data = [
-            ('Single', 5000.00, 1, 'Single occupancy room with bed, desk, and cabinet', 'Bed, Desk, Cabinet, Window', 1),
-            ('Double', 3500.00, 2, 'Two-bed room shared by two students', '2 Beds, 2 Cabinets, Study Table, Window', 1),
-            ('Suite', 8000.00, 2, 'Premium room with private bathroom', 'Private CR, Aircon, 2 Beds, Study Area, Balcony', 1),
+            ('Single', to_cents('5000.00'), 1, 'Single occupancy room with bed, desk, and cabinet', 'Bed, Desk, Cabinet, Window', 1),
+            ('Double', to_cents('3500.00'), 2, 'Two-bed room shared by two students', '2 Beds, 2 Cabinets, Study Table, Window', 1),
+            ('Suite', to_cents('8000.00'), 2, 'Premium room with private bathroom', 'Private CR, Aircon, 2 Beds, Study Area, Balcony', 1),
         ]
         
         cursor.executemany("""
@@ -83,13 +84,13 @@ def seed_database():
         # 5. Insert Room Assignments
         print("Seeding room assignments...")
         assignments_data = [
-            (3, 3, '2025-01-01', '2025-12-31', 3500.00, 'active', 1, 'Initial assignment'),  # student1 -> A103
-            (4, 8, '2025-02-01', '2025-12-31', 3500.00, 'active', 1, 'Mid-year assignment'),  # student2 -> B201
+            (3, 3, '2025-01-01', '2025-12-31', to_cents('3500.00'), 'active', 1, 'Initial assignment'),  # student1 -> A103
+            (4, 8, '2025-02-01', '2025-12-31', to_cents('3500.00'), 'active', 1, 'Mid-year assignment'),  # student2 -> B201
             
             # EXPIRED ASSIGNMENT SCENARIO (for testing expire_assignments feature)
             # John had Room 101 (A101) from Jan 1 - Nov 30, 2025
             # Today is Dec 13, 2025 - this should be auto-expired
-            (5, 1, '2025-01-01', '2025-11-30', 5000.00, 'active', 1, 'EXPIRED - Should be completed'),  # student3 -> A101 (EXPIRED!)
+            (5, 1, '2025-01-01', '2025-11-30', to_cents('5000.00'), 'active', 1, 'EXPIRED - Should be completed'),  # student3 -> A101 (EXPIRED!)
         ]
         
         cursor.executemany("""
@@ -100,9 +101,9 @@ def seed_database():
         # 6. Insert Payments
         print("Seeding payments...")
         payments_data = [
-            (3, 1, 3500.00, 'cash', '2025-01-05', '2025-01-01', '2025-01-31', 'RCPT-001', 1, 'January payment'),
-            (3, 1, 3500.00, 'bank_transfer', '2025-02-05', '2025-02-01', '2025-02-28', 'RCPT-002', 1, 'February payment'),
-            (4, 2, 3500.00, 'cash', '2025-02-10', '2025-02-01', '2025-02-28', 'RCPT-003', 1, 'February payment'),
+            (3, 1, to_cents('3500.00'), 'cash', '2025-01-05', '2025-01-01', '2025-01-31', 'RCPT-001', 1, 'January payment'),
+            (3, 1, to_cents('3500.00'), 'bank_transfer', '2025-02-05', '2025-02-01', '2025-02-28', 'RCPT-002', 1, 'February payment'),
+            (4, 2, to_cents('3500.00'), 'cash', '2025-02-10', '2025-02-01', '2025-02-28', 'RCPT-003', 1, 'February payment'),
         ]
         
         cursor.executemany("""
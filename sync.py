@@ -0,0 +1,227 @@
+"""
+Incremental sync API.
+
+Downstream systems pull the rows of one entity changed since their last
+pull instead of full CSV exports:
+
+    GET /api/sync/payments?cursor=<token>&limit=1000
+
+The response is NDJSON, one object per line:
+
+    {"type": "upsert", "entity": "payments", "id": 12, "updated_at": "...", "data": {...}}
+    {"type": "delete", "entity": "payments", "id": 9, "deleted_at": "..."}
+    {"type": "cursor", "cursor": "<token>", "more": false}
+
+Rows are sent as stored, so money columns (amount, monthly_rate) are
+integer cents (see money.py).
+
+Rows come in keyset order of (updated_at, id) and deletes in order of
+(deleted_at, tombstone id); the final cursor line carries both positions
+as an opaque token to pass back on the next pull (no cursor: from the
+start). Keep pulling while "more" is true.
+
+Only rows at least SETTLE_SECONDS old are returned: updated_at has
+one-second resolution, so this keeps a row committed later in the same
+second as a pull from ever landing behind the consumer's cursor.
+
+Tombstones older than SYNC_TOMBSTONE_DAYS are pruned (flask --app app
+prune-tombstones); a consumer whose cursor is behind the newest pruned
+tombstone of that entity gets HTTP 410 and must resync from an empty
+cursor; the resync starts past the pruned tombstones, so its cursor is
+never behind them.
+"""
+
+import base64
+import json
+import os
+
+from db import SYNC_TABLES, get_db_connection
+
+SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', '2'))
+TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', '90'))
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+# Columns never sent downstream
+EXCLUDED_COLUMNS = {'users': ('password_hash',)}
+
+# Rows owned by landlord :me
+_LANDLORD_ROOMS = """SELECT r.room_id FROM rooms r JOIN buildings b ON r.building_id = b.building_id
+                     WHERE b.owner_id = :me"""
+_LANDLORD_SCOPE = {
+    'users': f"""user_id = :me OR user_id IN (SELECT user_id FROM room_assignments
+                                                WHERE room_id IN ({_LANDLORD_ROOMS}))""",
+    'buildings': "owner_id = :me",
+    'rooms': "building_id IN (SELECT building_id FROM buildings WHERE owner_id = :me)",
+    'room_assignments': f"room_id IN ({_LANDLORD_ROOMS})",
+    'payments': f"""assignment_id IN (SELECT assignment_id FROM room_assignments
+                                      WHERE room_id IN ({_LANDLORD_ROOMS}))""",
+    'room_types': None,
+}
+
+# Rows of student :me (and the rooms and buildings they are assigned to)
+_STUDENT_ROOMS = "SELECT room_id FROM room_assignments WHERE user_id = :me"
+_STUDENT_SCOPE = {
+    'users': "user_id = :me",
+    'buildings': f"building_id IN (SELECT building_id FROM rooms WHERE room_id IN ({_STUDENT_ROOMS}))",
+    'rooms': f"room_id IN ({_STUDENT_ROOMS})",
+    'room_assignments': "user_id = :me",
+    'payments': "user_id = :me",
+    'room_types': None,
+}
+
+
+class CursorError(ValueError):
+    """The sync cursor could not be decoded."""
+
+
+def encode_cursor(position):
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Cursor token -> {'u': [updated_at, id], 'd': [deleted_at, tombstone_id]} (the start when empty)."""
+    if not token:
+        return {'u': ['', 0], 'd': ['', 0]}
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        updated_at, row_id = position['u']
+        deleted_at, tombstone_id = position['d']
+        return {'u': [str(updated_at), int(row_id)], 'd': [str(deleted_at), int(tombstone_id)]}
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError(f"Invalid sync cursor: {e}") from e
+
+
+def _scope(entity, role):
+    """SQL condition limiting `entity` rows to what `role` may see (None: everything)."""
+    if role == 'admin':
+        return None
+    scopes = _LANDLORD_SCOPE if role == 'landlord' else _STUDENT_SCOPE
+    return scopes[entity]
+
+
+def _tombstone_scope(entity, role):
+    if role == 'admin' or entity == 'room_types':
+        return None
+    if role == 'landlord':
+        return "(owner_id = :me OR (table_name = 'users' AND row_id = :me))"
+    return "(user_id = :me OR (table_name = 'users' AND row_id = :me))"
+
+
+def _watermark_key(entity):
+    return f'newest_pruned_tombstone:{entity}'
+
+
+def pruned_watermark(cursor, entity):
+    """[deleted_at, tombstone_id] of the newest pruned tombstone of `entity` (None: never pruned)."""
+    cursor.execute("SELECT value FROM sync_meta WHERE key = ?", (_watermark_key(entity),))
+    row = cursor.fetchone()
+    return json.loads(row['value']) if row and row['value'] else None
+
+
+def needs_resync(cursor, entity, position):
+    """True when tombstones of `entity` the consumer has not seen were already pruned."""
+    if not position['d'][0] and not position['u'][0]:
+        return False
+    watermark = pruned_watermark(cursor, entity)
+    return watermark is not None and position['d'] < watermark
+
+
+def _columns(cursor, entity):
+    cursor.execute(f"PRAGMA table_info({entity})")
+    excluded = EXCLUDED_COLUMNS.get(entity, ())
+    return [row['name'] for row in cursor.fetchall() if row['name'] not in excluded]
+
+
+def stream_changes(entity, position, limit, role, user_id):
+    """Yield the NDJSON lines of one sync page (see module docstring)."""
+    key = SYNC_TABLES[entity]
+    params = {'me': user_id, 'limit': limit, 'settle': f'-{SETTLE_SECONDS} seconds'}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        columns = _columns(cursor, entity)
+        query = f"""
+            SELECT {', '.join(columns)} FROM {entity}
+            WHERE (updated_at, {key}) > (:after_ts, :after_id)
+              AND updated_at <= datetime('now', :settle)
+        """
+        scope = _scope(entity, role)
+        if scope:
+            query += f" AND ({scope})"
+        query += f" ORDER BY updated_at, {key} LIMIT :limit"
+        cursor.execute(query, dict(params, after_ts=position['u'][0], after_id=position['u'][1]))
+        rows_seen = 0
+        last_row = position['u']
+        while True:
+            batch = cursor.fetchmany(500)
+            if not batch:
+                break
+            for row in batch:
+                data = dict(row)
+                rows_seen += 1
+                last_row = [data['updated_at'], data[key]]
+                yield json.dumps({'type': 'upsert', 'entity': entity, 'id': data[key],
+                                  'updated_at': data['updated_at'], 'data': data}, default=str) + '\n'
+
+        query = """
+            SELECT tombstone_id, row_id, deleted_at FROM sync_tombstones
+            WHERE table_name = :entity AND (deleted_at, tombstone_id) > (:after_ts, :after_id)
+              AND deleted_at <= datetime('now', :settle)
+        """
+        scope = _tombstone_scope(entity, role)
+        if scope:
+            query += f" AND {scope}"
+        query += " ORDER BY deleted_at, tombstone_id LIMIT :limit"
+        # A pull from an empty cursor starts after the pruned tombstones, so the
+        # cursor it hands out is never behind the watermark (and never gets a 410)
+        after = position['d']
+        watermark = pruned_watermark(cursor, entity)
+        if watermark is not None and after < watermark:
+            after = watermark
+        cursor.execute(query, dict(params, entity=entity, after_ts=after[0], after_id=after[1]))
+        tombstones = cursor.fetchall()
+        last_tombstone = after
+        for t in tombstones:
+            last_tombstone = [t['deleted_at'], t['tombstone_id']]
+            yield json.dumps({'type': 'delete', 'entity': entity, 'id': t['row_id'],
+                              'deleted_at': t['deleted_at']}) + '\n'
+
+        more = rows_seen >= limit or len(tombstones) >= limit
+        yield json.dumps({'type': 'cursor', 'cursor': encode_cursor({'u': last_row, 'd': last_tombstone}),
+                          'more': more}) + '\n'
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def prune_tombstones(conn, days=None):
+    """Delete tombstones older than `days` (SYNC_TOMBSTONE_DAYS); returns how many were removed."""
+    days = TOMBSTONE_DAYS if days is None else days
+    cursor = conn.cursor()
+    try:
+        removed = 0
+        for entity in SYNC_TABLES:
+            cursor.execute("""
+                SELECT deleted_at, tombstone_id FROM sync_tombstones
+                WHERE table_name = ? AND deleted_at < datetime('now', ?)
+                ORDER BY deleted_at DESC, tombstone_id DESC LIMIT 1
+            """, (entity, f'-{days} days'))
+            newest = cursor.fetchone()
+            if newest is None:
+                continue
+            cursor.execute("""
+                DELETE FROM sync_tombstones
+                WHERE table_name = ? AND (deleted_at, tombstone_id) <= (?, ?)
+            """, (entity, newest['deleted_at'], newest['tombstone_id']))
+            removed += cursor.rowcount
+            # Consumers of this entity whose cursor is behind the newest pruned tombstone missed deletes
+            cursor.execute("""
+                INSERT INTO sync_meta (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, (_watermark_key(entity), json.dumps([newest['deleted_at'], newest['tombstone_id']])))
+        conn.commit()
+        return removed
+    finally:
+        cursor.close()
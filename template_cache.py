@@ -0,0 +1,59 @@
+"""
+Jinja template compilation cache.
+Compiled template bytecode is stored on disk so every worker (and every
+restart) reuses it instead of recompiling templates on the first request.
+
+Prebuild the cache during deployment:
+    python template_cache.py
+    flask --app app precompile-templates
+"""
+
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'jinja')
+
+
+def get_cache_dir():
+    return os.getenv('TEMPLATE_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+def configure_template_cache(app):
+    """
+    Attach a shared on-disk bytecode cache to the app's Jinja environment.
+    Set TEMPLATE_CACHE=False to disable it; PRECOMPILE_TEMPLATES=True also
+    compiles every template immediately instead of on first use.
+    """
+    if os.getenv('TEMPLATE_CACHE', 'True').lower() != 'true':
+        return None
+
+    cache_dir = get_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    # Jinja writes cache files atomically, so concurrent workers can share the directory
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    if os.getenv('PRECOMPILE_TEMPLATES', 'False').lower() == 'true':
+        precompile_templates(app)
+    return cache_dir
+
+
+def precompile_templates(app):
+    """
+    Load every template once so it is compiled (and written to the bytecode cache if configured).
+    Returns (template_count, elapsed_seconds).
+    """
+    started = time.perf_counter()
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    from app import app
+
+    configure_template_cache(app)
+    count, elapsed = precompile_templates(app)
+    print(f"Precompiled {count} templates into {get_cache_dir()} in {elapsed * 1000:.1f} ms")
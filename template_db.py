@@ -0,0 +1,97 @@
+"""
+Template database for tests and benchmarks.
+
+init_db() plus seed_database() (which hashes every seed password) costs far
+more than copying the finished result. The template is built once into
+DB_TEMPLATE (database/template.db) and rebuilt only when db.py or
+seed_data.py is newer than it; clone_template() then copies it over the
+current database with the SQLite backup API in milliseconds.
+
+Combined with the in-memory mode of db.py each test gets an isolated,
+seeded database without touching disk:
+
+    DB_PATH=:memory: DB_TEMPLATE=database/template.db python -m pytest
+
+    import template_db
+    template_db.clone_template()   # before each test: back to the seed state
+
+    flask --app app build-template [--force]
+"""
+
+import os
+from contextlib import contextmanager
+
+import db
+
+TEMPLATE_PATH = os.getenv('DB_TEMPLATE') or 'database/template.db'
+
+# Modules whose changes make a built template out of date
+_SOURCES = ('db.py', 'seed_data.py')
+
+
+def is_stale(path=None):
+    path = path or TEMPLATE_PATH
+    if not os.path.exists(path):
+        return True
+    here = os.path.dirname(os.path.abspath(__file__))
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(os.path.join(here, name)) > built for name in _SOURCES)
+
+
+@contextmanager
+def _pointed_at(path):
+    """Temporarily point get_db_connection() at `path` (the build runs init_db and the seeder as-is)."""
+    previous = os.environ.get('DB_PATH')
+    os.environ['DB_PATH'] = path
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['DB_PATH']
+        else:
+            os.environ['DB_PATH'] = previous
+
+
+def build_template(path=None, force=False, seed=True):
+    """Build the template (schema plus seed data) unless an up-to-date one exists; returns its path."""
+    import seed_data
+
+    path = path or TEMPLATE_PATH
+    if not force and not is_stale(path):
+        return path
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.partial'
+    for leftover in (partial, partial + '-wal', partial + '-shm'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    with _pointed_at(partial):
+        db.init_db()
+        if seed:
+            seed_data.seed_database()
+        conn = db.get_db_connection()
+        try:
+            # One self-contained file: no -wal/-shm companions to copy along
+            conn.execute("PRAGMA journal_mode = DELETE")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    os.replace(partial, path)
+    return path
+
+
+def clone_template(path=None):
+    """
+    Replace the current database (DB_PATH: a file or the in-memory database)
+    with a copy of the template, building it first if needed.
+    """
+    path = build_template(path)
+    conn = db.get_db_connection()
+    try:
+        db.restore_database(path, conn)
+        if not db.is_memory_db():
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.commit()
+    finally:
+        conn.close()
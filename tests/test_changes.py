@@ -0,0 +1,68 @@
+"""
+Change log readers after the database was replaced.
+
+Run with: python -m pytest
+"""
+
+import pytest
+
+import availability
+import changes
+import db
+import template_db
+
+
+@pytest.fixture
+def template(tmp_path, monkeypatch):
+    monkeypatch.setenv('DB_PATH', ':memory:')
+    monkeypatch.delenv('DB_TEMPLATE', raising=False)
+    path = template_db.build_template(str(tmp_path / 'template.db'))
+    template_db.clone_template(path)
+    yield path
+    db.close_memory_db()
+
+
+def fill_every_room(conn, start, end):
+    """Lease every bed of every room for [start, end]."""
+    rooms = conn.execute("""
+        SELECT r.room_id, rt.capacity FROM rooms r LEFT JOIN room_types rt ON r.type_id = rt.type_id
+    """).fetchall()
+    conn.executemany("""
+        INSERT INTO room_assignments (user_id, room_id, start_date, end_date, monthly_rate, status)
+        VALUES (3, ?, ?, ?, 350000, 'active')
+    """, [(room['room_id'], start, end) for room in rooms for _ in range(room['capacity'] or 1)])
+    conn.commit()
+
+
+def test_read_changes_past_the_end_of_a_restored_log(template):
+    conn = db.get_db_connection()
+    try:
+        fill_every_room(conn, '2030-01-01', '2030-12-31')
+        seq = changes.latest_seq(conn.cursor())
+        template_db.clone_template(template)
+
+        batch = changes.read_changes(conn.cursor(), since=seq)
+        assert batch['resync']
+        assert not changes.read_changes(conn.cursor(), since=changes.latest_seq(conn.cursor()))['resync']
+    finally:
+        conn.close()
+
+
+def test_availability_index_rebuilds_after_clone(template):
+    index = availability.AvailabilityIndex()
+    conn = db.get_db_connection()
+    try:
+        index.ensure_fresh(conn.cursor())
+        fill_every_room(conn, '2030-01-01', '2030-12-31')
+        index.ensure_fresh(conn.cursor())
+        assert index.search('2030-03-01', '2030-03-31') == []
+
+        template_db.clone_template(template)
+        index.ensure_fresh(conn.cursor())
+        rebuilt = availability.AvailabilityIndex()
+        rebuilt.ensure_fresh(conn.cursor())
+        expected = rebuilt.search('2030-03-01', '2030-03-31')
+        assert expected
+        assert index.search('2030-03-01', '2030-03-31') == expected
+    finally:
+        conn.close()
@@ -0,0 +1,208 @@
+"""
+Login throttling.
+
+Every login attempt that reaches the password check costs a full hash
+verification, so attempts are metered with token buckets before the user is
+even looked up:
+
+    per identifier  LOGIN_IDENTIFIER_BURST attempts, refilled at LOGIN_IDENTIFIER_PER_MINUTE
+    per client IP   LOGIN_IP_BURST attempts, refilled at LOGIN_IP_PER_MINUTE
+    per process     LOGIN_HASH_BURST hash checks, refilled at LOGIN_HASHES_PER_SECOND
+
+The first two stop one attacker hammering one account or one address; the
+process-wide budget caps the hashing CPU of a worker however many addresses
+an attack comes from. A throttled attempt gets HTTP 429 with Retry-After and
+never touches the database or the hasher. A successful login refills its
+identifier's bucket.
+
+Buckets live in process memory by default. LOGIN_THROTTLE_STORE=sqlite keeps
+the identifier and IP buckets in the login_buckets table instead, so all
+workers share them (the hash budget is always per process: it bounds that
+process's CPU). If the store cannot be reached the attempt is let through.
+
+Counters are served at /api/login-throttle (admins).
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from db import get_db_connection
+
+ENABLED = os.getenv('LOGIN_THROTTLE', 'True').lower() == 'true'
+STORE = os.getenv('LOGIN_THROTTLE_STORE', 'memory')
+
+# bucket kind -> (burst, tokens refilled per second)
+LIMITS = {
+    'identifier': (int(os.getenv('LOGIN_IDENTIFIER_BURST', '5')),
+                   float(os.getenv('LOGIN_IDENTIFIER_PER_MINUTE', '5')) / 60),
+    'ip': (int(os.getenv('LOGIN_IP_BURST', '20')),
+           float(os.getenv('LOGIN_IP_PER_MINUTE', '30')) / 60),
+    'hash': (int(os.getenv('LOGIN_HASH_BURST', '20')),
+             float(os.getenv('LOGIN_HASHES_PER_SECOND', '10'))),
+}
+# Buckets kept in memory at once; the least recently used are dropped first
+MAX_BUCKETS = 100000
+# Seconds the SQLite store waits for the write lock before letting the attempt through
+STORE_TIMEOUT = 1.0
+
+_buckets = OrderedDict()   # key -> (tokens, updated)
+_lock = threading.Lock()
+_metrics = {
+    'attempts': 0,
+    'allowed': 0,
+    'throttled': {'identifier': 0, 'ip': 0, 'hash': 0},
+    'store_errors': 0,
+}
+_calls = 0
+
+
+def _refill(state, kind, now):
+    burst, rate = LIMITS[kind]
+    if state is None:
+        return float(burst)
+    tokens, updated = state
+    return min(float(burst), tokens + max(0.0, now - updated) * rate)
+
+
+def _wait(tokens, kind):
+    """Seconds until a bucket holding `tokens` has a whole token again."""
+    rate = LIMITS[kind][1]
+    return math.inf if rate <= 0 else (1 - tokens) / rate
+
+
+def _take_memory(kind, key, now):
+    with _lock:
+        tokens = _refill(_buckets.get(key), kind, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        _buckets[key] = (tokens, now)
+        _buckets.move_to_end(key)
+        while len(_buckets) > MAX_BUCKETS:
+            _buckets.popitem(last=False)
+    return allowed, tokens
+
+
+def _take_sqlite(kind, key, now):
+    conn = get_db_connection()
+    conn.isolation_level = None
+    conn.execute(f"PRAGMA busy_timeout = {int(STORE_TIMEOUT * 1000)}")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT tokens, updated_at FROM login_buckets WHERE bucket_key = ?", (key,)).fetchone()
+        tokens = _refill(tuple(row) if row else None, kind, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        conn.execute("""
+            INSERT INTO login_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(bucket_key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+        """, (key, tokens, now))
+        conn.execute("COMMIT")
+        return allowed, tokens
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _take(kind, key, now):
+    if kind == 'hash' or STORE != 'sqlite':
+        return _take_memory(kind, key, now)
+    try:
+        return _take_sqlite(kind, key, now)
+    except sqlite3.Error:
+        with _lock:
+            _metrics['store_errors'] += 1
+        return True, 0.0
+
+
+def check_login(identifier, ip):
+    """
+    Take one token from the IP, identifier and hash buckets, in that order,
+    stopping at the first that is empty. Returns (allowed, retry_after seconds).
+    """
+    if not ENABLED:
+        return True, 0
+    now = time.time()
+    checks = (('ip', f"ip:{ip or '-'}"),
+              ('identifier', f"id:{identifier.strip().lower()}"),
+              ('hash', 'hash'))
+    with _lock:
+        _metrics['attempts'] += 1
+    for kind, key in checks:
+        allowed, tokens = _take(kind, key, now)
+        if not allowed:
+            with _lock:
+                _metrics['throttled'][kind] += 1
+            wait = _wait(tokens, kind)
+            return False, 3600 if math.isinf(wait) else max(1, math.ceil(wait))
+    with _lock:
+        _metrics['allowed'] += 1
+    _maybe_prune(now)
+    return True, 0
+
+
+def reset_identifier(identifier):
+    """Refill an identifier's bucket (after a successful login)."""
+    key = f"id:{identifier.strip().lower()}"
+    with _lock:
+        _buckets.pop(key, None)
+    if STORE == 'sqlite':
+        conn = get_db_connection()
+        try:
+            conn.execute("DELETE FROM login_buckets WHERE bucket_key = ?", (key,))
+            conn.commit()
+        except sqlite3.Error:
+            with _lock:
+                _metrics['store_errors'] += 1
+        finally:
+            conn.close()
+
+
+def _maybe_prune(now, every=1000):
+    """Now and then drop stored buckets idle long enough to be full again (they carry no state)."""
+    global _calls
+    with _lock:
+        _calls += 1
+        if STORE != 'sqlite' or _calls % every:
+            return
+    idle = max(burst / rate for burst, rate in LIMITS.values() if rate > 0)
+    conn = get_db_connection()
+    try:
+        conn.execute("DELETE FROM login_buckets WHERE updated_at < ?", (now - idle,))
+        conn.commit()
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+
+
+def stats():
+    with _lock:
+        return {
+            'enabled': ENABLED,
+            'store': STORE,
+            'limits': {kind: {'burst': burst, 'per_minute': round(rate * 60, 3)}
+                       for kind, (burst, rate) in LIMITS.items()},
+            'attempts': _metrics['attempts'],
+            'allowed': _metrics['allowed'],
+            'throttled': dict(_metrics['throttled']),
+            'store_errors': _metrics['store_errors'],
+            'buckets_in_memory': len(_buckets),
+        }
+
+
+def reset():
+    """Forget all in-memory buckets and counters."""
+    global _calls
+    with _lock:
+        _buckets.clear()
+        _metrics.update(attempts=0, allowed=0, store_errors=0, throttled=dict.fromkeys(_metrics['throttled'], 0))
+        _calls = 0
@@ -0,0 +1,268 @@
+"""
+Vacancy-loss analytics.
+
+For a date range, every room's beds are swept over the non-cancelled
+assignment intervals (archived history included when the range reaches it):
+a bed-day is vacant when fewer assignments than the room type's capacity
+cover that day. Lost revenue prices each vacant bed-day at the room type's
+base_rate (a monthly rate per bed, integer cents) divided by the days in
+that month; it is reported in pesos.
+Empty-room days count days a room had no occupant at all. A room is counted
+from the earlier of its created_at and its first assignment, archived or not.
+
+The sweep is sort-and-sweep over interval endpoints, not a loop over days:
+assignment starts (+1) and ends (-1), plus a marker at every month boundary,
+are sorted by (room, day) and cumulatively summed, which gives each room's
+occupancy as constant segments that never cross a month. Work grows with
+rooms x months + assignments, independent of the number of days.
+
+Results are cached per date range until rooms, room types, buildings or
+assignments are written again (table_versions).
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+import archive
+from db import get_db_connection
+from money import CENTS_PER_UNIT
+from ref_cache import get_table_versions
+
+VACANCY_TABLES = ('buildings', 'room_types', 'rooms', 'room_assignments')
+# Date ranges kept in the cache at once (each holds rooms x months arrays)
+CACHE_SIZE = 4
+
+# Report groupings: key columns per group
+GROUPS = {
+    'room': ('room_id',),
+    'floor': ('building_id', 'floor_number'),
+    'building': ('building_id',),
+    'type': ('type_id',),
+    'month': ('month',),
+}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+# Days since 1970-01-01 of an ISO date column (numpy's datetime64[D] epoch)
+_EPOCH_DAY = "CAST(julianday({0}) - 2440587.5 AS INTEGER)"
+
+
+def _day(value):
+    return np.datetime64(str(value)[:10], 'D')
+
+
+def _load(cursor, start, end):
+    cursor.execute("""
+        SELECT r.room_id, r.room_number, r.floor_number, COALESCE(r.building_id, 0) AS building_id,
+               b.building_name, b.owner_id, COALESCE(r.type_id, 0) AS type_id, rt.type_name,
+               COALESCE(rt.base_rate, 0) AS base_rate, COALESCE(rt.capacity, 1) AS capacity,
+               date(r.created_at) AS created
+        FROM rooms r
+        LEFT JOIN buildings b ON r.building_id = b.building_id
+        LEFT JOIN room_types rt ON r.type_id = rt.type_id
+        ORDER BY r.room_id
+    """)
+    rooms = [dict(row) for row in cursor.fetchall()]
+    # Leases as plain tuples of day numbers: (room_id, first day, last day)
+    source = archive.table_source(cursor, 'room_assignments', start)
+    cursor.row_factory = None
+    cursor.execute(f"""
+        SELECT room_id, {_EPOCH_DAY.format('start_date')}, {_EPOCH_DAY.format('COALESCE(end_date, :end)')}
+        FROM {source} ra
+        WHERE status != 'cancelled' AND room_id IS NOT NULL AND start_date IS NOT NULL
+          AND start_date <= :end AND (end_date IS NULL OR end_date >= :start)
+    """, {'start': start, 'end': end})
+    leases = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 3)
+    cursor.row_factory = sqlite3.Row
+    # A room's first lease may be archived even when the range does not reach the archive
+    history = archive.table_source(cursor, 'room_assignments', date.min.isoformat())
+    cursor.execute(f"""
+        SELECT room_id, MIN(start_date) AS first_start FROM {history} ra
+        WHERE status != 'cancelled' AND room_id IS NOT NULL AND start_date IS NOT NULL
+        GROUP BY room_id
+    """)
+    first_starts = {row['room_id']: row['first_start'] for row in cursor.fetchall()}
+    return rooms, leases, first_starts
+
+
+def compute_vacancy(rooms, leases, first_starts, start, end):
+    """
+    Sweep the rooms over start..end (inclusive); `leases` is an array of
+    (room_id, first day, last day) rows in days since 1970-01-01, as _load
+    returns it. Returns the month labels and
+    room x month arrays of bed-days, vacant bed-days, empty-room days and lost revenue.
+    """
+    start, end = _day(start), _day(end)
+    n_days = int((end - start).astype(np.int64)) + 1
+    first_month = start.astype('datetime64[M]')
+    month_starts = np.arange(first_month, end.astype('datetime64[M]') + 1, dtype='datetime64[M]')
+    n_rooms, n_months = len(rooms), len(month_starts)
+    shape = (n_rooms, n_months)
+    if n_rooms == 0 or n_days <= 0:
+        empty = np.zeros(shape)
+        return {'months': [str(m) for m in month_starts], 'bed_days': empty, 'vacant_bed_days': empty,
+                'empty_days': empty, 'lost_revenue': empty}
+
+    room_ids = np.array([r['room_id'] for r in rooms], dtype=np.int64)
+    capacity = np.array([r['capacity'] for r in rooms], dtype=np.int64)
+    base_rate = np.array([float(r['base_rate']) for r in rooms], dtype=np.float64)
+
+    # Day (offset from start) each room starts counting
+    opened = []
+    for r in rooms:
+        candidates = [v for v in (r['created'], first_starts.get(r['room_id'])) if v]
+        opened.append(min(candidates) if candidates else str(start))
+    opened = np.clip((np.array(opened, dtype='datetime64[D]') - start).astype(np.int64), 0, n_days)
+
+    # -- events: (room, day offset, occupancy delta) --------------------------
+    month_days = np.clip((month_starts.astype('datetime64[D]') - start).astype(np.int64), 0, None)
+    markers = np.concatenate([month_days, [n_days]])
+    ev_room = [np.repeat(np.arange(n_rooms), len(markers)), np.arange(n_rooms)]
+    ev_day = [np.tile(markers, n_rooms), opened]
+    ev_delta = [np.zeros(n_rooms * len(markers), dtype=np.int64), np.zeros(n_rooms, dtype=np.int64)]
+    if len(leases):
+        lease_rooms, first, last = leases.T
+        slot = np.minimum(np.searchsorted(room_ids, lease_rooms), n_rooms - 1)
+        known = room_ids[slot] == lease_rooms
+        origin = start.astype(np.int64)
+        first = np.clip(first - origin, 0, n_days)[known]
+        after = np.clip(last - origin + 1, 0, n_days)[known]
+        ev_room += [slot[known], slot[known]]
+        ev_day += [first, after]
+        ev_delta += [np.ones(len(first), dtype=np.int64), -np.ones(len(after), dtype=np.int64)]
+    ev_room, ev_day, ev_delta = (np.concatenate(a) for a in (ev_room, ev_day, ev_delta))
+
+    # -- sweep: sort by (room, day), running occupancy within each room -------
+    # One packed int64 key per event sorts much faster than a lexsort
+    keys = ((ev_room * (n_days + 1) + ev_day) << 2) | (ev_delta + 1)
+    keys.sort()
+    ev_delta = (keys & 3) - 1
+    ev_room, ev_day = np.divmod(keys >> 2, n_days + 1)
+    running = np.cumsum(ev_delta)
+    group_start = np.flatnonzero(np.r_[True, ev_room[1:] != ev_room[:-1]])
+    base = running[group_start] - ev_delta[group_start]
+    occupancy = running - np.repeat(base, np.diff(np.r_[group_start, len(ev_room)]))
+
+    # Segment i runs from event i to event i + 1 of the same room
+    length = np.r_[ev_day[1:] - ev_day[:-1], 0]
+    length[np.r_[ev_room[1:] != ev_room[:-1], True]] = 0
+    counted = (length > 0) & (ev_day >= opened[ev_room]) & (ev_day < n_days)
+    seg_room, seg_day, seg_len = ev_room[counted], ev_day[counted], length[counted]
+    seg_occ = np.clip(occupancy[counted], 0, capacity[seg_room])
+
+    seg_month = np.searchsorted(month_days, seg_day, side='right') - 1
+    days_in_month = ((month_starts + 1).astype('datetime64[D]') - month_starts.astype('datetime64[D]')).astype(np.int64)
+    vacant_beds = capacity[seg_room] - seg_occ
+    cell = seg_room * n_months + seg_month
+
+    def per_cell(weights, dtype=np.float64):
+        return np.bincount(cell, weights=weights, minlength=n_rooms * n_months).reshape(shape).astype(dtype)
+
+    return {
+        'months': [str(m) for m in month_starts],
+        'bed_days': per_cell(capacity[seg_room] * seg_len, np.int32),
+        'vacant_bed_days': per_cell(vacant_beds * seg_len, np.int32),
+        'empty_days': per_cell((seg_occ == 0) * seg_len, np.int32),
+        'lost_revenue': per_cell(vacant_beds * seg_len * base_rate[seg_room] / days_in_month[seg_month]),
+    }
+
+
+def get_vacancy(start, end):
+    """Cached sweep for start..end; recomputed after a write to rooms, types, buildings or assignments."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        versions = get_table_versions(cursor)
+        stamp = tuple(versions.get(t, 0) for t in VACANCY_TABLES)
+        cached = _cache.get((start, end))
+        if cached and cached[0] == stamp:
+            return cached[1]
+        rooms, leases, first_starts = _load(cursor, start, end)
+    finally:
+        cursor.close()
+        conn.close()
+
+    result = compute_vacancy(rooms, leases, first_starts, start, end)
+    result['rooms'] = rooms
+    with _lock:
+        _cache[(start, end)] = (stamp, result)
+        _cache.move_to_end((start, end))
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _row(keys, bed_days, vacant, empty, lost):
+    row = dict(keys)
+    row.update({
+        'bed_days': int(bed_days),
+        'vacant_bed_days': int(vacant),
+        'vacancy_rate': round(float(vacant / bed_days), 4) if bed_days else 0,
+        'empty_room_days': int(empty),
+        'lost_revenue': round(float(lost) / CENTS_PER_UNIT, 2),
+    })
+    return row
+
+
+def vacancy_report(start, end, group='building', owner_id=None, building_id=None):
+    """
+    Vacancy per `group` (room, floor, building, type or month) for start..end,
+    largest lost revenue first (months in order). With owner_id, only that
+    landlord's rooms.
+    """
+    data = get_vacancy(start, end)
+    rooms = data['rooms']
+    selected = [i for i, r in enumerate(rooms)
+                if (owner_id is None or r['owner_id'] == owner_id)
+                and (building_id is None or r['building_id'] == building_id)]
+    metrics = [data[name][selected] for name in ('bed_days', 'vacant_bed_days', 'empty_days', 'lost_revenue')]
+    totals = [m.sum() for m in metrics]
+
+    if group == 'month':
+        rows = [_row({'month': month}, *(m[:, j].sum() for m in metrics))
+                for j, month in enumerate(data['months'])]
+    else:
+        codes, first_room = {}, []
+        slots = np.empty(len(selected), dtype=np.int64)
+        for k, i in enumerate(selected):
+            key = tuple(rooms[i][column] for column in GROUPS[group])
+            if key not in codes:
+                codes[key] = len(first_room)
+                first_room.append(i)
+            slots[k] = codes[key]
+        sums = [np.bincount(slots, weights=m.sum(axis=1), minlength=len(first_room)) for m in metrics]
+        rows = [_row(_labels(rooms[i], group), *(values[g] for values in sums))
+                for g, i in enumerate(first_room)]
+        rows.sort(key=lambda r: r['lost_revenue'], reverse=True)
+
+    return {
+        'start': start,
+        'end': end,
+        'group': group,
+        'totals': _row({}, *totals),
+        'rows': rows,
+    }
+
+
+def _labels(room, group):
+    if group == 'room':
+        fields = ('room_id', 'room_number', 'building_id', 'building_name', 'floor_number', 'type_id', 'type_name')
+    elif group == 'floor':
+        fields = ('building_id', 'building_name', 'floor_number')
+    elif group == 'building':
+        fields = ('building_id', 'building_name')
+    else:
+        fields = ('type_id', 'type_name')
+    return {field: room[field] for field in fields}
+
+
+def default_range(today=None):
+    """The last twelve months through today."""
+    today = today or date.today()
+    return today.replace(year=today.year - 1, day=1).isoformat(), today.isoformat()
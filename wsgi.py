@@ -0,0 +1,35 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With the bundled config the app is preloaded: importing this module in the
+server's master process runs app.initialize() (schema, seed data, cache
+warm-up) exactly once, and workers are forked from the initialized master.
+No SQLite connection is held open across the fork: every request opens its
+own connection through get_db_connection(). post_fork() clears the little
+per-process state that must not be shared between workers.
+"""
+
+import os
+
+# Keep `import app` side-effect free; initialization happens below, once
+os.environ.setdefault("APP_SKIP_INIT", "True")
+
+from app import app, initialize  # noqa: E402
+import availability  # noqa: E402
+import receipts  # noqa: E402
+
+initialize()
+
+# Some servers look for `application` by default
+application = app
+
+
+def post_fork():
+    """Reset process-local state inherited from the master."""
+    # A reserved block of receipt numbers must belong to exactly one worker
+    receipts.reset_blocks()
+    # Rebuild the availability index lazily in each worker
+    availability.index.stamp = None
+    availability.index.meta_stamp = None